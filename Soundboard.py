@@ -1,6 +1,5 @@
 import customtkinter as ctk
 import sounddevice as sd
-import soundfile as sf
 import numpy as np
 import os
 import sys
@@ -12,6 +11,17 @@ import shutil
 import json 
 import signal 
 import time 
+import queue
+import multiprocessing
+
+from audio_loader import (DecodeEngine, SampleStore, ClipCache, VALID_EXTENSIONS, can_decode, resample_clip,
+                          open_stream_clip, trim_clip)
+from audio_engine import MixEngine, CallbackStats, LatencyTracer, TRACE_STAGES
+from hotkeys import HotkeyDispatcher, normalize_mods
+from file_list import VirtualFileList
+from library import FolderWatcher, LibraryIndex, scan_folder
+from search import TrigramIndex
+from devices import DeviceWatcher, device_base_name, MIC_OFF, DEFAULT_SPEAKER
 
 # --- Dependency Checks ---
 
@@ -92,41 +102,20 @@ def run_as_admin():
         print(f"Failed to restart with admin rights: {e}")
         messagebox.showerror("Error", f"Failed to acquire Admin rights:\n{e}")
 
-try:
-    from pycaw.pycaw import AudioUtilities
-    from comtypes import CoInitialize, CoUninitialize
-    PYCAW_AVAILABLE = True
-except ImportError:
-    PYCAW_AVAILABLE = False
-    print("Note: 'pycaw' not found. Run 'pip install pycaw' to hide disabled audio devices.")
-except Exception as e:
-    PYCAW_AVAILABLE = False
-    print(f"Note: Error loading 'pycaw': {e}")
-
-def get_active_windows_devices():
-    """
-    Uses pycaw to get a set of 'Active' (enabled) audio device names.
-    Returns None if pycaw is unavailable or fails.
-    """
-    if not PYCAW_AVAILABLE:
-        return None
-    
-    print("pycaw: Scanning for active audio devices...")
-    active_devices_set = set()
-    try:
-        CoInitialize()
-        devices = AudioUtilities.GetDevices() 
-        for device in devices:
-            if device.state() == 1: # 1 == DEVICE_STATE_ACTIVE
-                active_devices_set.add(device.FriendlyName)
-        print(f"pycaw: Found {len(active_devices_set)} active devices.")
-        CoUninitialize()
-        return active_devices_set
-    except Exception as e:
-        print(f"pycaw: Device scan failed (disabling filter). (Error: {e})")
-        try: CoUninitialize()
-        except Exception: pass
-        return None
+# --- Stream Latency Profiles ---
+# blocksize 0 = let PortAudio choose (variable block size).
+# 'exclusive' only applies to devices on the Windows WASAPI host API.
+LATENCY_PROFILES = {
+    "safe":  {"blocksize": 0,   "latency": "high", "exclusive": False},
+    "low":   {"blocksize": 256, "latency": "low",  "exclusive": False},
+    "ultra": {"blocksize": 64,  "latency": "low",  "exclusive": True},
+}
+LATENCY_PROFILE_ORDER = ["ultra", "low", "safe"] # Fallback goes to the right
+TRACE_HISTOGRAM_MS = (0, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250, 500) # Bin edges of the trace window's histogram
+
+PLAY_SELECTED_ID = "play_selected" # Hotkey binding id of 'Play Selected' (file hotkeys use their path)
+PLAY_TOP_RESULT_ID = "play_top_result" # Hotkey binding id of 'Play Top Result' (first row of the list)
+GLOBAL_HOTKEY_NAMES = {PLAY_SELECTED_ID: "Play Selected", PLAY_TOP_RESULT_ID: "Play Top Result"}
 
 # --- Main Application Class ---
 
@@ -145,6 +134,10 @@ class AudioMixerApp(ctk.CTk):
         self.config_file = "config.json"
         self.saved_mic_name = None
         self.saved_mix_out_name = None
+        self.device_map = {} # { "(3) Microphone (...)": 3, ... }; empty until the first scan
+        self.device_watcher = DeviceWatcher()
+        self.devices_refreshing = False # Streams are closed while PortAudio re-initializes
+        self.resume_mixing = False # Reopen the mix stream after a device refresh
         self.is_closing = False
         
         # --- Hotkey Modifier Definitions (Centralized) ---
@@ -168,44 +161,129 @@ class AudioMixerApp(ctk.CTk):
         # --- Audio Stream State ---
         self.stream = None
         self.is_mixing = False
-        self.stream_samplerate = 44100
+        self.library_samplerate = 44100 # Rate clips are decoded and stored at (device independent)
+        self.stream_samplerate = 44100  # Rate of the running stream (the output device's native rate)
+        self.monitor_samplerate = 44100 # Rate of the monitor stream (the default speaker's native rate)
         self.stream_channels = 2
 
         # --- Audio Data Cache ---
-        self.sound_cache = {}
+        self.sound_cache = ClipCache() # { "C:/.../beep.mp3": (samples, samplerate), ... }
+        self.rate_clips = ClipCache() # { "C:/.../beep.mp3": (samples, stream_samplerate) } if the rates differ
+        self.stream_heads = {} # clip_heads resampled to stream_samplerate
+        self.monitor_clips = ClipCache() # { "C:/.../beep.mp3": (samples, monitor_samplerate) } if it differs from both
         self.selected_sound_key = None
-
-        # --- Audio Playback State (Thread-safe) ---
-        self.music_data = None
-        self.music_play_pos = 0
-        self.music_lock = threading.Lock()
-        
-        self.music_request_lock = threading.Lock()
-        self.music_request = None # (data, pos) tuple
+        self.library_files = set() # Every playable file found in 'Soundboard Rsc'
+        self.folder_watcher = None # Reports added/removed/modified files (see _on_library_changes)
+        self.library_index = None # SQLite metadata index in .cache/library.db (see LibraryIndex)
+        self.library_category = "All" # Category filter ("All", "" = top folder, or "Sub/Folder")
+        self.library_sort = "Name" # Key of LibraryIndex.SORT_ORDERS
+        self.view_refresh_pending = False
+        self.search_index = TrigramIndex() # File names + tags, for the search box
+        self.search_query = ""
+        self.search_limit = 200 # Rows shown for a search
+
+        # --- Loudness Normalization (measured once per file, cached in the library index) ---
+        self.loudness_normalize = True
+        self.loudness_target_lufs = -18.0 # Integrated loudness every clip is brought to
+        self.true_peak_ceiling_db = -1.0  # Normalization never pushes a clip's true peak above this
+        self.max_normalize_boost_db = 12.0 # Quiet clips are raised by at most this much
+        self.clip_analysis = {} # { "C:/.../beep.mp3": {"loudness", "true_peak", "trim_start", "trim_end"} } (analysed files)
+        self.clip_gains = {} # { "C:/.../beep.mp3": linear gain } (missing = 1.0)
+        self.analysis_queue = [] # [(path, samples)] decoded clips waiting for analysis
+        self.analysis_pending = set()
+
+        # --- Silence Trimming (found by the same analysis; source files are never changed) ---
+        self.trim_silence = True
+        self.silence_threshold_db = -60.0 # Peak level below which leading/trailing audio counts as silence
+
+        # --- Lazy Loading ---
+        self.lazy_load = False    # True = decode clips on first select/preview/hotkey
+        self.clip_cache_mb = 512  # LRU memory budget for decoded clips (lazy mode only)
+        self.prewarm_ms = 300     # Head of each hotkeyed clip kept in RAM for an instant start
+        self.clip_heads = {}      # { "C:/.../beep.mp3": float32 array (first prewarm_ms) }
+        self.replaced_heads = {}  # { "C:/.../beep.mp3": [old heads] } rebuilt while a voice may still play them
+        self.pending_decodes = {} # { "C:/.../beep.mp3": [callbacks to run once decoded] }
+
+        # --- Streaming Playback (long clips are never fully decoded) ---
+        self.stream_min_seconds = 60 # Clips at least this long are streamed from disk (0 = never)
+        self.stream_buffer_seconds = 2.0 # Ring buffer per streaming voice
+        self.stream_clips = {} # { "C:/.../music_bed.mp3": duration in seconds }
+        self.pending_lock = threading.Lock()
+
+        # --- Decode Engine (process pool) ---
+        self.decode_workers = 0 # 0 = one worker per CPU core
+        self.pcm_disk_cache = True # Keep decoded clips in a memory-mapped store in .cache/pcm
+        self.decode_engine = None
+        self.load_generation = 0 # Incremented per load, so stale results are dropped
+        self.load_start_time = 0.0
+        self.load_timings = {} # { "C:/.../beep.mp3": seconds, ... }
+
+        # --- Audio Playback State (Thread-safe, see MixEngine) ---
+        self.max_voices = 16 # Sounds that can play at the same time
+        self.voice_steal_policy = "oldest" # "oldest" or "quietest" when all voices are busy
+        self.mix_engine = None
+        self.monitor_engine = None # Second voice mixer for the local monitor (default speaker)
+        self.monitor_stream = None # Opened once and kept open (see start_monitor_stream)
+        self.monitor_reopen = False # Set by a trigger that found the monitor closed; the Tk thread reopens it
+        self.max_block_frames = 4096 # Largest callback block the mixer preallocates for
+        self.latency_profile = "safe" # Key of LATENCY_PROFILES
+        self.active_latency_profile = None # Profile the running stream actually uses
+        self.callback_stats = CallbackStats() # Written by audio_callback, read by the meter and the log
+        self.stats_log_seconds = 60 # Console summary of the audio thread while mixing (0 = off)
+        self.stats_meter_seen = 0 # CallbackStats.count at the last meter update
+        self.stats_log_seen = 0 # ... and at the last console summary
+        self.stats_log_time = 0.0
+        self.latency_tracer = LatencyTracer() # Hotkey/button -> DAC timestamps of recent plays
+        self.trace_window = None
 
         # --- Volume Settings ---
         self.mic_vol = 0.8
         self.music_vol = 0.5
         self.preview_vol = 0.7 # Used for Preview button AND local monitoring
 
+        # --- Mic FX and Master Limiter (see dsp.py) ---
+        self.mic_gate = False
+        self.mic_gate_threshold_db = -50.0 # The gate opens above this level (dBFS, block RMS)
+        self.mic_compressor = False
+        self.mic_compressor_threshold_db = -24.0
+        self.mic_compressor_ratio = 3.0
+        self.mic_compressor_makeup_db = 3.0
+        self.limiter = True # Look-ahead true-peak limiter instead of a hard clip (applies on stream start)
+        self.limiter_ceiling_db = -1.0 # dBTP
+        self.limiter_lookahead_ms = 1.5 # Also the latency the limiter adds
+
         # --- Hotkey Storage ---
         self.current_hotkey = "6" # Default 'Play Selected' hotkey
+        self.search_hotkey = ""   # 'Play Top Result' hotkey (unset by default)
         self.file_hotkeys = {}    # { "C:/.../beep.mp3": "ctrl+1", ... }
-        self.file_hotkey_buttons = {} # { "C:/.../beep.mp3": <CTkButton_Widget>, ... }
         
         # Load settings from config.json (overwrites defaults)
         self.load_settings()
+        if self.lazy_load:
+            self.sound_cache.set_budget(int(self.clip_cache_mb * 1024 * 1024))
+            self.rate_clips.set_budget(int(self.clip_cache_mb * 1024 * 1024))
+            self.monitor_clips.set_budget(int(self.clip_cache_mb * 1024 * 1024))
+        self.mix_engine = MixEngine(max_voices=self.max_voices, steal_policy=self.voice_steal_policy,
+                                    samplerate=self.library_samplerate)
+        self.mix_engine.tracer = self.latency_tracer
+        self.mix_engine.stats = self.callback_stats
+        self.monitor_engine = MixEngine(max_voices=self.max_voices, steal_policy=self.voice_steal_policy,
+                                        samplerate=self.library_samplerate)
+        self._apply_dsp_settings()
+        sample_store = SampleStore(os.path.join(self.get_cache_dir(), "pcm")) if self.pcm_disk_cache else None
+        self.decode_engine = DecodeEngine(max_workers=self.decode_workers, sample_store=sample_store,
+                                          stream_min_seconds=self.stream_min_seconds)
 
         # --- Hotkey Capture State ---
         self.capture_window = None 
-        self.current_capture_type = None # "mix" or "file"
+        self.current_capture_type = None # "mix", "search" or "file"
         self.current_capture_file_path = None
         self.captured_modifiers = set()
         self.captured_key = None
         
-        # --- Hotkey Press-State Flags (for repeat prevention) ---
-        self.mix_hotkey_down = False
-        self.file_hotkey_down_flags = {}
+        # --- Global Hotkeys (one keyboard hook; see hotkeys.py) ---
+        self.hotkey_dispatcher = HotkeyDispatcher()
+        self.hotkey_owners = {} # { (frozenset(mods), main_key): PLAY_SELECTED_ID, PLAY_TOP_RESULT_ID or file path }
 
         # --- Build UI ---
         main_frame = ctk.CTkFrame(self)
@@ -227,13 +305,64 @@ class AudioMixerApp(ctk.CTk):
         self.mix_out_dropdown = ctk.CTkOptionMenu(device_frame, values=["Loading..."], command=self.on_mix_out_device_change)
         self.mix_out_dropdown.grid(row=1, column=1, padx=10, pady=5, sticky="ew")
 
+        ctk.CTkLabel(device_frame, text="⏱️ Latency:").grid(row=2, column=0, padx=10, pady=5, sticky="e")
+        latency_row = ctk.CTkFrame(device_frame, fg_color="transparent")
+        latency_row.grid(row=2, column=1, padx=10, pady=5, sticky="ew")
+        latency_row.grid_columnconfigure(1, weight=1)
+        self.latency_dropdown = ctk.CTkOptionMenu(latency_row, values=list(LATENCY_PROFILES), width=100,
+                                                  command=self.on_latency_profile_change)
+        self.latency_dropdown.set(self.latency_profile)
+        self.latency_dropdown.grid(row=0, column=0, sticky="w")
+        self.latency_label = ctk.CTkLabel(latency_row, text="Stream stopped", anchor="w")
+        self.latency_label.grid(row=0, column=1, padx=(10, 0), sticky="ew")
+
+        ctk.CTkLabel(device_frame, text="📊 Audio Load:").grid(row=3, column=0, padx=10, pady=5, sticky="e")
+        load_row = ctk.CTkFrame(device_frame, fg_color="transparent")
+        load_row.grid(row=3, column=1, padx=10, pady=5, sticky="ew")
+        load_row.grid_columnconfigure(1, weight=1)
+        self.load_meter = ctk.CTkProgressBar(load_row, width=100)
+        self.load_meter.set(0.0)
+        self.load_meter.grid(row=0, column=0, sticky="w")
+        self.load_meter_color = self.load_meter.cget("progress_color")
+        self.load_label = ctk.CTkLabel(load_row, text="Stream stopped", anchor="w")
+        self.load_label.grid(row=0, column=1, padx=(10, 0), sticky="ew")
+        ctk.CTkButton(load_row, text="Latency Traces", width=110,
+                      command=self.open_latency_traces).grid(row=0, column=2, padx=(10, 0))
+
         self.mic_device_id = None
         self.mix_out_device_id = None
 
-        # 3. File List Frame (dynamically populated)
-        self.file_list_frame = ctk.CTkScrollableFrame(main_frame, label_text="Audio Files")
-        self.file_list_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
-        self.file_buttons = [] # For managing selection highlights
+        # 3. Library: category / sort bar and the file list (virtualized: only visible rows are widgets)
+        library_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        library_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
+        library_frame.grid_columnconfigure(0, weight=1)
+        library_frame.grid_rowconfigure(1, weight=1)
+
+        filter_bar = ctk.CTkFrame(library_frame, fg_color="transparent")
+        filter_bar.grid(row=0, column=0, sticky="ew", pady=(0, 5))
+        filter_bar.grid_columnconfigure(1, weight=1)
+        self.search_var = ctk.StringVar()
+        self.search_entry = ctk.CTkEntry(filter_bar, textvariable=self.search_var,
+                                         placeholder_text="🔍 Search names and tags (Enter = play top result)")
+        self.search_entry.grid(row=0, column=0, columnspan=4, padx=10, pady=(0, 5), sticky="ew")
+        self.search_var.trace_add("write", lambda *args: self.on_search_change())
+        self.search_entry.bind("<Return>", lambda event: self.play_top_result(source="Search"))
+        self.search_entry.bind("<Escape>", lambda event: self.search_var.set(""))
+        ctk.CTkLabel(filter_bar, text="📁 Category:").grid(row=1, column=0, padx=(10, 5))
+        self.category_dropdown = ctk.CTkOptionMenu(filter_bar, values=["All"], command=self.on_category_change)
+        self.category_dropdown.grid(row=1, column=1, padx=5, sticky="ew")
+        ctk.CTkLabel(filter_bar, text="Sort:").grid(row=1, column=2, padx=(10, 5))
+        self.sort_dropdown = ctk.CTkOptionMenu(filter_bar, values=list(LibraryIndex.SORT_ORDERS), width=110,
+                                               command=self.on_sort_change)
+        self.sort_dropdown.set(self.library_sort)
+        self.sort_dropdown.grid(row=1, column=3, padx=(5, 10))
+
+        self.file_list = VirtualFileList(library_frame, label_text="Audio Files",
+                                         on_select=self.select_file,
+                                         on_double_click=self.on_file_double_click,
+                                         on_hotkey_click=partial(self.open_hotkey_capture_window, "file"),
+                                         hotkey_text=self.file_hotkey_text)
+        self.file_list.grid(row=1, column=0, sticky="nsew")
 
         # 4. Volume Sliders Frame
         volume_frame = ctk.CTkFrame(main_frame)
@@ -255,6 +384,16 @@ class AudioMixerApp(ctk.CTk):
         self.preview_vol_slider.set(self.preview_vol)
         self.preview_vol_slider.grid(row=2, column=1, padx=10, pady=5, sticky="ew")
 
+        ctk.CTkLabel(volume_frame, text="Mic FX:").grid(row=3, column=0, padx=10, pady=5)
+        fx_frame = ctk.CTkFrame(volume_frame, fg_color="transparent")
+        fx_frame.grid(row=3, column=1, padx=10, pady=5, sticky="w")
+        self.mic_gate_var = ctk.BooleanVar(value=self.mic_gate)
+        ctk.CTkCheckBox(fx_frame, text="Noise Gate", variable=self.mic_gate_var,
+                        command=self.on_mic_fx_change).grid(row=0, column=0, padx=(0, 10))
+        self.mic_compressor_var = ctk.BooleanVar(value=self.mic_compressor)
+        ctk.CTkCheckBox(fx_frame, text="Compressor", variable=self.mic_compressor_var,
+                        command=self.on_mic_fx_change).grid(row=0, column=1, padx=(0, 10))
+
         # 5. Control Buttons Frame
         control_frame = ctk.CTkFrame(main_frame)
         control_frame.grid(row=3, column=0, sticky="ew", padx=10, pady=5)
@@ -280,10 +419,19 @@ class AudioMixerApp(ctk.CTk):
                                         width=120, command=lambda: self.open_hotkey_capture_window("mix")) 
         self.hotkey_btn.grid(row=0, column=1, padx=(5, 10), pady=5, sticky="ew")
 
+        ctk.CTkLabel(hotkey_frame, text="Play Top Result Hotkey:").grid(row=1, column=0, padx=(10,5), pady=5)
+        self.search_hotkey_btn = ctk.CTkButton(hotkey_frame, text=f"Set ({self.search_hotkey or 'None'})",
+                                               width=120, command=lambda: self.open_hotkey_capture_window("search"))
+        self.search_hotkey_btn.grid(row=1, column=1, padx=(5, 10), pady=5, sticky="ew")
+
 
         # --- App Initialization ---
         self.auto_load_files_from_rsc()
+        self.after(20, self._poll_decode_results)
+        self.after(500, self._poll_library_changes)
+        self.after(500, self._poll_audio_stats)
         self.load_audio_devices()
+        self.start_monitor_stream()
 
         # --- Window & Signal Handlers ---
         self.protocol("WM_DELETE_WINDOW", self.on_close)
@@ -326,131 +474,195 @@ class AudioMixerApp(ctk.CTk):
         
         return (mods, main_key)
     
+    def _hotkey_index_key(self, hotkey_str):
+        """Order-independent key for duplicate detection ("alt+ctrl+p" == "ctrl+alt+p")."""
+        mods, main_key = self._parse_hotkey(hotkey_str)
+        return (normalize_mods(mods), main_key)
+
     def rebuild_all_hotkeys(self):
         """
-        Clears all system hotkeys and registers them again from storage.
-        This is the central function for managing all hotkey bindings.
+        Registers every stored hotkey (at startup). Later edits are applied
+        one binding at a time by _apply_hotkey.
         """
         if not KEYBOARD_AVAILABLE:
             return
             
-        print("[*] Rebuilding all hotkeys...")
-        try:
-            keyboard.unhook_all()
-        except Exception as e:
-            print(f"[!] unhook_all failed (ignoring): {e}")
+        print("[*] Registering all hotkeys...")
+        self.hotkey_dispatcher.clear()
+        self.hotkey_owners.clear()
 
-        # 1. Register 'Play Selected' hotkey
+        # 1. 'Play Selected' hotkey
         if self.current_hotkey:
-            try:
-                mods, main_key = self._parse_hotkey(self.current_hotkey)
-                if main_key:
-                    press_cb = partial(self.on_mix_key_press, required_mods=mods)
-                    keyboard.on_press_key(main_key, press_cb)
-                    keyboard.on_release_key(main_key, self.on_mix_key_release)
-            except Exception as e:
-                print(f"[!] Failed to register 'Play Selected' hotkey ('{self.current_hotkey}'): {e}")
+            self._apply_hotkey(PLAY_SELECTED_ID, None, self.current_hotkey, self.play_to_mix_hotkey)
+
+        # 2. 'Play Top Result' hotkey
+        if self.search_hotkey:
+            if self.hotkey_owners.get(self._hotkey_index_key(self.search_hotkey)) is not None:
+                print(f"[!] Hotkey '{self.search_hotkey}' for 'Play Top Result' is already in use; skipped.")
+            else:
+                self._apply_hotkey(PLAY_TOP_RESULT_ID, None, self.search_hotkey, self.play_top_result)
 
-        # 2. Register all individual 'File Hotkeys'
+        # 3. All individual 'File Hotkeys'
         for file_path, hotkey_str in self.file_hotkeys.items():
             if hotkey_str: # Only if hotkey is not empty
-                try:
-                    mods, main_key = self._parse_hotkey(hotkey_str)
-                    if main_key:
-                        press_cb = partial(self.on_file_key_press, 
-                                           file_path=file_path, 
-                                           required_mods=mods, 
-                                           callback=partial(self.play_file_hotkey, file_path))
-                        release_cb = partial(self.on_file_key_release, file_path=file_path)
-                        
-                        keyboard.on_press_key(main_key, press_cb)
-                        keyboard.on_release_key(main_key, release_cb)
-                except Exception as e:
-                     print(f"[!] Failed to register file hotkey ('{hotkey_str}'): {e}")
-    
-    # --- 1. Audio Device Methods ---
-
-    def load_audio_devices(self):
-        """Loads audio devices, filtering out disabled ones if pycaw is available."""
-        self.device_map = {}
-        input_devices = ["(Mic Off)"]
-        output_devices = ["(Default Speaker)"]
-
-        active_devices_set = get_active_windows_devices()
+                owner = self.hotkey_owners.get(self._hotkey_index_key(hotkey_str))
+                if owner is not None:
+                    print(f"[!] Hotkey '{hotkey_str}' for {os.path.basename(file_path)} is already in use; skipped.")
+                    continue
+                self._apply_hotkey(file_path, None, hotkey_str, partial(self.play_file_hotkey, file_path))
 
         try:
-            devices = sd.query_devices()
-            hostapis = sd.query_hostapis() 
-
-            for i, device in enumerate(devices):
-                # Filter out disabled WASAPI devices if possible
-                if active_devices_set is not None:
-                    try:
-                        api_name = hostapis[device['hostapi']]['name']
-                        sd_name = device['name']
-                        if api_name == 'Windows WASAPI':
-                            if sd_name not in active_devices_set:
-                                print(f"Filtered (disabled/unplugged): {sd_name}")
-                                continue 
-                    except Exception as e:
-                        print(f"Error during device filter (ignoring): {e}")
-                
-                device_name = f"({i}) {device['name']}"
-                self.device_map[device_name] = i
-
-                if device['max_input_channels'] > 0:
-                    input_devices.append(device_name)
-                if device['max_output_channels'] > 0:
-                    output_devices.append(device_name)
-            
-            # Set dropdown values
-            self.mic_in_dropdown.configure(values=input_devices)
-            self.mix_out_dropdown.configure(values=output_devices)
+            self.hotkey_dispatcher.start()
+        except Exception as e:
+            print(f"[!] Failed to install keyboard hook: {e}")
+
+    def _apply_hotkey(self, binding_id, old_hotkey, new_hotkey, action):
+        """Moves one binding from `old_hotkey` to `new_hotkey` ("" / None = unbound)."""
+        if old_hotkey:
+            old_key = self._hotkey_index_key(old_hotkey)
+            if self.hotkey_owners.get(old_key) == binding_id:
+                del self.hotkey_owners[old_key]
+        self.hotkey_dispatcher.unbind(binding_id)
+        if not new_hotkey:
+            return
 
-            # Set Mic In (prioritize saved value)
-            if self.saved_mic_name and self.saved_mic_name in input_devices:
-                self.mic_in_dropdown.set(self.saved_mic_name)
-            else:
-                default_mic = next((d for d in input_devices if "Mic" in d and "CABLE" not in d), input_devices[0])
-                self.mic_in_dropdown.set(default_mic)
-            self.on_mic_device_change(self.mic_in_dropdown.get())
+        try:
+            mods, main_key = self._parse_hotkey(new_hotkey)
+            if main_key:
+                self.hotkey_dispatcher.bind(binding_id, mods, main_key, action)
+                self.hotkey_owners[self._hotkey_index_key(new_hotkey)] = binding_id # Only once it is bound
+        except Exception as e:
+            print(f"[!] Failed to register hotkey ('{new_hotkey}'): {e}")
+    
+    # --- 1. Audio Device Methods ---
 
-            # Set Mix Out (prioritize saved value)
-            if self.saved_mix_out_name and self.saved_mix_out_name in output_devices:
-                self.mix_out_dropdown.set(self.saved_mix_out_name)
-            else:
-                vb_cable_out = next((d for d in output_devices if "CABLE Input" in d), output_devices[0])
-                self.mix_out_dropdown.set(vb_cable_out)
-            self.on_mix_out_device_change(self.mix_out_dropdown.get())
+    def load_audio_devices(self):
+        """Starts the background device scan; the dropdowns fill in when it finishes."""
+        self.device_watcher.start()
+        self.after(100, self._poll_device_results)
 
-        except Exception as e:
-            messagebox.showerror("Audio Device Error", f"Failed to load audio devices: {e}")
+    def _poll_device_results(self):
+        """Applies device scans and hot-plug events from the watcher (runs for the app's lifetime)."""
+        if self.is_closing:
+            return
+        while True:
+            try:
+                kind, payload = self.device_watcher.results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "devices":
+                self._apply_device_snapshot(payload)
+            elif kind == "changed":
+                self._on_devices_changed()
+            elif kind == "error":
+                print(f"[!] Device scan failed: {payload}")
+                if not self.device_map:
+                    messagebox.showerror("Audio Device Error", f"Failed to load audio devices: {payload}")
+        if self.monitor_reopen and self.monitor_stream is None and not self.devices_refreshing:
+            self.monitor_reopen = False # One attempt per trigger that found it closed
+            self.start_monitor_stream()
+        self.after(250, self._poll_device_results)
+
+    def _on_devices_changed(self):
+        """A device was plugged in or removed: close streams so PortAudio can rescan."""
+        print("[*] Audio devices changed; refreshing device list...")
+        self.resume_mixing = self.resume_mixing or self.is_mixing
+        if self.is_mixing:
+            self.toggle_mix()
+        if self.monitor_stream is not None:
+            self.monitor_stream.stop()
+            self.monitor_stream.close()
+            self.monitor_stream = None
+        self.devices_refreshing = True
+        self.device_watcher.request_refresh()
+
+    def _apply_device_snapshot(self, snapshot):
+        """Fills the dropdowns, keeping the selected devices by name (their index may have changed)."""
+        input_devices = snapshot["inputs"]
+        output_devices = snapshot["outputs"]
+        first_scan = not self.device_map
+        if first_scan:
+            wanted_mic, wanted_out = self.saved_mic_name, self.saved_mix_out_name
+        else:
+            wanted_mic, wanted_out = self.mic_in_dropdown.get(), self.mix_out_dropdown.get()
+        self.device_map = snapshot["device_map"]
+
+        self.mic_in_dropdown.configure(values=input_devices)
+        self.mix_out_dropdown.configure(values=output_devices)
+
+        # Set Mic In (prioritize the saved/selected device)
+        mic = next((d for d in input_devices if wanted_mic and device_base_name(d) == device_base_name(wanted_mic)), None)
+        if mic is None:
+            if wanted_mic and not first_scan:
+                print(f"[!] Mic '{device_base_name(wanted_mic)}' is gone.")
+            mic = next((d for d in input_devices if "Mic" in d and "CABLE" not in d), input_devices[0])
+        self.mic_in_dropdown.set(mic)
+        self.on_mic_device_change(mic)
+
+        # Set Mix Out (prioritize the saved/selected device)
+        mix_out = next((d for d in output_devices if wanted_out and device_base_name(d) == device_base_name(wanted_out)), None)
+        mix_out_lost = mix_out is None and bool(wanted_out) and not first_scan
+        if mix_out is None:
+            if mix_out_lost:
+                print(f"[!] Mix Out '{device_base_name(wanted_out)}' is gone.")
+            mix_out = next((d for d in output_devices if "CABLE Input" in d), output_devices[0])
+        self.mix_out_dropdown.set(mix_out)
+        self.on_mix_out_device_change(mix_out)
+
+        if self.devices_refreshing:
+            self.devices_refreshing = False
+            self.start_monitor_stream()
+            if self.resume_mixing:
+                self.resume_mixing = False
+                if mix_out_lost:
+                    print("[!] Mix stream not restarted (Mix Out device was removed).")
+                else:
+                    self.toggle_mix() # Same named devices, new indices
 
     def on_mic_device_change(self, device_name):
-        if device_name == "(Mic Off)":
+        if device_name == MIC_OFF:
             self.mic_device_id = None
         else:
             self.mic_device_id = self.device_map.get(device_name)
         print(f"Mic In ID set: {self.mic_device_id}")
 
     def on_mix_out_device_change(self, device_name):
-        if device_name == "(Default Speaker)":
+        if device_name == DEFAULT_SPEAKER:
             self.mix_out_device_id = None # None = default device
         else:
             self.mix_out_device_id = self.device_map.get(device_name)
         print(f"Mix Out ID set: {self.mix_out_device_id}")
 
+    def on_latency_profile_change(self, profile_name):
+        """Switches latency profile; restarts the stream if it is running."""
+        self.latency_profile = profile_name
+        print(f"Latency profile set: {profile_name}")
+        if self.is_mixing:
+            self.toggle_mix()
+            self.toggle_mix()
+
     # --- 2. File Loading & UI Methods ---
 
+    def get_cache_dir(self):
+        """Returns the '.cache' folder next to config.json."""
+        return os.path.join(os.path.dirname(os.path.abspath(self.config_file)), ".cache")
+
+    def get_rsc_folder(self):
+        """Returns the path of the 'Soundboard Rsc' folder next to the script/exe."""
+        if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
+            script_dir = os.path.dirname(sys.executable)
+        else:
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(script_dir, "Soundboard Rsc")
+
     def auto_load_files_from_rsc(self):
-        """Finds all audio files, loads them into cache, and builds the file list UI."""
+        """
+        Finds all audio files (subfolders included) and sends them to the decode engine.
+        The list is built right away from the library index; clips become
+        playable as each one finishes. In lazy mode only hotkeyed clips are decoded.
+        """
         try:
-            if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-                script_dir = os.path.dirname(sys.executable)
-            else:
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-            
-            rsc_folder = os.path.join(script_dir, "Soundboard Rsc")
+            rsc_folder = self.get_rsc_folder()
 
             if not os.path.isdir(rsc_folder):
                 print(f"Warning: 'Soundboard Rsc' folder not found at {rsc_folder}")
@@ -459,94 +671,550 @@ class AudioMixerApp(ctk.CTk):
                 return
 
             # Clear all existing UI and cache
-            for widget in self.file_list_frame.winfo_children():
-                widget.destroy()
-            self.file_buttons.clear()
+            self.file_list.clear()
             self.sound_cache.clear()
-            self.file_hotkey_buttons.clear()
-            self.file_hotkey_down_flags.clear()
+            self.load_timings.clear()
+            self.library_files.clear()
+            self.search_index.clear()
+            self.analysis_queue.clear()
+            self.analysis_pending.clear()
+            self.clip_heads.clear()
+            self.replaced_heads.clear()
+            self.rate_clips.clear()
+            self.stream_heads.clear()
+            self.monitor_clips.clear()
+            self.stream_clips.clear()
+            with self.pending_lock:
+                self.pending_decodes.clear()
             self.selected_sound_key = None
 
-            valid_extensions = ('.wav', '.flac', '.ogg', '.mp3', '.m4a')
             print(f"Loading files from '{rsc_folder}'...")
-            loaded_files = 0
-            
-            for filename in os.listdir(rsc_folder):
-                if filename.lower().endswith(valid_extensions):
-                    full_path = os.path.join(rsc_folder, filename)
-                    try:
-                        # Load via pydub (for mp3/m4a/ogg) or soundfile (for wav/flac)
-                        if PYDUB_AVAILABLE and (filename.lower().endswith(('.mp3', '.ogg', '.m4a'))):
-                            sound = AudioSegment.from_file(full_path)
-                        elif filename.lower().endswith(('.wav', '.flac')):
-                            data, sr = sf.read(full_path, dtype='int16') 
-                            if data.ndim == 1: # Convert mono to stereo
-                                data = np.column_stack((data, data))
-                            sound = AudioSegment(data.tobytes(), frame_rate=sr, sample_width=data.dtype.itemsize, channels=data.shape[1])
-                        else:
-                            if not PYDUB_AVAILABLE:
-                                print(f"File skipped (pydub/ffmpeg required): {filename}")
-                            continue
-
-                        # Standardize audio format for mixing
-                        sound = sound.set_frame_rate(self.stream_samplerate)
-                        sound = sound.set_channels(self.stream_channels)
-                        sound = sound.set_sample_width(2) # 16-bit
-
-                        # Convert to numpy float32 array and cache
-                        samples = np.array(sound.get_array_of_samples(), dtype=np.float32)
-                        samples /= 32767.0 # Normalize to -1.0 to 1.0
-                        samples = samples.reshape(-1, self.stream_channels)
-                        self.sound_cache[full_path] = (samples, self.stream_samplerate)
-
-                        # --- Create UI entry for the file ---
-                        file_entry_frame = ctk.CTkFrame(self.file_list_frame, fg_color="transparent")
-                        file_entry_frame.pack(fill="x", pady=2)
-                        file_entry_frame.grid_columnconfigure(0, weight=1)
-
-                        # File name button (for selecting)
-                        btn = ctk.CTkButton(file_entry_frame, text=filename, fg_color="transparent", anchor="w")
-                        btn.configure(command=partial(self.select_file, full_path, btn))
-                        btn.bind("<Double-Button-1>", partial(self.on_file_double_click, full_path, btn))
-                        btn.grid(row=0, column=0, sticky="ew", padx=(5, 5))
-
-                        # Hotkey set button
-                        hotkey_btn_text = "Set (None)"
-                        if full_path in self.file_hotkeys:
-                            hotkey_str = self.file_hotkeys.get(full_path)
-                            if hotkey_str: 
-                                hotkey_btn_text = f"Set ({hotkey_str})"
-                        
-                        hotkey_btn = ctk.CTkButton(file_entry_frame, text=hotkey_btn_text, width=120,
-                                                   command=partial(self.open_hotkey_capture_window, "file", full_path))
-                        hotkey_btn.grid(row=0, column=1, sticky="e", padx=(0, 5))
-
-                        self.file_buttons.append(btn)
-                        self.file_hotkey_buttons[full_path] = hotkey_btn
-                        self.file_hotkey_down_flags[full_path] = False # Initialize press-state flag
-                        loaded_files += 1
-
-                    except Exception as e:
-                        print(f"Failed to load file: {filename}, Error: {e}")
-
-            print(f"Load complete: {loaded_files} files.")
+            snapshot = scan_folder(rsc_folder, VALID_EXTENSIONS)
+            paths = [p for p in snapshot if self._is_loadable(p)]
+
+            # Only new or changed files need their headers read; the rest comes from the index
+            self.open_library_index(rsc_folder)
+            self.library_index.sync({p: snapshot[p] for p in paths})
+            self.library_index.set_hotkeys(self.file_hotkeys)
+            self.clip_analysis = self.library_index.analysis_info()
+            self._update_clip_gains()
+
+            self.load_generation += 1
+            self.load_start_time = time.perf_counter()
+            self._queue_library_files(paths, "load")
+            self._refresh_categories()
+            self._probe_missing_info()
+
+            # Pick up files added/removed/changed from now on
+            if self.folder_watcher is not None:
+                self.folder_watcher.stop()
+            self.folder_watcher = FolderWatcher(rsc_folder, VALID_EXTENSIONS)
+            self.folder_watcher.start(snapshot)
 
         except Exception as e:
             print(f"Critical error during file auto-load: {e}")
             messagebox.showerror("Auto-Load Error", f"A critical error occurred: {e}")
 
-    def select_file(self, file_path, selected_button):
+    def open_library_index(self, rsc_folder):
+        """Opens .cache/library.db (an in-memory index if the cache folder is not writable)."""
+        if self.library_index is not None and self.library_index.root == rsc_folder:
+            return
+        if self.library_index is not None:
+            self.library_index.close()
+        try:
+            os.makedirs(self.get_cache_dir(), exist_ok=True)
+            self.library_index = LibraryIndex(os.path.join(self.get_cache_dir(), "library.db"), rsc_folder)
+        except Exception as e:
+            print(f"[!] Library index unavailable, keeping it in memory: {e}")
+            self.library_index = LibraryIndex(":memory:", rsc_folder)
+
+    def _probe_missing_info(self):
+        """Reads duration / format of files the index doesn't know yet (in the background)."""
+        paths = [p for p in self.library_index.paths_missing_info() if p in self.library_files]
+        if paths:
+            print(f"Indexing {len(paths)} new or changed files...")
+            self.decode_engine.submit_probe(paths, tag=(self.load_generation, "probe"))
+
+    def _is_loadable(self, full_path):
+        if not can_decode(full_path):
+            print(f"File skipped (pydub/ffmpeg required): {os.path.basename(full_path)}")
+            return False
+        return True
+
+    def _queue_library_files(self, paths, batch):
+        """
+        Adds files to the library (and the list) and sends them to the decode engine.
+        In lazy mode only hotkeyed clips are decoded.
+        """
+        self.library_files.update(paths)
+        tags = self.library_index.tags()
+        for full_path in paths:
+            self.search_index.add(full_path, tags.get(full_path, ""))
+        self._refresh_file_view()
+
+        if self.lazy_load:
+            # Decode on demand
+            paths = [p for p in paths if self.file_hotkeys.get(p)]
+            print(f"Lazy mode: {len(self.library_files)} files listed, pre-warming {len(paths)} hotkeyed clips.")
+
+        # Mark as pending so triggers during the load don't decode a second time
+        with self.pending_lock:
+            for full_path in paths:
+                self.pending_decodes.setdefault(full_path, [])
+
+        # Results are picked up by _poll_decode_results on the Tk thread
+        self.decode_engine.submit(paths, self.library_samplerate, self.stream_channels,
+                                  tag=(self.load_generation, batch))
+
+    def _poll_library_changes(self):
+        """Applies file changes reported by the folder watcher (runs for the app's lifetime)."""
+        if self.is_closing:
+            return
+        while self.folder_watcher is not None:
+            try:
+                _, added, removed, modified = self.folder_watcher.results.get_nowait()
+            except queue.Empty:
+                break
+            self._on_library_changes(added, removed, modified)
+        self.after(500, self._poll_library_changes)
+
+    def _forget_clip(self, full_path):
+        """Drops every cached form of a clip. Voices already playing it keep their own reference."""
+        self.sound_cache.pop(full_path)
+        self.rate_clips.pop(full_path)
+        self.clip_heads.pop(full_path, None)
+        self.replaced_heads.pop(full_path, None)
+        self.stream_heads.pop(full_path, None)
+        self.monitor_clips.pop(full_path)
+        self.stream_clips.pop(full_path, None)
+        self.load_timings.pop(full_path, None)
+        self.clip_analysis.pop(full_path, None) # Re-analysed once decoded again
+        self.clip_gains.pop(full_path, None)
+        self.analysis_pending.discard(full_path)
+
+    def _on_library_changes(self, added, removed, modified):
+        """Patches the library in place: only changed files are decoded; hotkeys stay bound."""
+        print(f"[*] Library changed: {len(added)} added, {len(removed)} removed, {len(modified)} modified.")
+        for full_path in removed:
+            self.library_files.discard(full_path)
+            self.search_index.remove(full_path)
+            self._forget_clip(full_path)
+            self.file_list.remove(full_path)
+            if self.selected_sound_key == full_path:
+                self.selected_sound_key = None
+            print(f"Removed: {os.path.basename(full_path)}")
+        self.library_index.remove(removed)
+
+        for full_path in modified:
+            self._forget_clip(full_path)
+        # Unlisted files were skipped before (e.g. not decodable); treat them as new
+        modified = [p for p in modified if p in self.library_files]
+
+        new_files = [p for p in added if self._is_loadable(p)]
+        self.library_index.upsert(new_files + modified) # Resets the metadata of modified files
+        if new_files:
+            self._queue_library_files(new_files, "rescan")
+        if removed or new_files:
+            self._refresh_categories()
+        if new_files or modified:
+            self._probe_missing_info()
+        if modified:
+            reload = modified if not self.lazy_load else [p for p in modified if self.file_hotkeys.get(p)]
+            with self.pending_lock:
+                for full_path in reload:
+                    self.pending_decodes.setdefault(full_path, [])
+            self.decode_engine.submit(reload, self.library_samplerate, self.stream_channels,
+                                      tag=(self.load_generation, "rescan"))
+
+    def _poll_decode_results(self):
+        """Moves finished clips from the decode engine into the cache (runs for the app's lifetime)."""
+        if self.is_closing:
+            return
+
+        # Handle a limited number per tick so the UI stays responsive
+        for _ in range(32):
+            try:
+                kind, tag, full_path, payload, elapsed = self.decode_engine.results.get_nowait()
+            except queue.Empty:
+                break
+
+            generation, batch = tag[:2]
+            if generation != self.load_generation:
+                continue # Result from an older load; ignore
+            if full_path is not None and full_path not in self.library_files:
+                with self.pending_lock:
+                    self.pending_decodes.pop((full_path, tag[2]) if batch == "rate" else full_path, None)
+                continue # File was removed while it was decoding
+
+            if batch == "rate":
+                self._on_rate_result(kind, tag[2], full_path, payload, elapsed)
+            elif batch == "probe":
+                self._on_probe_result(kind, full_path, payload)
+            elif batch == "analyze":
+                self._on_analysis_result(kind, full_path, payload)
+            elif kind == "ok":
+                self._on_clip_decoded(full_path, payload, elapsed)
+            elif kind == "stream":
+                self._on_clip_streamed(full_path, payload)
+            elif kind == "error":
+                print(f"Failed to load file: {os.path.basename(full_path)}, Error: {payload}")
+                with self.pending_lock:
+                    self.pending_decodes.pop(full_path, None)
+                # Unplayable; drop it from the list (it is retried when the file changes)
+                self.library_files.discard(full_path)
+                self.search_index.remove(full_path)
+                self.file_list.remove(full_path)
+            elif kind == "done" and batch == "load":
+                total = time.perf_counter() - self.load_start_time
+                loaded_files = len(self.sound_cache)
+                print(f"Load complete: {loaded_files}/{payload} files in {total:.2f} s "
+                      f"({self.decode_engine.max_workers} workers).")
+                if self.load_timings:
+                    slowest = max(self.load_timings, key=self.load_timings.get)
+                    print(f"  Slowest file: {os.path.basename(slowest)} ({self.load_timings[slowest] * 1000:.1f} ms)")
+
+        self.after(20, self._poll_decode_results)
+
+    def _on_probe_result(self, kind, full_path, payload):
+        """[Tk thread] Stores a file's header info in the library index."""
+        if kind == "info":
+            self.library_index.set_info(full_path, payload["duration"], payload["samplerate"], payload["channels"])
+        elif kind == "error":
+            print(f"Could not read header: {os.path.basename(full_path)} ({payload})")
+        elif kind == "done":
+            self.library_index.commit()
+            print(f"Indexed {payload} files.")
+            if self.library_sort == "Duration":
+                self._refresh_file_view()
+
+    def _queue_analysis(self, full_path, samples):
+        """Measures a clip's loudness and silence once (batched; results are kept in the library index)."""
+        if full_path in self.clip_analysis or full_path in self.analysis_pending:
+            return
+        self.analysis_pending.add(full_path)
+        if not self.analysis_queue:
+            self.after(250, self._flush_analysis_queue)
+        self.analysis_queue.append((full_path, samples))
+
+    def _flush_analysis_queue(self):
+        clips, self.analysis_queue = self.analysis_queue, []
+        if clips:
+            self.decode_engine.submit_analysis(clips, self.library_samplerate,
+                                               tag=(self.load_generation, "analyze"),
+                                               silence_threshold_db=self.silence_threshold_db)
+
+    def _on_analysis_result(self, kind, full_path, payload):
+        """[Tk thread] Stores a clip's analysis and applies its gain and trim points."""
+        if kind == "done":
+            self.library_index.commit()
+            return
+        if full_path not in self.analysis_pending:
+            return # File changed while it was being analysed
+        self.analysis_pending.discard(full_path)
+        if kind == "error":
+            print(f"Loudness analysis failed: {os.path.basename(full_path)} ({payload})")
+            return
+        self.clip_analysis[full_path] = payload
+        self.library_index.set_analysis(full_path, payload)
+        self.clip_gains[full_path] = self.normalization_gain(payload["loudness"], payload["true_peak"])
+        if payload["loudness"] is not None:
+            print(f"Loudness: {os.path.basename(full_path)} {payload['loudness']:.1f} LUFS, "
+                  f"{payload['true_peak']:.1f} dBTP -> {20 * np.log10(self.clip_gains[full_path]):+.1f} dB")
+
+        # Drop the trailing silence from memory; hotkeyed heads now need to cover the leading silence
+        entry = self.sound_cache.get(full_path)
+        if entry is not None:
+            trimmed = self._trim_tail(full_path, entry[0], entry[1])
+            if trimmed is not entry[0]:
+                self.sound_cache[full_path] = (trimmed, entry[1])
+            rate_entry = self.rate_clips.get(full_path)
+            if rate_entry is not None:
+                rate_entry = (self._trim_tail(full_path, rate_entry[0], rate_entry[1]), rate_entry[1])
+                self.rate_clips[full_path] = rate_entry
+            monitor_entry = self.monitor_clips.get(full_path)
+            if monitor_entry is not None:
+                self.monitor_clips[full_path] = (self._trim_tail(full_path, *monitor_entry), monitor_entry[1])
+            if self.file_hotkeys.get(full_path):
+                self._prewarm_head(full_path, trimmed)
+                # A voice still on the replaced head continues in the full clip
+                if self.stream_samplerate == self.library_samplerate:
+                    self._upgrade_head_playback(full_path, trimmed)
+                elif rate_entry is not None:
+                    self._upgrade_head_playback(full_path, rate_entry[0])
+
+    def normalization_gain(self, loudness, true_peak):
+        """Linear gain that brings a clip to the target loudness without exceeding the true peak ceiling."""
+        if not self.loudness_normalize or loudness is None:
+            return 1.0
+        gain_db = min(self.loudness_target_lufs - loudness, self.max_normalize_boost_db)
+        if true_peak is not None:
+            gain_db = min(gain_db, self.true_peak_ceiling_db - true_peak)
+        return 10.0 ** (gain_db / 20.0)
+
+    def _update_clip_gains(self):
+        self.clip_gains = {path: self.normalization_gain(info["loudness"], info["true_peak"])
+                           for path, info in self.clip_analysis.items()}
+
+    def _trim_start_frame(self, file_path, samplerate):
+        """First non-silent frame of a clip at `samplerate` (0 if unknown or trimming is off)."""
+        info = self.clip_analysis.get(file_path)
+        if not self.trim_silence or info is None or not info["trim_start"]:
+            return 0
+        return int(info["trim_start"] * samplerate)
+
+    def _trim_tail(self, file_path, samples, samplerate):
+        """Returns the clip (at `samplerate`) without its trailing silence, freeing the tail if it was in RAM."""
+        info = self.clip_analysis.get(file_path)
+        if not self.trim_silence or info is None or info["trim_end"] is None:
+            return samples
+        return trim_clip(samples, int(np.ceil(info["trim_end"] * samplerate)))
+
+    def _on_clip_decoded(self, full_path, samples, elapsed):
+        """[Tk thread] Stores a decoded clip and runs anything that was waiting for it."""
+        samples = self._trim_tail(full_path, samples, self.library_samplerate)
+        self.sound_cache[full_path] = (samples, self.library_samplerate)
+        self._queue_analysis(full_path, samples)
+        if elapsed is None:
+            print(f"Loaded (cached): {os.path.basename(full_path)}")
+        else:
+            self.load_timings[full_path] = elapsed
+            print(f"Loaded: {os.path.basename(full_path)} ({elapsed * 1000:.1f} ms)")
+
+        head = self.clip_heads.get(full_path)
+        if head is not None and self.monitor_stream is not None and self.monitor_samplerate == self.library_samplerate:
+            self.monitor_engine.replace_data(head, samples) # A monitor at the library rate plays the library head
+        if self.file_hotkeys.get(full_path):
+            self._prewarm_head(full_path, samples) # A head it replaces is kept in replaced_heads
+        if self.stream_samplerate == self.library_samplerate:
+            self._upgrade_head_playback(full_path, samples)
+
+        with self.pending_lock:
+            callbacks = self.pending_decodes.pop(full_path, [])
+        for callback in callbacks:
+            callback()
+
+    def _on_clip_streamed(self, full_path, duration):
+        """[Tk thread] Marks a long clip for streaming playback instead of caching it."""
+        self.stream_clips[full_path] = duration
+        print(f"Streaming: {os.path.basename(full_path)} ({duration:.0f} s, not decoded)")
+
+        with self.pending_lock:
+            callbacks = self.pending_decodes.pop(full_path, [])
+        for callback in callbacks:
+            callback()
+
+    def is_clip_ready(self, file_path):
+        """True if the clip can play right away (decoded, or streamed from disk)."""
+        return file_path in self.sound_cache or file_path in self.stream_clips
+
+    def request_clip(self, file_path, callback=None):
+        """
+        Starts decoding a clip that is not in sound_cache (lazy mode or evicted).
+        `callback` runs on the Tk thread once the clip is cached. Safe from any thread.
+        """
+        with self.pending_lock:
+            callbacks = self.pending_decodes.get(file_path)
+            first_request = callbacks is None
+            if first_request:
+                callbacks = self.pending_decodes[file_path] = []
+            if callback:
+                callbacks.append(callback)
+        if first_request:
+            self.decode_engine.submit([file_path], self.library_samplerate, self.stream_channels,
+                                      tag=(self.load_generation, "demand"))
+
+    def request_rate_clip(self, file_path, callback=None, rate=None):
+        """
+        Like request_clip, for the clip resampled to the running stream's rate
+        (or `rate`: the monitor's). Each clip is resampled once per rate (and
+        kept in the sample store), so switching devices never re-decodes the library.
+        """
+        entry = self.sound_cache.get(file_path)
+        if entry is None:
+            self.request_clip(file_path, callback=partial(self.request_rate_clip, file_path, callback, rate))
+            return
+        rate = rate or self.stream_samplerate
+        with self.pending_lock:
+            callbacks = self.pending_decodes.get((file_path, rate))
+            first_request = callbacks is None
+            if first_request:
+                callbacks = self.pending_decodes[(file_path, rate)] = []
+            if callback:
+                callbacks.append(callback)
+        if first_request:
+            self.decode_engine.submit_resample([(file_path, entry[0])], self.library_samplerate, rate,
+                                               self.stream_channels, tag=(self.load_generation, "rate", rate))
+
+    def _on_rate_result(self, kind, rate, full_path, payload, elapsed):
+        """[Tk thread] Stores a resampled clip and runs anything that was waiting for it."""
+        if kind == "done":
+            return
+        with self.pending_lock:
+            callbacks = self.pending_decodes.pop((full_path, rate), [])
+        if rate == self.stream_samplerate:
+            cache = self.rate_clips
+        elif rate == self.monitor_samplerate:
+            cache = self.monitor_clips
+        else:
+            return # Stream (or monitor) was reopened at another rate meanwhile
+        if kind == "error":
+            print(f"Failed to resample {os.path.basename(full_path)} to {rate} Hz: {payload}")
+            return
+
+        payload = self._trim_tail(full_path, payload, rate) # Resampled before the analysis finished, or from the store
+        cache[full_path] = (payload, rate)
+        if elapsed is not None:
+            print(f"Resampled: {os.path.basename(full_path)} -> {rate} Hz ({elapsed * 1000:.1f} ms)")
+        if cache is self.rate_clips:
+            self._upgrade_head_playback(full_path, payload)
+        for callback in callbacks:
+            callback()
+
+    def _apply_stream_samplerate(self, rate):
+        """Switches playback to a new stream rate and prepares hotkeyed clips for it."""
+        if rate != self.stream_samplerate:
+            self.stream_samplerate = rate
+            self.rate_clips.clear()
+            self.stream_heads.clear()
+            self.replaced_heads.clear() # The engine was reset; no voice plays an old head
+        if rate == self.library_samplerate:
+            return
+
+        hotkeyed = [p for p, hotkey in self.file_hotkeys.items() if hotkey and p in self.library_files]
+        for file_path in hotkeyed:
+            self._stream_head(file_path)
+        clips = []
+        with self.pending_lock:
+            for file_path in hotkeyed:
+                entry = self.sound_cache.get(file_path)
+                if entry is None or file_path in self.rate_clips or (file_path, rate) in self.pending_decodes:
+                    continue
+                self.pending_decodes[(file_path, rate)] = []
+                clips.append((file_path, entry[0]))
+        if clips:
+            print(f"Stream runs at {rate} Hz; resampling {len(clips)} hotkeyed clips from {self.library_samplerate} Hz.")
+            self.decode_engine.submit_resample(clips, self.library_samplerate, rate,
+                                               self.stream_channels, tag=(self.load_generation, "rate", rate))
+
+    def _prewarm_head(self, file_path, samples):
+        """
+        Keeps the first `prewarm_ms` of a hotkeyed clip in RAM so a trigger starts instantly.
+        The head is counted from the trimmed start but also holds the leading silence, so
+        play positions in the head and the full clip are the same.
+        A head that is replaced may still be playing: MixEngine.replace_data matches voices
+        by identity, so it is kept in replaced_heads until _upgrade_head_playback swaps it.
+        """
+        frames = int(self.library_samplerate * self.prewarm_ms / 1000)
+        if frames > 0:
+            frames += self._trim_start_frame(file_path, self.library_samplerate)
+            old_head = self.clip_heads.get(file_path)
+            if old_head is not None and len(old_head) == min(frames, len(samples)):
+                return # Already warm (re-decoded after eviction: same samples)
+            self.clip_heads[file_path] = np.array(samples[:frames]) # Copy out of the memory map
+            old_stream_head = self.stream_heads.pop(file_path, None)
+            for head in (old_head, old_stream_head):
+                if head is not None:
+                    self.replaced_heads.setdefault(file_path, []).append(head)
+            if self.stream_samplerate != self.library_samplerate:
+                self._stream_head(file_path) # Resample it here, not on the hotkey thread at the next trigger
+
+    def _stream_head(self, file_path):
+        """
+        [Tk thread] Returns the pre-warmed head at the stream's rate (resampled on
+        first use), or None. The hotkey thread only reads stream_heads.
+        """
+        head = self.stream_heads.get(file_path)
+        if head is None:
+            library_head = self.clip_heads.get(file_path)
+            if library_head is None:
+                return None
+            head = resample_clip(library_head, self.library_samplerate, self.stream_samplerate)
+            self.stream_heads[file_path] = head
+        return head
+
+    def _upgrade_head_playback(self, file_path, samples):
+        """
+        If a pre-warmed head (the current one, or one replaced since it was
+        triggered) is playing, continues from the same position in the full
+        clip. `samples` must be at the stream's rate.
+        """
+        if self.stream_samplerate == self.library_samplerate:
+            head = self.clip_heads.get(file_path)
+        else:
+            head = self.stream_heads.get(file_path)
+        heads = self.replaced_heads.pop(file_path, [])
+        if head is not None:
+            heads.append(head)
+        if self.is_mixing:
+            for head in heads:
+                self.mix_engine.replace_data(head, samples)
+        if self.monitor_stream is not None and self.monitor_samplerate == self.stream_samplerate != self.library_samplerate:
+            for head in heads: # The monitor shares the mix's stream-rate heads (see _monitor_clip)
+                self.monitor_engine.replace_data(head, samples)
+
+    def _refresh_file_view(self):
+        """Rebuilds the file list from the index (category filter + sort order), once per idle."""
+        if not self.view_refresh_pending:
+            self.view_refresh_pending = True
+            self.after_idle(self._apply_file_view)
+
+    def _apply_file_view(self):
+        self.view_refresh_pending = False
+        category = None if self.library_category == "All" else self.library_category
+        if self.search_query:
+            # Best match first; the category filter still applies
+            paths = self.search_index.search(self.search_query, limit=self.search_limit)
+            if category is not None:
+                paths = [p for p in paths if self._in_category(p, category)]
+        else:
+            paths = self.library_index.query(category, self.library_sort)
+        self.file_list.set_paths([p for p in paths if p in self.library_files])
+        if self.search_query:
+            self.file_list.scroll_to(0)
+
+    def _in_category(self, file_path, category):
+        file_category = self.library_index.category_of(file_path)
+        return file_category == category or file_category.startswith(category + "/")
+
+    def on_search_change(self):
+        """Re-filters the list on every keystroke (the search itself takes well under 1 ms)."""
+        self.search_query = self.search_var.get().strip()
+        self._apply_file_view() # Directly, so results show in the same frame
+
+    def _refresh_categories(self):
+        """Fills the category dropdown from the index ("/" = files directly in 'Soundboard Rsc')."""
+        categories = [c or "/" for c in self.library_index.categories()]
+        self.category_dropdown.configure(values=["All"] + categories)
+        current = self.library_category if self.library_category == "All" else (self.library_category or "/")
+        if current not in categories and current != "All":
+            self.library_category = current = "All"
+            self._refresh_file_view()
+        self.category_dropdown.set(current)
+
+    def on_category_change(self, choice):
+        self.library_category = "" if choice == "/" else choice
+        self._refresh_file_view()
+
+    def on_sort_change(self, choice):
+        self.library_sort = choice
+        self._refresh_file_view()
+
+    def file_hotkey_text(self, file_path):
+        """Text of a file's hotkey button in the list."""
+        hotkey_str = self.file_hotkeys.get(file_path)
+        return f"Set ({hotkey_str})" if hotkey_str else "Set (None)"
+
+    def select_file(self, file_path):
         """Highlights the selected file in the UI."""
         self.selected_sound_key = file_path
-        theme_color = ctk.ThemeManager.theme["CTkButton"]["fg_color"]
-        for btn in self.file_buttons:
-            btn.configure(fg_color="transparent")
-        selected_button.configure(fg_color=theme_color)
+        if not self.is_clip_ready(file_path):
+            self.request_clip(file_path) # Lazy mode: start decoding on select
+        self.file_list.select(file_path)
 
-    def on_file_double_click(self, file_path, button, event):
+    def on_file_double_click(self, file_path):
         """Selects and previews a file on double-click."""
         print(f"Double-click: {file_path}")
-        self.select_file(file_path, button)
+        self.select_file(file_path)
         self.preview_sound(source="GUI")
 
     # --- 3. Audio Playback Methods ---
@@ -556,6 +1224,124 @@ class AudioMixerApp(ctk.CTk):
         self.mic_vol = self.mic_vol_slider.get()
         self.music_vol = self.music_vol_slider.get()
         self.preview_vol = self.preview_vol_slider.get()
+        if self.is_mixing:
+            # Applied by the audio thread on its next block (the engine is reset with
+            # the slider values whenever the stream starts)
+            self.mix_engine.set_volume("mic", self.mic_vol)
+            self.mix_engine.set_volume("music", self.music_vol)
+        if self.monitor_stream is not None:
+            self.monitor_engine.set_volume("music", self.preview_vol)
+
+    def on_mic_fx_change(self):
+        """Noise Gate / Compressor checkboxes; the audio thread picks them up on its next block."""
+        self.mic_gate = self.mic_gate_var.get()
+        self.mic_compressor = self.mic_compressor_var.get()
+        self._apply_dsp_settings()
+
+    def _apply_dsp_settings(self):
+        """
+        Copies the Mic FX and limiter settings into both engines. Gate and
+        compressor changes apply on the next block; the limiter's on/off and
+        look-ahead size its buffers, so those apply when a stream (re)starts.
+        """
+        chain = self.mix_engine.mic_chain
+        chain.gate.enabled = bool(self.mic_gate)
+        chain.gate.threshold_db = float(self.mic_gate_threshold_db)
+        chain.compressor.enabled = bool(self.mic_compressor)
+        chain.compressor.threshold_db = float(self.mic_compressor_threshold_db)
+        chain.compressor.ratio = max(float(self.mic_compressor_ratio), 1.0)
+        chain.compressor.makeup_db = float(self.mic_compressor_makeup_db)
+        for engine in (self.mix_engine, self.monitor_engine): # The monitor has no mic, only the limiter
+            engine.limiter.enabled = bool(self.limiter)
+            engine.limiter.ceiling_db = min(float(self.limiter_ceiling_db), 0.0)
+            engine.limiter.lookahead_ms = max(float(self.limiter_lookahead_ms), 0.1)
+
+    def start_monitor_stream(self):
+        """
+        [Tk thread] Opens the local monitor stream (default speaker) if it is not open yet.
+        It stays open for the app's lifetime, so a trigger only queues a voice.
+        Runs at the speaker's native rate (like the mix stream), or the library
+        rate if the device rejects it; clips are rate-matched by _monitor_clip.
+        Returns True if the monitor is available.
+        """
+        if self.monitor_stream is not None:
+            return True
+        if self.devices_refreshing:
+            return False # PortAudio is re-initializing
+        rates = []
+        try:
+            rates.append(int(sd.query_devices(kind='output')['default_samplerate']))
+        except Exception as e:
+            print(f"Could not read native rate of the default speaker: {e}")
+        rates.append(self.library_samplerate)
+        last_error = None
+        for rate in dict.fromkeys(rates):
+            try:
+                self.monitor_engine.samplerate = rate
+                self.monitor_engine.reset(0.0, self.preview_vol)
+                self.monitor_engine.prepare(self.max_block_frames, 2)
+                stream = sd.OutputStream(device=None, samplerate=rate, channels=2,
+                                         dtype='float32', latency='low', callback=self.monitor_callback)
+                stream.start()
+            except Exception as e:
+                last_error = e
+                continue
+            if rate != self.monitor_samplerate:
+                self.monitor_samplerate = rate
+                self.monitor_clips.clear()
+            self.monitor_stream = stream
+            print(f"Local monitor stream started ({rate} Hz, default speaker).")
+            return True
+        print(f"[!] Local monitor stream failed to open: {last_error}")
+        return False
+
+    def _monitor_clip(self, file_path, data, rate, callback=None):
+        """
+        Returns `data` (a clip or pre-warmed head at `rate`) at the monitor's rate:
+        itself, the mix stream's resampled clip or head if the mix runs at the same
+        rate, or the monitor's own resampled clip. Otherwise requests the resample,
+        runs `callback` on the Tk thread once it is ready, and returns None.
+        Safe from any thread (only reads the caches).
+        """
+        monitor_rate = self.monitor_samplerate
+        if rate == monitor_rate:
+            return data
+        for cache in (self.rate_clips, self.monitor_clips):
+            entry = cache.get(file_path)
+            if entry is not None and entry[1] == monitor_rate:
+                return entry[0]
+        if monitor_rate == self.stream_samplerate:
+            head = self.stream_heads.get(file_path)
+            if head is not None:
+                self.request_rate_clip(file_path) # The full clip replaces the head (_upgrade_head_playback)
+                return head
+        self.request_rate_clip(file_path, callback=callback, rate=monitor_rate)
+        return None
+
+    def _play_to_monitor_by_path(self, file_path, key):
+        """[Tk thread] Plays a decoded clip on the monitor, once it is at the monitor's rate (see _monitor_clip)."""
+        entry = self.sound_cache.get(file_path)
+        if entry is None:
+            return
+        data = self._monitor_clip(file_path, entry[0], entry[1],
+                                  callback=partial(self._play_to_monitor_by_path, file_path, key))
+        if data is not None:
+            self._play_to_monitor(data, key=key, gain=self.clip_gains.get(file_path, 1.0),
+                                  pos=self._trim_start_frame(file_path, self.monitor_samplerate))
+
+    def _play_to_monitor(self, data, key, gain=1.0, pos=0):
+        """
+        Layers a clip (array or StreamRing, at monitor_samplerate) onto the local
+        monitor, at 'Preview Vol' x `gain`. Safe from any thread: if the monitor
+        is closed, it is only flagged for the Tk thread to reopen.
+        """
+        if self.monitor_stream is None:
+            self.monitor_reopen = True
+            if data.__class__ is not np.ndarray:
+                data.close()
+            return
+        if not self.monitor_engine.play(data, key=key, gain=gain, pos=pos) and data.__class__ is not np.ndarray:
+            data.close()
 
     def preview_sound(self, source="GUI"):
         """Plays the *currently selected* sound to the *default speaker*."""
@@ -564,25 +1350,36 @@ class AudioMixerApp(ctk.CTk):
                 messagebox.showwarning("No File Selected", "Please select a file to preview.")
             return
 
-        try:
-            data, sr = self.sound_cache[self.selected_sound_key]
-            preview_data = data * self.preview_vol
-            np.clip(preview_data, -1.0, 1.0, out=preview_data)
+        if not self.is_clip_ready(self.selected_sound_key):
+            # Lazy mode: preview as soon as the clip is decoded
+            self.request_clip(self.selected_sound_key, callback=partial(self.preview_sound, source))
+            return
 
+        try:
             print(f"🔊 PREVIEW ({source}): {os.path.basename(self.selected_sound_key)} (Vol: {self.preview_vol:.2f})")
-            sd.play(preview_data, sr, device=None, blocking=False)
+            # A new preview replaces the previous one
+            self.monitor_engine.stop("preview")
+            if self.selected_sound_key in self.stream_clips:
+                self._play_to_monitor(open_stream_clip(self.selected_sound_key, self.monitor_samplerate, 2,
+                                                       buffer_seconds=self.stream_buffer_seconds),
+                                      key="preview", gain=self.clip_gains.get(self.selected_sound_key, 1.0))
+            else:
+                self._play_to_monitor_by_path(self.selected_sound_key, "preview")
         except Exception as e:
             if source == "GUI":
                 messagebox.showerror("Playback Error", f"Error during preview: {e}")
             else:
                 print(f"[Hotkey] Playback Error: {e}")
 
-    def _internal_play_to_mix_by_path(self, file_path, source="GUI"):
+    def _internal_play_to_mix_by_path(self, file_path, source="GUI", trace=None):
         """
         [Core Logic] Plays a sound (by path) to both:
         1. Local Monitor (Default Speaker)
         2. Mix Out (VB-Cable)
+        `trace` is the LatencyTracer id when this call was deferred until a decode finished.
         """
+        dispatch_time = time.perf_counter()
+        key_time = self.hotkey_dispatcher.event_time() # None unless called from a hotkey
         if not self.is_mixing:
             if source == "GUI":
                 messagebox.showwarning("Stream Not Started", "Please press 'Start Mic' to begin mixing.")
@@ -590,34 +1387,80 @@ class AudioMixerApp(ctk.CTk):
                 print(f"[HOTKEY ({source})] Mix stream is not running.")
             return
 
-        if not file_path or file_path not in self.sound_cache:
+        if not file_path or file_path not in self.library_files:
             if source == "GUI":
                 messagebox.showwarning("No File Selected", "Please select a file to play.")
             else:
                 print(f"[HOTKEY ({source})] Sound file not selected or not in cache.")
             return
 
-        try:
-            data, sr = self.sound_cache[file_path]
-            if sr != self.stream_samplerate:
-                print(f"Warning: Sample rate mismatch! {sr} != {self.stream_samplerate} (skipping)")
-                return
-        except Exception as e:
-            print(f"[!] Sound cache load error: {e}")
+        if trace is None:
+            trace = self.latency_tracer.begin(source, file_path, key_time, dispatch_time)
+
+        if file_path in self.stream_clips:
+            self._play_streamed_to_mix(file_path, source, trace)
             return
 
-        # 1. Play to Local Monitor (uses 'Preview Vol')
-        try:
-            monitor_data = data * self.preview_vol
-            np.clip(monitor_data, -1.0, 1.0, out=monitor_data)
-            sd.play(monitor_data, sr, device=None, blocking=False) 
-        except Exception as e:
-            print(f"[!] Local monitoring playback failed: {e}")
+        entry = self.sound_cache.get(file_path)
+        if entry is None:
+            # Not decoded yet (lazy mode or evicted from the LRU cache)
+            head = self.clip_heads.get(file_path)
+            if head is None:
+                print(f"[{source}] Decoding {os.path.basename(file_path)} on demand; it will play when ready.")
+                self.request_clip(file_path, callback=partial(self._internal_play_to_mix_by_path, file_path, source, trace))
+                return
+            # Start from the pre-warmed head; the full clip is swapped in once decoded
+            self.request_clip(file_path)
+            entry = (head, self.library_samplerate)
+        data, sr = entry
+
+        # The mix stream runs at the device's native rate; use the clip resampled to it
+        mix_data = data
+        mix_rate = sr
+        if sr != self.stream_samplerate:
+            rate_entry = self.rate_clips.get(file_path)
+            mix_rate = self.stream_samplerate
+            if rate_entry is not None:
+                mix_data = rate_entry[0]
+            else:
+                stream_head = self.stream_heads.get(file_path) # Built on the Tk thread (_prewarm_head); never here
+                if stream_head is None:
+                    print(f"[{source}] Resampling {os.path.basename(file_path)} to {self.stream_samplerate} Hz; it will play when ready.")
+                    self.request_rate_clip(file_path, callback=partial(self._internal_play_to_mix_by_path, file_path, source, trace))
+                    return
+                self.request_rate_clip(file_path)
+                mix_data = stream_head
 
-        # 2. Send to Mix Out (via thread-safe request)
-        with self.music_request_lock:
-            print(f"🎶 PLAY TO MIX ({source}): {os.path.basename(file_path)}")
-            self.music_request = (data, 0) # Set (data, position)
+        # Loudness normalization rides on the voice gain (no extra per-sample work)
+        gain = self.clip_gains.get(file_path, 1.0)
+
+        # 1. Play to Local Monitor (the same clip when the rates match, no copy; 'Preview Vol' is applied per block)
+        # Both voices start after the clip's leading silence
+        if mix_rate == self.monitor_samplerate:
+            monitor_data = mix_data
+        else:
+            monitor_data = self._monitor_clip(file_path, data, sr,
+                                              callback=partial(self._play_to_monitor_by_path, file_path, file_path))
+        if monitor_data is not None:
+            self._play_to_monitor(monitor_data, key=file_path, gain=gain,
+                                  pos=self._trim_start_frame(file_path, self.monitor_samplerate))
+
+        # 2. Send to Mix Out (layered on top of anything already playing)
+        print(f"🎶 PLAY TO MIX ({source}): {os.path.basename(file_path)}")
+        self.mix_engine.play(mix_data, key=file_path, gain=gain, pos=self._trim_start_frame(file_path, mix_rate),
+                             trace=trace)
+
+    def _play_streamed_to_mix(self, file_path, source, trace=None):
+        """Plays a long clip to Mix Out, decoding it on a reader thread while it plays."""
+        # Each engine consumes its own ring (one reader per ring, at that engine's rate)
+        self._play_to_monitor(open_stream_clip(file_path, self.monitor_samplerate, 2,
+                                               buffer_seconds=self.stream_buffer_seconds), key=file_path)
+        ring = open_stream_clip(file_path, self.stream_samplerate, self.stream_channels,
+                                buffer_seconds=self.stream_buffer_seconds)
+        print(f"🎶 STREAM TO MIX ({source}): {os.path.basename(file_path)}")
+        if not self.mix_engine.play(ring, key=file_path, trace=trace):
+            ring.close()
+            print(f"[!] Mix command queue full; {os.path.basename(file_path)} was not started.")
 
     def _internal_play_to_mix(self, source="GUI"):
         """Wrapper to play the *currently selected* file."""
@@ -631,6 +1474,14 @@ class AudioMixerApp(ctk.CTk):
         """Called by 'Play Selected' global hotkey."""
         self._internal_play_to_mix(source="Hotkey")
         
+    def play_top_result(self, source="Top Result Hotkey"):
+        """Plays the first row of the list (the best search match while searching). Safe from any thread."""
+        paths = self.file_list.paths
+        if paths:
+            self._internal_play_to_mix_by_path(paths[0], source=source)
+        else:
+            print("No search result to play.")
+
     def play_file_hotkey(self, file_path):
         """Called by an individual file's hotkey."""
         self._internal_play_to_mix_by_path(file_path, source="File Hotkey")
@@ -638,7 +1489,7 @@ class AudioMixerApp(ctk.CTk):
     # --- 4. Hotkey Registration & Capture ---
 
     def register_file_hotkey(self, file_path, new_hotkey_str, initial=False):
-        """Sets a hotkey for a specific file and rebuilds all hotkeys."""
+        """Sets a hotkey for a specific file (only this binding is re-registered)."""
         if not KEYBOARD_AVAILABLE:
             if not initial:
                 messagebox.showwarning("Keyboard Library Missing", "'keyboard' library is not installed.")
@@ -648,28 +1499,37 @@ class AudioMixerApp(ctk.CTk):
 
         # Check for duplicates
         if hotkey_to_set:
-            if hotkey_to_set == self.current_hotkey:
-                print(f"Hotkey Error: '{hotkey_to_set}' is already used by 'Play Selected'.")
+            owner = self.hotkey_owners.get(self._hotkey_index_key(hotkey_to_set))
+            if owner in GLOBAL_HOTKEY_NAMES:
+                print(f"Hotkey Error: '{hotkey_to_set}' is already used by '{GLOBAL_HOTKEY_NAMES[owner]}'.")
                 if not initial:
-                    messagebox.showerror("Duplicate Hotkey", f"'{hotkey_to_set}' is already used by 'Play Selected'.")
+                    messagebox.showerror("Duplicate Hotkey", f"'{hotkey_to_set}' is already used by '{GLOBAL_HOTKEY_NAMES[owner]}'.")
                 return 
+            if owner is not None and owner != file_path:
+                print(f"Hotkey Error: '{hotkey_to_set}' is already assigned to another file.")
+                if not initial:
+                    messagebox.showerror("Duplicate Hotkey", f"'{hotkey_to_set}' is already assigned to '{os.path.basename(owner)}'.")
+                return
 
-            for path, hotkey in self.file_hotkeys.items():
-                if path != file_path and hotkey == hotkey_to_set:
-                    print(f"Hotkey Error: '{hotkey_to_set}' is already assigned to another file.")
-                    if not initial:
-                        messagebox.showerror("Duplicate Hotkey", f"'{hotkey_to_set}' is already assigned to '{os.path.basename(path)}'.")
-                    return
-
-        # Store the new hotkey
+        # Store the new hotkey and swap just this binding
+        old_hotkey = self.file_hotkeys.get(file_path)
         self.file_hotkeys[file_path] = hotkey_to_set
+        if self.library_index is not None:
+            self.library_index.set_hotkey(file_path, hotkey_to_set)
+        self._apply_hotkey(file_path, old_hotkey, hotkey_to_set, partial(self.play_file_hotkey, file_path))
+
+        # Keep the start of hotkeyed clips warm
+        if not hotkey_to_set:
+            self.clip_heads.pop(file_path, None)
+            self.stream_heads.pop(file_path, None)
+            self.replaced_heads.pop(file_path, None)
+        elif file_path in self.sound_cache:
+            self._prewarm_head(file_path, self.sound_cache[file_path][0])
+        elif file_path in self.library_files and file_path not in self.stream_clips:
+            self.request_clip(file_path)
         
         # Update UI
-        if file_path in self.file_hotkey_buttons:
-            if not hotkey_to_set:
-                self.file_hotkey_buttons[file_path].configure(text="Set (None)")
-            else:
-                self.file_hotkey_buttons[file_path].configure(text=f"Set ({hotkey_to_set})")
+        self.file_list.refresh_row(file_path)
 
         if not initial:
             if hotkey_to_set:
@@ -677,43 +1537,50 @@ class AudioMixerApp(ctk.CTk):
                 messagebox.showinfo("Hotkey Set", f"Hotkey '{hotkey_to_set}' was set.")
             else:
                 print(f"File hotkey cleared: {os.path.basename(file_path)}")
-        
-        # Re-register all hotkeys
-        self.rebuild_all_hotkeys()
 
-    def register_hotkey(self, new_hotkey=None, initial=False):
-        """Sets the global 'Play Selected' hotkey and rebuilds all hotkeys."""
+    def register_hotkey(self, new_hotkey=None, initial=False, binding_id=PLAY_SELECTED_ID):
+        """
+        Sets a global hotkey: 'Play Selected' or, with binding_id=PLAY_TOP_RESULT_ID,
+        'Play Top Result' (only this binding is re-registered).
+        """
         if not KEYBOARD_AVAILABLE:
             if not initial:
                 messagebox.showwarning("Keyboard Library Missing", "'keyboard' library is not installed.")
             return
+
+        if binding_id == PLAY_TOP_RESULT_ID:
+            attr, button, action = "search_hotkey", self.search_hotkey_btn, self.play_top_result
+        else:
+            attr, button, action = "current_hotkey", self.hotkey_btn, self.play_to_mix_hotkey
         
-        hotkey_to_set = self.current_hotkey
+        hotkey_to_set = getattr(self, attr)
         if new_hotkey is not None:
             hotkey_to_set = new_hotkey.strip().lower()
 
         # Check for duplicates
-        if hotkey_to_set and hotkey_to_set in self.file_hotkeys.values():
-            print(f"Hotkey Error: '{hotkey_to_set}' is already assigned to a file.")
+        owner = self.hotkey_owners.get(self._hotkey_index_key(hotkey_to_set)) if hotkey_to_set else None
+        if owner is not None and owner != binding_id:
+            used_by = f"'{GLOBAL_HOTKEY_NAMES[owner]}'" if owner in GLOBAL_HOTKEY_NAMES else "a file"
+            print(f"Hotkey Error: '{hotkey_to_set}' is already assigned to {used_by}.")
             if not initial:
-                messagebox.showerror("Duplicate Hotkey", f"Hotkey '{hotkey_to_set}' is already assigned to a file.")
+                messagebox.showerror("Duplicate Hotkey", f"Hotkey '{hotkey_to_set}' is already assigned to {used_by}.")
             return
 
-        self.current_hotkey = hotkey_to_set
+        old_hotkey = getattr(self, attr)
+        setattr(self, attr, hotkey_to_set)
+        self._apply_hotkey(binding_id, old_hotkey, hotkey_to_set, action)
         
         if not hotkey_to_set:
-            self.hotkey_btn.configure(text="Set (None)")
+            button.configure(text="Set (None)")
         else:
-            self.hotkey_btn.configure(text=f"Set ({hotkey_to_set})")
+            button.configure(text=f"Set ({hotkey_to_set})")
             
         if not initial:
             if hotkey_to_set:
-                print(f"Global hotkey set: '{hotkey_to_set}'")
+                print(f"Global hotkey set: '{hotkey_to_set}' ({GLOBAL_HOTKEY_NAMES[binding_id]})")
                 messagebox.showinfo("Hotkey Set", f"Hotkey '{hotkey_to_set}' was set.")
             else:
-                print("Global hotkey cleared.")
-
-        self.rebuild_all_hotkeys()
+                print(f"Global hotkey cleared ({GLOBAL_HOTKEY_NAMES[binding_id]}).")
         
     def open_hotkey_capture_window(self, hotkey_type, file_path=None):
         """Opens the modal popup window to capture a new hotkey."""
@@ -731,9 +1598,11 @@ class AudioMixerApp(ctk.CTk):
         # Disable the button that was clicked
         if hotkey_type == "mix":
             self.hotkey_btn.configure(state="disabled", text="Recording...")
+        elif hotkey_type == "search":
+            self.search_hotkey_btn.configure(state="disabled", text="Recording...")
         elif hotkey_type == "file":
-            if file_path and file_path in self.file_hotkey_buttons:
-                self.file_hotkey_buttons[file_path].configure(state="disabled", text="Recording...")
+            if file_path and file_path in self.file_list:
+                self.file_list.set_row_state(file_path, "Recording...", state="disabled")
             else:
                 print(f"Error: Could not find button for file: {file_path}")
                 return
@@ -767,6 +1636,8 @@ class AudioMixerApp(ctk.CTk):
             print("Hotkey clear signal (Escape) detected.")
             if self.current_capture_type == "mix":
                 self.register_hotkey(new_hotkey="")
+            elif self.current_capture_type == "search":
+                self.register_hotkey(new_hotkey="", binding_id=PLAY_TOP_RESULT_ID)
             elif self.current_capture_type == "file":
                 self.register_file_hotkey(self.current_capture_file_path, new_hotkey_str="")
             
@@ -830,6 +1701,8 @@ class AudioMixerApp(ctk.CTk):
 
             if self.current_capture_type == "mix":
                 self.register_hotkey(new_hotkey=new_hotkey_str)
+            elif self.current_capture_type == "search":
+                self.register_hotkey(new_hotkey=new_hotkey_str, binding_id=PLAY_TOP_RESULT_ID)
             elif self.current_capture_type == "file":
                 self.register_file_hotkey(self.current_capture_file_path, new_hotkey_str)
         else:
@@ -848,13 +1721,14 @@ class AudioMixerApp(ctk.CTk):
         if self.current_capture_type == "mix":
             hotkey_str = self.current_hotkey or "None"
             self.hotkey_btn.configure(state="normal", text=f"Set ({hotkey_str})")
+
+        elif self.current_capture_type == "search":
+            self.search_hotkey_btn.configure(state="normal", text=f"Set ({self.search_hotkey or 'None'})")
         
         elif self.current_capture_type == "file":
             file_path = self.current_capture_file_path
-            if file_path and file_path in self.file_hotkey_buttons:
-                hotkey_str = self.file_hotkeys.get(file_path, "None")
-                if not hotkey_str: hotkey_str = "None"
-                self.file_hotkey_buttons[file_path].configure(state="normal", text=f"Set ({hotkey_str})")
+            if file_path and file_path in self.file_list:
+                self.file_list.set_row_state(file_path, None) # Back to "Set (hotkey)"
         
         self.current_capture_type = None
         self.current_capture_file_path = None
@@ -864,40 +1738,6 @@ class AudioMixerApp(ctk.CTk):
             
     # --- Hotkey Press/Release Handlers (for repeat prevention) ---
     
-    def on_mix_key_press(self, keyboard_event, required_mods):
-        """'Play Selected' hotkey *press* handler."""
-        if self.mix_hotkey_down:
-            return # Key is already held down
-        
-        # Check if all required modifier keys are also pressed
-        for mod in required_mods:
-            if not keyboard.is_pressed(mod):
-                return # Required modifier not pressed
-        
-        self.mix_hotkey_down = True
-        self.play_to_mix_hotkey()
-
-    def on_mix_key_release(self, keyboard_event):
-        """'Play Selected' hotkey *release* handler."""
-        self.mix_hotkey_down = False
-
-    def on_file_key_press(self, keyboard_event, file_path, required_mods, callback):
-        """Individual file hotkey *press* handler."""
-        if self.file_hotkey_down_flags.get(file_path, False):
-            return # Key is already held down
-        
-        for mod in required_mods:
-            if not keyboard.is_pressed(mod):
-                return # Required modifier not pressed
-        
-        self.file_hotkey_down_flags[file_path] = True
-        callback() 
-
-    def on_file_key_release(self, keyboard_event, file_path):
-        """Individual file hotkey *release* handler."""
-        if file_path in self.file_hotkey_down_flags:
-            self.file_hotkey_down_flags[file_path] = False
-
     # --- 5. Audio Stream Control ---
     
     def toggle_mix(self):
@@ -908,11 +1748,19 @@ class AudioMixerApp(ctk.CTk):
                 self.stream.stop()
                 self.stream.close()
                 self.stream = None
-            with self.music_lock:
-                self.music_data = None
+            print(f"Mix commands: {self.mix_engine.dropped_commands} dropped, "
+                  f"{self.mix_engine.late_commands} late.")
+            if self.mix_engine.stream_underruns:
+                print(f"Streaming voices ran dry {self.mix_engine.stream_underruns} times (slow disk/decoder).")
+            self._log_audio_stats()
             self.start_stop_btn.configure(text="🔴 Start Mic", fg_color="#006400", hover_color="#008000")
+            self.latency_label.configure(text="Stream stopped")
+            self.active_latency_profile = None
             print("⏹️ MIX STREAM STOPPED")
         else:
+            if self.devices_refreshing:
+                print("Audio devices are refreshing; try again in a moment.")
+                return
             if self.mix_out_device_id is None:
                 messagebox.showwarning("Device Not Selected", "A 'Mix Out' device (e.g., VB-Cable) must be selected.")
                 return
@@ -939,81 +1787,231 @@ class AudioMixerApp(ctk.CTk):
 
                 print(f"Attempting stream: In={input_device}({input_channels}ch), Out={output_device}({output_channels}ch)")
 
-                self.stream = sd.Stream(
-                    device=(input_device, output_device),
-                    samplerate=self.stream_samplerate,
-                    channels=(input_channels, output_channels),
-                    callback=self.audio_callback,
-                    dtype='float32'
-                )
+                self.stream = self._open_mix_stream(input_device, input_channels, output_device, output_channels)
+                self._apply_stream_samplerate(int(self.stream.samplerate))
                 
                 self.stream.start()
                 self.is_mixing = True
                 self.start_stop_btn.configure(text="⏹️ Stop Mic", fg_color="#8B0000", hover_color="#B22222")
+                self._show_stream_latency()
                 print(f"▶️ MIX STREAM STARTED (Mic: {self.mic_device_id} -> Out: {self.mix_out_device_id})")
                 
             except Exception as e:
-                messagebox.showerror("Stream Error", f"Failed to start audio stream: {e}\n\nCheck if devices support 44100Hz or if the correct devices are selected.")
+                messagebox.showerror("Stream Error", f"Failed to start audio stream: {e}\n\nCheck if the correct devices are selected.")
+
+    def _open_mix_stream(self, input_device, input_channels, output_device, output_channels):
+        """
+        Opens the mix stream at the output device's native sample rate with
+        the selected latency profile. If the device rejects it, tries the mic's
+        native rate and the library rate, then the next safer profile
+        ("ultra" -> "low" -> "safe").
+        """
+        start = LATENCY_PROFILE_ORDER.index(self.latency_profile) if self.latency_profile in LATENCY_PROFILES else -1
+        last_error = None
+
+        rates = []
+        for device_id in (output_device, input_device):
+            if device_id is None:
+                continue
+            try:
+                rates.append(int(sd.query_devices(device_id)['default_samplerate']))
+            except Exception as e:
+                print(f"Could not read native rate of device {device_id}: {e}")
+        rates.append(self.library_samplerate)
+        rates = list(dict.fromkeys(rates)) # Dedupe, keep order
+
+        for profile_name in LATENCY_PROFILE_ORDER[start:]:
+            profile = LATENCY_PROFILES[profile_name]
+            extra_settings = None
+            if profile["exclusive"]:
+                extra_settings = (self._wasapi_exclusive_settings(input_device),
+                                  self._wasapi_exclusive_settings(output_device))
+                if extra_settings == (None, None):
+                    extra_settings = None
+
+            for rate in rates:
+                try:
+                    self.mix_engine.samplerate = rate
+                    self.mix_engine.reset(self.mic_vol, self.music_vol)
+                    self.mix_engine.prepare(max(profile["blocksize"], self.max_block_frames), output_channels)
+                    self.callback_stats.reset()
+                    self.stats_meter_seen = self.stats_log_seen = 0
+                    self.stats_log_time = time.monotonic()
+
+                    stream = sd.Stream(
+                        device=(input_device, output_device),
+                        samplerate=rate,
+                        blocksize=profile["blocksize"],
+                        latency=profile["latency"],
+                        extra_settings=extra_settings,
+                        channels=(input_channels, output_channels),
+                        callback=self.audio_callback,
+                        dtype='float32'
+                    )
+                    if profile_name != self.latency_profile:
+                        print(f"[!] Latency profile '{self.latency_profile}' rejected ({last_error}); using '{profile_name}'.")
+                    self.active_latency_profile = profile_name
+                    return stream
+                except Exception as e:
+                    print(f"Stream open failed ({profile_name}, {rate} Hz): {e}")
+                    last_error = e
+
+        raise last_error
+
+    def _wasapi_exclusive_settings(self, device_id):
+        """Returns WasapiSettings(exclusive=True) if the device is on WASAPI, else None."""
+        if device_id is None or not hasattr(sd, "WasapiSettings"):
+            return None
+        try:
+            hostapi = sd.query_hostapis(sd.query_devices(device_id)['hostapi'])
+            if hostapi['name'] == 'Windows WASAPI':
+                return sd.WasapiSettings(exclusive=True)
+        except Exception as e:
+            print(f"WASAPI check failed for device {device_id} (ignoring): {e}")
+        return None
 
-    def audio_callback(self, indata, outdata, frames, time, status):
+    def _show_stream_latency(self):
+        """Displays the latency the running stream actually reports."""
+        try:
+            in_latency, out_latency = self.stream.latency
+            self.mix_engine.output_delay = out_latency # DAC estimate until the callback reports DAC times
+            blocksize = self.stream.blocksize or "auto"
+            text = (f"{self.active_latency_profile}: in {in_latency * 1000:.1f} ms, "
+                    f"out {out_latency * 1000:.1f} ms (block {blocksize}, {self.stream.samplerate / 1000:g} kHz)")
+            if self.mix_engine.limiter.active:
+                text += f" + limiter {self.mix_engine.limiter.latency_seconds * 1000:.1f} ms"
+        except Exception as e:
+            text = f"{self.active_latency_profile}: latency unknown"
+            print(f"Could not read stream latency: {e}")
+        if self.active_latency_profile != self.latency_profile:
+            text += " [fallback]"
+        self.latency_label.configure(text=text)
+        print(f"Stream latency: {text}")
+
+    def _poll_audio_stats(self):
+        """[Tk thread] Updates the load meter from CallbackStats and logs a summary every stats_log_seconds."""
+        if self.is_closing:
+            return
+        if self.is_mixing:
+            stats = self.callback_stats.snapshot(since=self.stats_meter_seen)
+            self.stats_meter_seen = stats["callbacks"]
+            xruns = sum(stats["xruns"].values())
+            self.load_meter.set(min(stats["load_peak"], 1.0))
+            warn = stats["load_peak"] > 0.7 or stats["xrun_blocks"]
+            self.load_meter.configure(progress_color="#B22222" if warn else self.load_meter_color)
+            self.load_label.configure(text=f"{stats['load_mean']:.0%} avg, {stats['load_peak']:.0%} peak | "
+                                           f"{stats['voices']} voices | {xruns} xruns")
+            if self.stats_log_seconds and time.monotonic() - self.stats_log_time >= self.stats_log_seconds:
+                self._log_audio_stats()
+        elif self.stats_meter_seen is not None:
+            self.stats_meter_seen = None # Stopped; reset on the next stream open
+            self.load_meter.set(0.0)
+            self.load_meter.configure(progress_color=self.load_meter_color)
+            self.load_label.configure(text="Stream stopped")
+        self.after(500, self._poll_audio_stats)
+
+    def _log_audio_stats(self):
+        """Prints the audio thread's load since the last summary, and its totals since the stream started."""
+        stats = self.callback_stats.snapshot(since=self.stats_log_seen)
+        self.stats_log_seen = stats["callbacks"]
+        self.stats_log_time = time.monotonic()
+        if not stats["callbacks"]:
+            return
+        xruns = ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in stats["xruns"].items() if count)
+        if xruns:
+            xruns += f" (last: {self.callback_stats.last_xrun})"
+        print(f"Audio thread: load {stats['load_mean']:.0%} avg / {stats['load_p99']:.0%} p99 / "
+              f"{stats['load_peak']:.0%} peak, up to {stats['voices_peak']} voices over the last {stats['blocks']} blocks; "
+              f"since start: {stats['callbacks']} callbacks, {stats['late_blocks']} late "
+              f"(max load {stats['max_load']:.0%}), xruns: {xruns or 'none'}")
+
+    # --- Latency Traces (trigger -> DAC, see LatencyTracer) ---
+
+    def open_latency_traces(self):
+        """Opens (or focuses) the window with latency statistics of recent plays."""
+        if self.trace_window and self.trace_window.winfo_exists():
+            self.trace_window.focus()
+            return
+        self.trace_window = ctk.CTkToplevel(self)
+        self.trace_window.title("Latency Traces")
+        self.trace_window.geometry("720x520")
+        self.trace_text = ctk.CTkTextbox(self.trace_window, font=ctk.CTkFont(family="Courier", size=12), wrap="none")
+        self.trace_text.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        buttons = ctk.CTkFrame(self.trace_window, fg_color="transparent")
+        buttons.pack(fill="x", padx=10, pady=(0, 10))
+        ctk.CTkButton(buttons, text="Export CSV...", command=self.export_latency_traces).pack(side="left")
+        ctk.CTkButton(buttons, text="Clear", width=80, command=self._clear_latency_traces).pack(side="left", padx=10)
+        self._refresh_latency_traces()
+
+    def _refresh_latency_traces(self):
+        """Re-renders the trace window once a second while it is open."""
+        if self.is_closing or not (self.trace_window and self.trace_window.winfo_exists()):
+            return
+        self.trace_text.configure(state="normal")
+        self.trace_text.delete("1.0", "end")
+        self.trace_text.insert("1.0", self._format_latency_traces())
+        self.trace_text.configure(state="disabled")
+        self.after(1000, self._refresh_latency_traces)
+
+    def _format_latency_traces(self):
+        traces = self.latency_tracer.traces()
+        if not traces:
+            return "No plays traced yet. Start the mix and press a hotkey."
+        segments = LatencyTracer.segments(traces)
+        lines = [f"{len(traces)} recent plays (times in ms)", "",
+                 f"{'stage':<18} {'count':>6} {'p50':>8} {'p95':>8} {'max':>8}"]
+        for name, values in segments.items():
+            if len(values):
+                p50, p95 = np.percentile(values, [50, 95]) * 1000
+                lines.append(f"{name:<18} {len(values):>6} {p50:>8.1f} {p95:>8.1f} {values.max() * 1000:>8.1f}")
+
+        lines += ["", "Total (first stage -> DAC, or -> block without a DAC time):"]
+        edges = list(TRACE_HISTOGRAM_MS) + [np.inf]
+        counts, _ = np.histogram(segments["total"] * 1000, bins=edges)
+        scale = 40 / max(counts.max(), 1)
+        for low, high, count in zip(edges, edges[1:], counts):
+            label = f"{low:>4}-{high:<4}" if high != np.inf else f"{low:>4}+    "
+            lines.append(f"  {label} | {'#' * int(round(count * scale)):<40} {count}")
+
+        lines += ["", f"{'#':>6}  {'source':<18} " + " ".join(f"{stage:>8}" for stage in TRACE_STAGES) + "  clip"]
+        for trace, source, path, offsets in reversed(traces[-20:]):
+            cells = " ".join(f"{offsets[stage] * 1000:>8.1f}" if stage in offsets else f"{'-':>8}"
+                             for stage in TRACE_STAGES)
+            lines.append(f"{trace:>6}  {source[:18]:<18} {cells}  {os.path.basename(path)}")
+        return "\n".join(lines)
+
+    def export_latency_traces(self):
+        path = filedialog.asksaveasfilename(parent=self.trace_window, title="Export Latency Traces",
+                                            defaultextension=".csv", initialfile="latency_traces.csv",
+                                            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            rows = self.latency_tracer.export_csv(path)
+            print(f"[*] Exported {rows} latency traces to {path}")
+        except Exception as e:
+            messagebox.showerror("Export Failed", f"Could not write {path}: {e}", parent=self.trace_window)
+
+    def _clear_latency_traces(self):
+        self.latency_tracer.clear()
+        self.trace_text.configure(state="normal")
+        self.trace_text.delete("1.0", "end")
+        self.trace_text.configure(state="disabled")
+
+    def audio_callback(self, indata, outdata, frames, time_info, status):
         """
         High-priority audio thread.
         This function MUST complete very quickly to avoid audio glitches.
+        Nothing is printed here (that could cause more glitches): timing and
+        xrun flags go to CallbackStats, read by _poll_audio_stats.
+        The body is MixEngine.callback, which benchmarks/bench_mixer.py drives too.
         """
-        if status:
-            print(status, file=sys.stderr)
-        
-        outdata[:] = 0.0 # Clear output buffer
-        
-        # 1. Check for a new sound effect request from the main thread
-        with self.music_request_lock:
-            if self.music_request is not None:
-                # If new request, transfer it to the main playback variables
-                with self.music_lock: 
-                    self.music_data, self.music_play_pos = self.music_request
-                self.music_request = None
-        
-        # 2. Mix in microphone data (if active)
-        if self.mic_device_id is not None and indata.shape[0] > 0:
-            mic_chunk = indata * self.mic_vol
-            in_channels = indata.shape[1]
-            out_channels = outdata.shape[1]
-            
-            # Handle channel mapping (mono->stereo, etc.)
-            if in_channels == 1 and out_channels == 2:
-                mic_chunk = np.column_stack((mic_chunk, mic_chunk))
-            elif in_channels == 2 and out_channels == 1:
-                mic_chunk = np.mean(mic_chunk, axis=1, keepdims=True)
-            elif in_channels > 2 and out_channels == 2:
-                mic_chunk = mic_chunk[:, :2]
-            elif in_channels != out_channels: 
-                if out_channels == 2:
-                    mic_chunk = np.column_stack((indata[:, 0], indata[:, 0])) * self.mic_vol
-                else:
-                    mic_chunk = indata[:, 0].reshape(-1, 1) * self.mic_vol
+        mic_in = indata if self.mic_device_id is not None else None
+        self.mix_engine.callback(mic_in, outdata, frames, time_info, status)
 
-            # Add mic data to output
-            if mic_chunk.shape[1] == out_channels:
-                valid_frames = min(outdata.shape[0], mic_chunk.shape[0])
-                outdata[:valid_frames] = mic_chunk[:valid_frames]
-            
-        # 3. Mix in sound effect data (if playing)
-        with self.music_lock:
-            if self.music_data is not None:
-                chunk_size = frames
-                remaining = len(self.music_data) - self.music_play_pos
-                
-                if remaining > 0:
-                    play_size = min(chunk_size, remaining)
-                    music_chunk = self.music_data[self.music_play_pos : self.music_play_pos + play_size]
-                    outdata[:play_size] += (music_chunk * self.music_vol)
-                    self.music_play_pos += play_size
-                else:
-                    self.music_data = None
-                    self.music_play_pos = 0
-
-        # Clip final output to prevent audio artifacts
-        np.clip(outdata, -1.0, 1.0, out=outdata)
+    def monitor_callback(self, outdata, frames, time_info, status):
+        """Audio thread of the local monitor stream (voices only, no mic)."""
+        self.monitor_engine.process(None, outdata, frames)
 
     # --- 6. App Shutdown & Settings ---
     
@@ -1037,10 +2035,22 @@ class AudioMixerApp(ctk.CTk):
         if self.is_mixing and self.stream:
             self.stream.stop()
             self.stream.close()
+
+        if self.monitor_stream is not None:
+            self.monitor_stream.stop()
+            self.monitor_stream.close()
+            self.monitor_stream = None
         
         if KEYBOARD_AVAILABLE:
-            # All hotkeys are unhooked by rebuild_all_hotkeys on next launch
-            pass 
+            self.hotkey_dispatcher.stop()
+
+        if self.decode_engine:
+            self.decode_engine.shutdown()
+        self.device_watcher.stop()
+        if self.folder_watcher is not None:
+            self.folder_watcher.stop()
+        if self.library_index is not None:
+            self.library_index.close()
                 
         self.destroy()
 
@@ -1059,8 +2069,43 @@ class AudioMixerApp(ctk.CTk):
             self.mic_vol = settings.get("mic_vol", self.mic_vol)
             self.music_vol = settings.get("music_vol", self.music_vol)
             self.preview_vol = settings.get("preview_vol", self.preview_vol)
+            self.max_voices = settings.get("max_voices", self.max_voices)
+            self.latency_profile = settings.get("latency_profile", self.latency_profile)
+            if self.latency_profile not in LATENCY_PROFILES:
+                print(f"[!] Unknown latency profile '{self.latency_profile}', using 'safe'.")
+                self.latency_profile = "safe"
+            self.voice_steal_policy = settings.get("voice_steal_policy", self.voice_steal_policy)
             self.current_hotkey = settings.get("mix_hotkey", self.current_hotkey)
+            self.search_hotkey = settings.get("search_hotkey", self.search_hotkey)
             self.file_hotkeys = settings.get("file_hotkeys", {})
+            self.decode_workers = settings.get("decode_workers", self.decode_workers)
+            self.pcm_disk_cache = settings.get("pcm_disk_cache", self.pcm_disk_cache)
+            self.lazy_load = settings.get("lazy_load", self.lazy_load)
+            self.clip_cache_mb = settings.get("clip_cache_mb", self.clip_cache_mb)
+            self.prewarm_ms = settings.get("prewarm_ms", self.prewarm_ms)
+            self.stream_min_seconds = settings.get("stream_min_seconds", self.stream_min_seconds)
+            self.stream_buffer_seconds = settings.get("stream_buffer_seconds", self.stream_buffer_seconds)
+            self.library_category = settings.get("library_category", self.library_category)
+            self.library_sort = settings.get("library_sort", self.library_sort)
+            self.loudness_normalize = settings.get("loudness_normalize", self.loudness_normalize)
+            self.loudness_target_lufs = settings.get("loudness_target_lufs", self.loudness_target_lufs)
+            self.true_peak_ceiling_db = settings.get("true_peak_ceiling_db", self.true_peak_ceiling_db)
+            self.max_normalize_boost_db = settings.get("max_normalize_boost_db", self.max_normalize_boost_db)
+            self.trim_silence = settings.get("trim_silence", self.trim_silence)
+            self.silence_threshold_db = settings.get("silence_threshold_db", self.silence_threshold_db)
+            self.stats_log_seconds = settings.get("stats_log_seconds", self.stats_log_seconds)
+            self.mic_gate = settings.get("mic_gate", self.mic_gate)
+            self.mic_gate_threshold_db = settings.get("mic_gate_threshold_db", self.mic_gate_threshold_db)
+            self.mic_compressor = settings.get("mic_compressor", self.mic_compressor)
+            self.mic_compressor_threshold_db = settings.get("mic_compressor_threshold_db",
+                                                            self.mic_compressor_threshold_db)
+            self.mic_compressor_ratio = settings.get("mic_compressor_ratio", self.mic_compressor_ratio)
+            self.mic_compressor_makeup_db = settings.get("mic_compressor_makeup_db", self.mic_compressor_makeup_db)
+            self.limiter = settings.get("limiter", self.limiter)
+            self.limiter_ceiling_db = settings.get("limiter_ceiling_db", self.limiter_ceiling_db)
+            self.limiter_lookahead_ms = settings.get("limiter_lookahead_ms", self.limiter_lookahead_ms)
+            if self.library_sort not in LibraryIndex.SORT_ORDERS:
+                self.library_sort = "Name"
 
             # Device names are loaded temporarily; applied after devices are listed
             self.saved_mic_name = settings.get("mic_device_name")
@@ -1075,15 +2120,46 @@ class AudioMixerApp(ctk.CTk):
         """Saves current app settings to config.json."""
         print(f"[*] Saving settings to {self.config_file}...")
         settings = {
-            "mic_device_name": self.mic_in_dropdown.get(),
-            "mix_out_device_name": self.mix_out_dropdown.get(),
+            # Keep the saved names if the device scan hasn't finished yet
+            "mic_device_name": self.mic_in_dropdown.get() if self.device_map else self.saved_mic_name,
+            "mix_out_device_name": self.mix_out_dropdown.get() if self.device_map else self.saved_mix_out_name,
             
             "mic_vol": self.mic_vol_slider.get(),
             "music_vol": self.music_vol_slider.get(),
             "preview_vol": self.preview_vol_slider.get(),
+            "max_voices": self.max_voices,
+            "latency_profile": self.latency_profile,
+            "voice_steal_policy": self.voice_steal_policy,
             
             "mix_hotkey": self.current_hotkey,
-            "file_hotkeys": self.file_hotkeys
+            "search_hotkey": self.search_hotkey,
+            "file_hotkeys": self.file_hotkeys,
+
+            "decode_workers": self.decode_workers,
+            "pcm_disk_cache": self.pcm_disk_cache,
+            "lazy_load": self.lazy_load,
+            "clip_cache_mb": self.clip_cache_mb,
+            "prewarm_ms": self.prewarm_ms,
+            "stream_min_seconds": self.stream_min_seconds,
+            "stream_buffer_seconds": self.stream_buffer_seconds,
+            "library_category": self.library_category,
+            "library_sort": self.library_sort,
+            "loudness_normalize": self.loudness_normalize,
+            "loudness_target_lufs": self.loudness_target_lufs,
+            "true_peak_ceiling_db": self.true_peak_ceiling_db,
+            "max_normalize_boost_db": self.max_normalize_boost_db,
+            "trim_silence": self.trim_silence,
+            "silence_threshold_db": self.silence_threshold_db,
+            "stats_log_seconds": self.stats_log_seconds,
+            "mic_gate": self.mic_gate,
+            "mic_gate_threshold_db": self.mic_gate_threshold_db,
+            "mic_compressor": self.mic_compressor,
+            "mic_compressor_threshold_db": self.mic_compressor_threshold_db,
+            "mic_compressor_ratio": self.mic_compressor_ratio,
+            "mic_compressor_makeup_db": self.mic_compressor_makeup_db,
+            "limiter": self.limiter,
+            "limiter_ceiling_db": self.limiter_ceiling_db,
+            "limiter_lookahead_ms": self.limiter_lookahead_ms
         }
         
         try:
@@ -1096,6 +2172,9 @@ class AudioMixerApp(ctk.CTk):
 
 # --- Application Entry Point ---
 if __name__ == "__main__":
+    # Required for the decode process pool in a PyInstaller .exe
+    multiprocessing.freeze_support()
+
     if is_admin():
         if KEYBOARD_AVAILABLE:
             print("---")
@@ -0,0 +1,677 @@
+"""
+Real-time mixing engine for the soundboard.
+
+MixEngine.process() is the body of the PortAudio callback. This module has
+no UI or sounddevice imports, so the engine can also be driven offline.
+"""
+import csv
+import math
+import time
+import itertools
+import threading
+
+import numpy as np
+
+from dsp import MicChain, TruePeakLimiter
+
+STEAL_OLDEST = "oldest"
+STEAL_QUIETEST = "quietest"
+
+# Most memory one process() call may hold allocated at any moment, in bytes. It is never a
+# sample buffer, only short-lived Python objects: a slice view per voice, the voices' new
+# positions, a float. Fixed, whatever the block size (checked by the benchmarks).
+BLOCK_ALLOC_BUDGET = 768
+
+# --- Commands (UI/hotkey threads -> audio thread) ---
+
+CMD_PLAY = 1        # data=clip, pos=start frame, value=gain, key=voice key, trace=LatencyTracer id
+CMD_STOP = 2        # key=voice key to stop, or None for all voices
+CMD_SET_VOLUME = 3  # key="mic" or "music", value=volume
+CMD_REPLACE = 4     # data=new clip, key=old clip (swapped in place, same position)
+
+# Slot layout: [op, data, pos, value, key, enqueue time, trace id]
+_OP, _DATA, _POS, _VALUE, _KEY, _STAMP, _TRACE = range(7)
+
+
+class CommandRing:
+    """
+    Preallocated single-producer/single-consumer command queue.
+
+    Only the producer writes `tail` and only the consumer writes `head`.
+    Both are plain int stores (atomic under the GIL) and a slot is always
+    filled before `tail` moves past it, so neither side ever blocks.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.slots = [[0, None, 0, 0.0, None, 0.0, None] for _ in range(capacity)]
+        self.head = 0 # Next slot to read (consumer)
+        self.tail = 0 # Next slot to write (producer)
+        self.dropped = 0 # Commands rejected because the ring was full
+
+    def push(self, op, data=None, pos=0, value=0.0, key=None, trace=None):
+        """[Producer] Returns False (and counts a drop) if the ring is full."""
+        tail = self.tail
+        if tail - self.head >= self.capacity:
+            self.dropped += 1
+            return False
+        slot = self.slots[tail % self.capacity]
+        slot[_OP] = op
+        slot[_DATA] = data
+        slot[_POS] = pos
+        slot[_VALUE] = value
+        slot[_KEY] = key
+        slot[_TRACE] = trace
+        slot[_STAMP] = time.perf_counter()
+        self.tail = tail + 1
+        return True
+
+
+class CommandBus:
+    """
+    One CommandRing per producer thread (Tk thread, keyboard hook thread, ...),
+    so every ring keeps exactly one producer. The audio thread drains all of them.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.rings = () # Read by the audio thread; replaced (never mutated) on registration
+        self._by_thread = {}
+        self._register_lock = threading.Lock() # Only taken the first time a thread sends
+
+    def push(self, op, data=None, pos=0, value=0.0, key=None, trace=None):
+        ring = self._by_thread.get(threading.get_ident())
+        if ring is None:
+            with self._register_lock:
+                ring = CommandRing(self.capacity)
+                self._by_thread[threading.get_ident()] = ring
+                self.rings = self.rings + (ring,)
+        return ring.push(op, data, pos, value, key, trace)
+
+    @property
+    def dropped(self):
+        return sum(ring.dropped for ring in self.rings)
+
+    def clear(self):
+        """Discards queued commands. Only safe while the audio thread is not running."""
+        for ring in self.rings:
+            for slot in ring.slots:
+                slot[_DATA] = None
+                slot[_KEY] = None
+                slot[_TRACE] = None
+            ring.head = ring.tail
+
+
+class StreamRing:
+    """
+    Single-producer/single-consumer float32 sample ring for a streaming voice.
+
+    A reader thread (see audio_loader.open_stream_clip) decodes a long clip
+    block by block and write()s it in; the audio thread read_into()s its
+    scratch buffer. Like CommandRing, each side only moves its own counter,
+    so neither side ever blocks. Memory is fixed at `capacity` frames no
+    matter how long the clip is.
+    """
+
+    def __init__(self, capacity, channels):
+        self.capacity = int(capacity)
+        self.channels = channels
+        self.buffer = np.zeros((self.capacity, channels), dtype=np.float32)
+        self.write_pos = 0 # Frames written so far (producer)
+        self.read_pos = 0  # Frames read so far (consumer)
+        self.eof = False    # Set by the producer after the last frame
+        self.closed = False # Set by the consumer (voice stopped); the producer quits
+        self.underruns = 0  # Blocks where the reader had fallen behind
+
+    @property
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    @property
+    def writable(self):
+        return self.capacity - (self.write_pos - self.read_pos)
+
+    @property
+    def finished(self):
+        return self.eof and self.write_pos == self.read_pos
+
+    def close(self):
+        self.closed = True
+
+    def write(self, block):
+        """[Producer] Copies as much of `block` as fits; returns the number of frames written."""
+        frames = min(len(block), self.writable)
+        start = self.write_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        self.buffer[start:start + first] = block[:first]
+        if frames > first:
+            self.buffer[:frames - first] = block[first:frames]
+        self.write_pos += frames
+        return frames
+
+    def read_into(self, out, frames):
+        """[Consumer] Copies up to `frames` into out[:n] without allocating; returns n."""
+        frames = min(frames, self.write_pos - self.read_pos)
+        if frames <= 0:
+            return 0
+        start = self.read_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        np.copyto(out[:first], self.buffer[start:start + first])
+        if frames > first:
+            np.copyto(out[first:frames], self.buffer[:frames - first])
+        self.read_pos += frames
+        return frames
+
+    def peek(self, frames):
+        """[Consumer] Returns a view of the next contiguous readable frames (may be shorter)."""
+        start = self.read_pos % self.capacity
+        frames = min(frames, self.write_pos - self.read_pos, self.capacity - start)
+        return self.buffer[start:start + max(frames, 0)]
+
+
+# --- Audio Thread Instrumentation ---
+
+# Bits in CallbackStats.flags (the under/overflow flags of sounddevice.CallbackFlags)
+XRUN_FLAGS = ("input_underflow", "input_overflow", "output_underflow", "output_overflow")
+
+
+class CallbackStats:
+    """
+    Lock-free per-callback measurements, written only by the audio thread.
+
+    record() stores each block's duration, load (duration as a share of the
+    block period), active voice count and xrun flags in preallocated NumPy
+    rings; it never locks, allocates an array or prints. Other threads (the
+    UI meter, the periodic log) read them with snapshot(). `count` moves
+    only after a slot is written, so every slot below it is complete; the
+    oldest ones may be overwritten while a reader copies them, which at
+    worst blurs one summary.
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.duration = np.zeros(capacity) # Seconds
+        self.load = np.zeros(capacity)     # Duration / block period (1.0 = missed the deadline)
+        self.voices = np.zeros(capacity, dtype=np.int16)
+        self.flags = np.zeros(capacity, dtype=np.uint8) # Bit i = XRUN_FLAGS[i]
+        self.reset()
+
+    def reset(self):
+        """Clears all counters. Call only while no stream is running."""
+        self.count = 0 # Callbacks recorded
+        self.xruns = [0] * len(XRUN_FLAGS) # Per flag, since reset
+        self.late_blocks = 0 # Callbacks that took longer than their block period
+        self.max_load = 0.0
+        self.last_xrun = None # Names of the flags in the most recent xrun
+
+    def record(self, start, frames, samplerate, voices, status=None):
+        """[Audio thread] Stores one callback; `start` is time.perf_counter() at its entry."""
+        duration = time.perf_counter() - start
+        load = duration * samplerate / frames if frames else 0.0
+        flags = 0
+        if status:
+            for bit, name in enumerate(XRUN_FLAGS):
+                if getattr(status, name, False):
+                    flags |= 1 << bit
+                    self.xruns[bit] += 1
+            if flags:
+                self.last_xrun = status
+        if load > 1.0:
+            self.late_blocks += 1
+        if load > self.max_load:
+            self.max_load = load
+
+        i = self.count % self.capacity
+        self.duration[i] = duration
+        self.load[i] = load
+        self.voices[i] = voices
+        self.flags[i] = flags
+        self.count += 1
+
+    def snapshot(self, since=0):
+        """
+        [Any thread] Summary of the callbacks recorded after callback number
+        `since` (at most the last `capacity`), plus the totals since reset.
+        Pass the previous snapshot's "callbacks" to get just what is new.
+        """
+        count = self.count
+        n = max(0, min(count - since, self.capacity))
+        window = np.arange(count - n, count) % self.capacity
+        loads = self.load[window]
+        durations = self.duration[window]
+        return {
+            "callbacks": count,
+            "blocks": n,
+            "load_mean": float(loads.mean()) if n else 0.0,
+            "load_p99": float(np.percentile(loads, 99)) if n else 0.0,
+            "load_peak": float(loads.max()) if n else 0.0,
+            "duration_p99_us": float(np.percentile(durations, 99)) * 1e6 if n else 0.0,
+            "voices": int(self.voices[(count - 1) % self.capacity]) if count else 0,
+            "voices_peak": int(self.voices[window].max()) if n else 0,
+            "xrun_blocks": int(np.count_nonzero(self.flags[window])),
+            "xruns": dict(zip(XRUN_FLAGS, self.xruns)),
+            "late_blocks": self.late_blocks,
+            "max_load": self.max_load,
+        }
+
+
+# Stages of a trigger, in order (LatencyTracer columns)
+TRACE_STAGES = ("key", "dispatch", "enqueue", "block", "dac")
+_T_KEY, _T_DISPATCH, _T_ENQUEUE, _T_BLOCK, _T_DAC = range(len(TRACE_STAGES))
+
+
+class LatencyTracer:
+    """
+    Trigger-to-output timestamps for the most recent `capacity` plays.
+
+    All times are time.perf_counter() seconds:
+        key       the keyboard event (hotkey plays only)
+        dispatch  _internal_play_to_mix_by_path was entered
+        enqueue   the play command was pushed to the MixEngine
+        block     the audio callback that started the voice
+        dac       that block's first frame reaches the converter (PortAudio's
+                  outputBufferDacTime, or the stream's output latency if the
+                  host API does not report it)
+
+    begin() runs on the hotkey or Tk thread; mark_started() on the audio
+    thread, into preallocated columns. A slot is reused once `capacity`
+    newer traces exist, and marks for an id no longer in its slot are ignored.
+    """
+
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        self.times = np.full((capacity, len(TRACE_STAGES)), np.nan)
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.labels = [None] * capacity # (source, file path) per slot
+        self._ids = itertools.count() # next() is atomic under the GIL, so any thread may begin a trace
+
+    def begin(self, source, path, key_time=None, dispatch_time=None):
+        """Starts a trace and returns its id (pass it to MixEngine.play)."""
+        trace = next(self._ids)
+        i = trace % self.capacity
+        self.ids[i] = -1 # Ignore marks while the row is being rewritten
+        self.times[i] = np.nan
+        self.times[i, _T_KEY] = np.nan if key_time is None else key_time
+        self.times[i, _T_DISPATCH] = time.perf_counter() if dispatch_time is None else dispatch_time
+        self.labels[i] = (source, path)
+        self.ids[i] = trace
+        return trace
+
+    def mark_started(self, trace, enqueue_time, block_time, output_delay):
+        """[Audio thread] Records the enqueue, block and DAC times of a voice that just started."""
+        i = trace % self.capacity
+        if self.ids[i] != trace:
+            return
+        row = self.times[i]
+        row[_T_ENQUEUE] = enqueue_time
+        row[_T_BLOCK] = block_time
+        if output_delay is not None:
+            row[_T_DAC] = block_time + output_delay
+
+    def clear(self):
+        self.ids.fill(-1)
+        self.times.fill(np.nan)
+
+    def traces(self):
+        """
+        [Any thread] Finished traces (those that reached an audio block), oldest
+        first: a list of (id, source, path, {stage: seconds after the first stage}).
+        """
+        ids = self.ids.copy()
+        times = self.times.copy()
+        labels = list(self.labels)
+        result = []
+        for i in np.argsort(ids):
+            if ids[i] < 0 or np.isnan(times[i, _T_BLOCK]):
+                continue
+            row = times[i]
+            origin = np.nanmin(row)
+            offsets = {stage: float(row[j] - origin) for j, stage in enumerate(TRACE_STAGES)
+                       if not np.isnan(row[j])}
+            source, path = labels[i] or ("?", "?")
+            result.append((int(ids[i]), source, path, offsets))
+        return result
+
+    @staticmethod
+    def segments(traces):
+        """{ "key->dispatch": np.array of seconds, ..., "total": ... } for the stages each trace has."""
+        names = [f"{a}->{b}" for a, b in zip(TRACE_STAGES, TRACE_STAGES[1:])] + ["total"]
+        values = {name: [] for name in names}
+        for _, _, _, offsets in traces:
+            for a, b in zip(TRACE_STAGES, TRACE_STAGES[1:]):
+                if a in offsets and b in offsets:
+                    values[f"{a}->{b}"].append(offsets[b] - offsets[a])
+            values["total"].append(max(offsets.values()))
+        return {name: np.asarray(v) for name, v in values.items()}
+
+    def export_csv(self, path):
+        """Writes one row per finished trace (stage offsets and segments in ms). Returns the row count."""
+        traces = self.traces()
+        pairs = list(zip(TRACE_STAGES, TRACE_STAGES[1:]))
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["trace", "source", "file"] + [f"{s}_ms" for s in TRACE_STAGES]
+                            + [f"{a}_to_{b}_ms" for a, b in pairs] + ["total_ms"])
+            for trace, source, file_path, offsets in traces:
+                def ms(seconds):
+                    return "" if seconds is None else f"{seconds * 1000:.3f}"
+                writer.writerow([trace, source, file_path] + [ms(offsets.get(s)) for s in TRACE_STAGES]
+                                + [ms(offsets[b] - offsets[a] if a in offsets and b in offsets else None)
+                                   for a, b in pairs]
+                                + [ms(max(offsets.values()))])
+        return len(traces)
+
+
+class MixEngine:
+    """
+    Mixes the mic bus and a fixed pool of sound-effect voices into one block.
+
+    Overlapping triggers layer instead of cutting each other off. When every
+    voice is busy, a new trigger steals one according to `steal_policy`:
+    "oldest" (started first) or "quietest" (lowest level in the next block).
+
+    Other threads never touch the voice pool directly: play/stop/volume
+    changes go through a lock-free CommandBus that process() drains at the
+    start of each block, so the audio thread never waits on a lock.
+
+    A voice plays either a decoded clip (float32 array) or a StreamRing
+    that a reader thread keeps filling (long clips; see open_stream_clip).
+    """
+
+    def __init__(self, max_voices=16, steal_policy=STEAL_OLDEST, samplerate=44100):
+        self.max_voices = max(1, int(max_voices))
+        self.steal_policy = steal_policy if steal_policy in (STEAL_OLDEST, STEAL_QUIETEST) else STEAL_OLDEST
+        self.samplerate = samplerate
+
+        # --- Volume Settings (owned by the audio thread; change via set_volume) ---
+        self.mic_vol = 0.8
+        self.music_vol = 0.5
+
+        # --- Voice Pool (fixed size; a slot is free when its data is None) ---
+        self.voice_data = [None] * self.max_voices
+        self.voice_pos = [0] * self.max_voices
+        self.voice_gain = [1.0] * self.max_voices
+        self.voice_key = [None] * self.max_voices   # e.g. the file path, for stop
+        self.voice_order = [0] * self.max_voices    # Start counter, for 'oldest' stealing
+        self._next_order = 1
+
+        # --- Commands from UI/hotkey threads ---
+        self.commands = CommandBus()
+        self.late_commands = 0 # Commands that waited longer than one block
+        self.stolen_voices = 0
+        self.stream_underruns = 0 # Streaming voice blocks cut short by a slow reader
+        self.block_voices = 0 # Voices mixed into the last block (for CallbackStats)
+        self.tracer = None # Optional LatencyTracer, told when a traced play starts
+        self.stats = None # Optional CallbackStats, recorded by callback()
+        self.output_delay = None # Seconds from a callback to its DAC time (set by the callback)
+
+        # --- Dynamics (see dsp.py; parameters may be changed from any thread) ---
+        self.mic_chain = MicChain() # Noise gate + compressor on the mic bus
+        self.limiter = TruePeakLimiter() # Master output; a hard clip is used until prepare()
+
+        # --- Scratch Buffers (see prepare) ---
+        self._scratch = np.zeros((0, 2), dtype=np.float32)
+        self._mono_scratch = np.zeros((0, 1), dtype=np.float32)
+        self._gain = np.zeros((), dtype=np.float32)
+        self._one = np.ones((), dtype=np.float32)
+        self._minus_one = -np.ones((), dtype=np.float32)
+        self.scratch_growths = 0 # Blocks that were larger than prepare() expected
+
+    # --- Control (any thread; never blocks) ---
+
+    @property
+    def active_voices(self):
+        return sum(1 for data in self.voice_data if data is not None)
+
+    @property
+    def dropped_commands(self):
+        return self.commands.dropped
+
+    def play(self, data, key=None, gain=1.0, pos=0, trace=None):
+        """
+        Starts a clip (float32, shaped (frames, channels), or a StreamRing)
+        on the next block. If this returns False, the caller still owns the
+        StreamRing and must close() it. `trace` is a LatencyTracer id.
+        """
+        return self.commands.push(CMD_PLAY, data, pos, gain, key, trace)
+
+    def stop(self, key=None):
+        """Stops every voice playing `key` (or all voices if key is None)."""
+        return self.commands.push(CMD_STOP, key=key)
+
+    def stop_all(self):
+        return self.stop(None)
+
+    def set_volume(self, bus, value):
+        """Sets the "mic" or "music" bus volume."""
+        return self.commands.push(CMD_SET_VOLUME, value=value, key=bus)
+
+    def replace_data(self, old_data, new_data):
+        """
+        Swaps `old_data` for `new_data` in every voice, keeping the play
+        position (e.g. pre-warmed head -> full clip).
+        """
+        return self.commands.push(CMD_REPLACE, new_data, key=old_data)
+
+    def reset(self, mic_vol, music_vol):
+        """Clears voices and queued commands. Call only while no stream is running."""
+        self.commands.clear()
+        for i in range(self.max_voices):
+            self._release_voice(i)
+        self.mic_vol = mic_vol
+        self.music_vol = music_vol
+        self.mic_chain.reset()
+
+    def prepare(self, max_frames, out_channels):
+        """
+        Preallocates the callback's scratch buffer for blocks of up to
+        `max_frames`. Call before the stream starts (see toggle_mix).
+        """
+        max_frames = max(int(max_frames), 1)
+        self._scratch = np.zeros((max_frames, out_channels), dtype=np.float32)
+        self._mono_scratch = np.zeros((max_frames, 1), dtype=np.float32)
+        self.mic_chain.prepare(max_frames, out_channels, self.samplerate)
+        self.limiter.prepare(max_frames, out_channels, self.samplerate)
+
+    # --- Audio Thread ---
+
+    def callback(self, indata, outdata, frames, time_info, status):
+        """
+        Body of the PortAudio mix callback (sounddevice's arguments, with
+        indata=None when no mic is in use): takes the output delay from the
+        stream's timestamps, runs process(), and records the block in `stats`.
+        Nothing is printed here (that could cause glitches).
+        """
+        start = time.perf_counter()
+        output_delay = time_info.outputBufferDacTime - time_info.currentTime
+        if 0.0 < output_delay < 1.0: # Some host APIs report 0 for both
+            self.output_delay = output_delay
+        self.process(indata, outdata, frames)
+        if self.stats is not None:
+            self.stats.record(start, frames, self.samplerate, self.block_voices, status)
+
+    def _grow_scratch(self, frames, out_channels):
+        """Fallback for a block larger than prepare() expected (allocates; counted)."""
+        self.scratch_growths += 1
+        self.prepare(max(frames, self._scratch.shape[0]), out_channels)
+        return self._scratch
+
+    def _drain_commands(self, frames):
+        """Applies all queued commands. Never blocks."""
+        now = None
+        for ring in self.commands.rings:
+            slots = ring.slots
+            capacity = ring.capacity
+            while ring.head != ring.tail:
+                slot = slots[ring.head % capacity]
+                op = slot[_OP]
+                if now is None:
+                    now = time.perf_counter()
+                if now - slot[_STAMP] > frames / self.samplerate:
+                    self.late_commands += 1
+
+                if op == CMD_PLAY:
+                    self._start_voice(slot[_DATA], slot[_POS], slot[_VALUE], slot[_KEY], frames)
+                    if slot[_TRACE] is not None and self.tracer is not None:
+                        delay = self.output_delay
+                        if delay is not None:
+                            delay += self.limiter.latency_seconds # The limiter delays the output too
+                        self.tracer.mark_started(slot[_TRACE], slot[_STAMP], now, delay)
+                        slot[_TRACE] = None
+                elif op == CMD_STOP:
+                    key = slot[_KEY]
+                    for i in range(self.max_voices):
+                        if key is None or self.voice_key[i] == key:
+                            self._release_voice(i)
+                elif op == CMD_SET_VOLUME:
+                    if slot[_KEY] == "mic":
+                        self.mic_vol = slot[_VALUE]
+                    elif slot[_KEY] == "music":
+                        self.music_vol = slot[_VALUE]
+                elif op == CMD_REPLACE:
+                    old_data = slot[_KEY]
+                    for i in range(self.max_voices):
+                        if self.voice_data[i] is old_data:
+                            self.voice_data[i] = slot[_DATA]
+
+                # Drop references so finished clips can be freed
+                slot[_DATA] = None
+                slot[_KEY] = None
+                ring.head += 1
+
+    def _start_voice(self, data, pos, gain, key, frames):
+        """Assigns a trigger to a free voice slot, stealing one if needed."""
+        slot = None
+        for i in range(self.max_voices):
+            if self.voice_data[i] is None:
+                slot = i
+                break
+        if slot is None:
+            slot = self._steal_slot(frames)
+            self._release_voice(slot)
+            self.stolen_voices += 1
+
+        self.voice_data[slot] = data
+        self.voice_pos[slot] = pos
+        self.voice_gain[slot] = gain
+        self.voice_key[slot] = key
+        self.voice_order[slot] = self._next_order
+        self._next_order += 1
+
+    def _release_voice(self, i):
+        """Frees a voice slot (and tells a streaming voice's reader to stop)."""
+        data = self.voice_data[i]
+        if data.__class__ is StreamRing:
+            data.close()
+        self.voice_data[i] = None
+        self.voice_key[i] = None
+
+    def _steal_slot(self, frames):
+        """Picks the voice to replace when the pool is full."""
+        if self.steal_policy == STEAL_QUIETEST:
+            levels = []
+            for i in range(self.max_voices):
+                data = self.voice_data[i]
+                if data.__class__ is StreamRing:
+                    chunk = data.peek(frames)
+                else:
+                    pos = self.voice_pos[i]
+                    chunk = data[pos:pos + frames]
+                level = math.sqrt(float(np.vdot(chunk, chunk)) / chunk.size) if chunk.size else 0.0
+                levels.append(level * self.voice_gain[i])
+            return levels.index(min(levels))
+        return self.voice_order.index(min(self.voice_order))
+
+    def process(self, indata, outdata, frames):
+        """
+        Fills `outdata` with one block: mic (if `indata` is given) plus all voices.
+        This runs on the high-priority audio thread and MUST complete very quickly.
+        It allocates no sample buffers: every step writes into `outdata` or the
+        scratch buffer from prepare() with in-place ufuncs (out=). It does create
+        a few small Python objects per voice (the slice view of its clip, its new
+        position), each freed or replaced within the block, so nothing is retained
+        and the peak stays under BLOCK_ALLOC_BUDGET bytes.
+        """
+        # 1. Apply play/stop/volume commands from the UI/hotkey threads
+        self._drain_commands(frames)
+
+        # 2. Microphone bus (copied straight into outdata, or clear it)
+        # Scalars are passed as preallocated 0-d float32 arrays: a Python float
+        # operand, or a broadcast/strided ufunc, makes NumPy allocate a temporary.
+        gain = self._gain
+        if indata is not None and indata.shape[0] > 0:
+            in_channels = indata.shape[1]
+            out_channels = outdata.shape[1]
+
+            # Handle channel mapping (mono->stereo etc. via broadcasting copyto)
+            input_gain = 1.0
+            if in_channels == out_channels or in_channels == 1:
+                np.copyto(outdata, indata)
+            elif in_channels == 2 and out_channels == 1:
+                mono = self._mono_scratch[:frames]
+                np.copyto(outdata, indata[:, 0:1]) # Downmix (mean)
+                np.copyto(mono, indata[:, 1:2])
+                np.add(outdata, mono, out=outdata)
+                input_gain = 0.5
+            elif in_channels > 2 and out_channels == 2:
+                np.copyto(outdata, indata[:, :2])
+            else:
+                np.copyto(outdata, indata[:, :1]) # First channel only
+            # Gate -> compressor -> Mic Vol, one ramped gain per block
+            self.mic_chain.process(outdata, frames, input_gain, self.mic_vol)
+        else:
+            outdata.fill(0.0) # Clear output buffer
+
+        # 3. Mix in every playing voice (multiply into scratch, add into outdata)
+        scratch = self._scratch
+        if scratch.shape[0] < frames or scratch.shape[1] != outdata.shape[1]:
+            scratch = self._grow_scratch(frames, outdata.shape[1])
+        music_vol = self.music_vol
+        voices = 0
+        for i in range(self.max_voices):
+            data = self.voice_data[i]
+            if data is None:
+                continue
+            voices += 1
+            if data.__class__ is StreamRing:
+                self._mix_stream_voice(i, data, outdata, scratch, frames, music_vol)
+                continue
+            pos = self.voice_pos[i]
+            play_size = min(frames, len(data) - pos)
+            if play_size > 0:
+                tmp = scratch if play_size == scratch.shape[0] else scratch[:play_size]
+                dst = outdata if play_size == frames else outdata[:play_size]
+                gain.fill(self.voice_gain[i] * music_vol)
+                np.multiply(data[pos:pos + play_size], gain, out=tmp)
+                np.add(dst, tmp, out=dst)
+                pos += play_size
+            if pos >= len(data):
+                self.voice_data[i] = None # Voice finished; free the slot
+                self.voice_key[i] = None
+            else:
+                self.voice_pos[i] = pos
+        self.block_voices = voices
+
+        # 4. Master limiter (delays the output by limiter.latency_frames), or a hard clip
+        if self.limiter.active:
+            self.limiter.process(outdata, frames)
+        else:
+            np.minimum(outdata, self._one, out=outdata)
+            np.maximum(outdata, self._minus_one, out=outdata)
+
+    def _mix_stream_voice(self, i, ring, outdata, scratch, frames, music_vol):
+        """Mixes one block of a streaming voice (reads straight into scratch)."""
+        play_size = ring.read_into(scratch, frames)
+        if play_size > 0:
+            tmp = scratch if play_size == scratch.shape[0] else scratch[:play_size]
+            dst = outdata if play_size == frames else outdata[:play_size]
+            gain = self._gain
+            gain.fill(self.voice_gain[i] * music_vol)
+            np.multiply(tmp, gain, out=tmp)
+            np.add(dst, tmp, out=dst)
+        if ring.finished:
+            self._release_voice(i)
+        elif play_size < frames and ring.read_pos > 0:
+            # Reader fell behind (before the first frame it is just still starting up)
+            ring.underruns += 1
+            self.stream_underruns += 1
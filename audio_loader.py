@@ -0,0 +1,984 @@
+"""
+Audio file decoding for the soundboard.
+
+Decoding runs in worker processes so the Tk main thread stays responsive.
+This module must stay importable without customtkinter or sounddevice,
+because every worker process imports it on its own.
+"""
+import os
+import json
+import time
+import queue
+import shutil
+import hashlib
+import threading
+import subprocess
+from math import gcd
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+import soundfile as sf
+
+from audio_engine import StreamRing
+
+# pydub is optional; Soundboard.py already warns the user if it is missing.
+try:
+    from pydub import AudioSegment
+    PYDUB_AVAILABLE = True
+except Exception:
+    PYDUB_AVAILABLE = False
+
+VALID_EXTENSIONS = ('.wav', '.flac', '.ogg', '.mp3', '.m4a')
+PYDUB_EXTENSIONS = ('.mp3', '.ogg', '.m4a')
+SOUNDFILE_EXTENSIONS = ('.wav', '.flac')
+
+
+def can_decode(filename):
+    """Returns True if this file type can be decoded with the installed libraries."""
+    lower = filename.lower()
+    if not lower.endswith(VALID_EXTENSIONS):
+        return False
+    # WAV/FLAC are read with soundfile but still standardized through pydub
+    return PYDUB_AVAILABLE
+
+
+# --- Worker Functions (run inside the process pool) ---
+
+def probe_file(full_path):
+    """
+    Reads the format from the file header without decoding.
+    Returns {"duration": seconds, "samplerate": Hz, "channels": n}, or None if unknown.
+    """
+    try:
+        info = sf.info(full_path)
+        return {"duration": info.frames / info.samplerate,
+                "samplerate": info.samplerate, "channels": info.channels}
+    except Exception:
+        pass
+    if PYDUB_AVAILABLE:
+        try:
+            from pydub.utils import mediainfo # Runs ffprobe
+            info = mediainfo(full_path)
+            return {"duration": float(info["duration"]),
+                    "samplerate": int(info.get("sample_rate") or 0) or None,
+                    "channels": int(info.get("channels") or 0) or None}
+        except Exception:
+            pass
+    return None
+
+
+def probe_duration(full_path):
+    """Returns the clip length in seconds from the file header, or None if unknown."""
+    info = probe_file(full_path)
+    return info["duration"] if info else None
+
+
+def decode_file(full_path, samplerate, channels, store_file=None, stream_min_seconds=0, stage_times=None):
+    """
+    [Worker] Decodes one file and converts it to the mixer's format.
+    If `store_file` is given, the raw float32 samples are written there for
+    the SampleStore to pick up, instead of being sent back through the
+    process pipe.
+    Clips of at least `stream_min_seconds` (if set) are not decoded at all;
+    their duration is returned instead, and they are played by streaming.
+    If `stage_times` (a dict) is given, seconds spent per stage are added to
+    it: "decode", "resample", "channels", "convert" (int16 -> float32).
+    Returns: (full_path, float32 samples shaped (frames, channels) / None / duration, elapsed seconds)
+    """
+    start = time.perf_counter()
+    lower = full_path.lower()
+    stage_start = start
+
+    def stage(name):
+        nonlocal stage_start
+        if stage_times is not None:
+            now = time.perf_counter()
+            stage_times[name] = stage_times.get(name, 0.0) + now - stage_start
+            stage_start = now
+
+    if stream_min_seconds:
+        duration = probe_duration(full_path)
+        if duration is not None and duration >= stream_min_seconds:
+            return (full_path, float(duration), time.perf_counter() - start)
+
+    # Load via pydub (for mp3/m4a/ogg) or soundfile (for wav/flac)
+    if lower.endswith(PYDUB_EXTENSIONS):
+        sound = AudioSegment.from_file(full_path)
+    elif lower.endswith(SOUNDFILE_EXTENSIONS):
+        data, sr = sf.read(full_path, dtype='int16')
+        if data.ndim == 1: # Convert mono to stereo
+            data = np.column_stack((data, data))
+        sound = AudioSegment(data.tobytes(), frame_rate=sr, sample_width=data.dtype.itemsize, channels=data.shape[1])
+    else:
+        raise ValueError(f"Unsupported file type: {os.path.basename(full_path)}")
+    stage("decode")
+
+    # Standardize audio format for mixing
+    sound = sound.set_frame_rate(samplerate)
+    stage("resample")
+    sound = sound.set_channels(channels)
+    sound = sound.set_sample_width(2) # 16-bit
+    stage("channels")
+
+    # View the int16 PCM in place (no intermediate Python array)
+    pcm = np.frombuffer(sound.raw_data, dtype=np.int16)
+
+    if store_file:
+        write_float32_file(store_file, pcm)
+        samples = None
+    else:
+        samples = pcm.astype(np.float32)
+        samples *= 1.0 / 32767.0 # Normalize to -1.0 to 1.0
+        samples = samples.reshape(-1, channels)
+    stage("convert")
+
+    return (full_path, samples, time.perf_counter() - start)
+
+
+def write_float32_file(file_path, pcm, chunk_samples=1 << 20):
+    """Converts int16 PCM to raw float32 in chunks, so peak memory stays at one chunk."""
+    tmp_path = f"{file_path}.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        for i in range(0, len(pcm), chunk_samples):
+            chunk = pcm[i:i + chunk_samples].astype(np.float32)
+            chunk *= 1.0 / 32767.0
+            f.write(chunk.tobytes())
+    os.replace(tmp_path, file_path)
+
+
+# --- Resampling ---
+
+class PolyphaseResampler:
+    """
+    Streaming polyphase FIR resampler (src_rate -> dst_rate).
+
+    The rate ratio is reduced to up/down integers (44100 -> 48000 is
+    160/147) and a Kaiser-windowed sinc low-pass is split into `up` phases
+    of `taps` coefficients each, so every output frame costs `taps`
+    multiply-adds per channel. Filter history and phase carry over between
+    process() calls, so a clip can be fed block by block without seams.
+    """
+
+    def __init__(self, src_rate, dst_rate, channels, taps=64, beta=7.9):
+        g = gcd(int(src_rate), int(dst_rate))
+        self.up = int(dst_rate) // g
+        self.down = int(src_rate) // g
+        self.channels = channels
+        self.taps = taps
+
+        # Low-pass just inside the lower of the two Nyquist rates (about 80 dB stopband).
+        # The filter is centred on a whole output frame so the delay is an integer.
+        n = taps * self.up
+        self.delay = int(round((n - 1) / 2.0 / self.down)) # Group delay, in output frames
+        centre = min(self.delay * self.down, n - 1)
+        half = max(min(centre, n - 1 - centre), 1)
+        cutoff = 0.92 / max(self.up, self.down) # Relative to the upsampled Nyquist
+        t = np.arange(n) - centre
+        window = np.i0(beta * np.sqrt(np.clip(1.0 - (t / half) ** 2, 0.0, None))) / np.i0(beta)
+        h = cutoff * np.sinc(cutoff * t) * window * self.up
+        # bank[p] holds the taps for phase p, reversed to match a forward input window
+        self._bank = h.reshape(taps, self.up).T[:, ::-1].astype(np.float32)
+
+        self._history = np.zeros((taps - 1, channels), dtype=np.float32)
+        self._t = 0 # Upsampled position of the next output, relative to the next block
+
+    def process(self, block, chunk_frames=1 << 15):
+        """Resamples one (frames, channels) block; returns whatever output is complete."""
+        outputs = []
+        for start in range(0, len(block), chunk_frames):
+            outputs.append(self._process_chunk(block[start:start + chunk_frames]))
+        if not outputs:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+    def _process_chunk(self, chunk):
+        frames = len(chunk)
+        buf = np.concatenate((self._history, np.asarray(chunk, dtype=np.float32)))
+        end = frames * self.up
+        count = max(0, -(-(end - self._t) // self.down))
+        out = np.zeros((count, self.channels), dtype=np.float32)
+        if count:
+            pos = self._t + self.down * np.arange(count)
+            index = pos // self.up  # Newest input frame for each output
+            bank = self._bank[pos % self.up]
+            windows = np.lib.stride_tricks.sliding_window_view(buf, self.taps, axis=0)[index]
+            for ch in range(self.channels):
+                np.einsum('nk,nk->n', bank, windows[:, ch, :], out=out[:, ch])
+            self._t = int(pos[-1]) + self.down
+        self._t -= end
+        self._history = buf[len(buf) - (self.taps - 1):].copy()
+        return out
+
+
+def resample_clip(samples, src_rate, dst_rate):
+    """Resamples a whole (frames, channels) clip, compensating the filter delay."""
+    if src_rate == dst_rate:
+        return samples
+    frames, channels = samples.shape
+    resampler = PolyphaseResampler(src_rate, dst_rate, channels)
+    out_frames = (frames * resampler.up) // resampler.down
+    tail = np.zeros((resampler.taps, channels), dtype=np.float32) # Flushes the filter
+    out = np.concatenate((resampler.process(samples), resampler.process(tail)))
+    return np.ascontiguousarray(out[resampler.delay:resampler.delay + out_frames])
+
+
+# --- Loudness Analysis ---
+
+def k_weighting_biquads(samplerate):
+    """
+    (b, a) coefficients of the two ITU-R BS.1770 K-weighting stages (high
+    shelf, then high pass), designed for `samplerate` like the 48 kHz reference.
+    """
+    # Stage 1: high shelf, +4 dB above ~1.7 kHz (head diffraction)
+    k = np.tan(np.pi * 1681.974450955533 / samplerate)
+    q = 0.7071752369554196
+    vh = 10.0 ** (3.999843853973347 / 20.0)
+    vb = vh ** 0.4996667741545416
+    a0 = 1.0 + k / q + k * k
+    shelf = (((vh + vb * k / q + k * k) / a0, 2.0 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0),
+             (1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0))
+    # Stage 2: high pass at ~38 Hz (RLB weighting)
+    k = np.tan(np.pi * 38.13547087602444 / samplerate)
+    q = 0.5003270373238773
+    a0 = 1.0 + k / q + k * k
+    highpass = ((1.0, -2.0, 1.0), (1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0))
+    return shelf, highpass
+
+
+class KWeightingFilter:
+    """
+    Streaming K-weighting filter: the two biquads of k_weighting_biquads(),
+    run in float64 over (frames, channels) blocks of up to `chunk_frames`.
+
+    Each biquad is split into its zeros (three taps over the input) and its
+    poles (y[n] = v[n] - a1 y[n-1] - a2 y[n-2]). With the pole state
+    s[n] = (y[n], y[n-1]) and companion matrix A, a chunk's output is
+    sum_k A^k[0,0] v[n-k] (one FFT convolution) plus A^(n+1)[0] . s[-1], so
+    the recursion never runs sample by sample. The last two inputs and
+    outputs of every stage carry over between process() calls, so a clip can
+    be fed block by block without seams.
+    """
+
+    def __init__(self, samplerate, channels, chunk_frames=1 << 16):
+        self.chunk_frames = chunk_frames
+        self._fft_size = 2 * chunk_frames
+        self._stages = []
+        for b, a in k_weighting_biquads(samplerate):
+            # powers[n] = A^n, built by doubling: powers[m:2m] = powers[:m] @ A^m
+            powers = np.empty((chunk_frames + 1, 2, 2))
+            powers[0] = np.eye(2)
+            powers[1] = ((-a[1], -a[2]), (1.0, 0.0))
+            filled = 2
+            while filled < len(powers):
+                count = min(filled, len(powers) - filled)
+                np.matmul(powers[:count], powers[filled - 1] @ powers[1], out=powers[filled:filled + count])
+                filled += count
+            self._stages.append({
+                "b": b,
+                "response": np.fft.rfft(powers[:chunk_frames, 0, 0], self._fft_size), # Impulse response of the poles
+                "carry": powers[1:, 0, :], # Row n maps s[-1] to y[n]
+                "inputs": np.zeros((2, channels)), # x[-2], x[-1]
+                "outputs": np.zeros((2, channels)), # y[-1], y[-2]
+            })
+
+    def process(self, block):
+        """Filters one (frames, channels) block; returns the float64 output, same shape."""
+        outputs = [self._process_chunk(block[start:start + self.chunk_frames])
+                   for start in range(0, len(block), self.chunk_frames)]
+        if not outputs:
+            return np.zeros((0, block.shape[1]))
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+    def _process_chunk(self, chunk):
+        frames = len(chunk)
+        x = np.asarray(chunk, dtype=np.float64)
+        for stage in self._stages:
+            b = stage["b"]
+            padded = np.concatenate((stage["inputs"], x))
+            v = b[0] * padded[2:] + b[1] * padded[1:-1] + b[2] * padded[:-2]
+            y = np.fft.irfft(np.fft.rfft(v, self._fft_size, axis=0) * stage["response"][:, None],
+                             self._fft_size, axis=0)[:frames]
+            y += stage["carry"][:frames] @ stage["outputs"]
+            stage["inputs"] = padded[-2:].copy()
+            stage["outputs"] = np.concatenate((y[-1:], y[-2:-1] if frames > 1 else stage["outputs"][:1]))
+            x = y
+        return x
+
+
+def analyze_loudness(samples, samplerate):
+    """
+    Measures a (frames, channels) clip like EBU R128 / BS.1770-4:
+    integrated loudness (K-weighted, 400 ms blocks with 75% overlap,
+    -70 LUFS absolute and -10 LU relative gates) and true peak (4x
+    oversampled). Both passes run in chunks of about 64k frames, so memory
+    stays flat however long the clip is.
+    Returns {"loudness": LUFS or None (silent), "true_peak": dBTP or None}.
+    """
+    frames, channels = samples.shape
+    hop = int(round(0.1 * samplerate))
+    block = 4 * hop
+    loudness = None
+    if frames >= block:
+        # Energy per 100 ms hop, summed chunk by chunk (chunks are whole hops)
+        weighting = KWeightingFilter(samplerate, channels, chunk_frames=hop * max(1, (1 << 16) // hop))
+        hop_energy = np.zeros(frames // hop)
+        for start in range(0, len(hop_energy) * hop, weighting.chunk_frames):
+            filtered = weighting.process(samples[start:min(start + weighting.chunk_frames, len(hop_energy) * hop)])
+            energy = np.einsum("nc,nc->n", filtered, filtered) # Channel weights are 1.0 for L/R (and mono)
+            hop_energy[start // hop:start // hop + len(energy) // hop] = energy.reshape(-1, hop).sum(axis=1)
+        cumulative = np.concatenate(([0.0], np.cumsum(hop_energy)))
+        power = (cumulative[4:] - cumulative[:-4]) / block # 400 ms blocks with 75% overlap
+        with np.errstate(divide="ignore"):
+            block_lufs = -0.691 + 10.0 * np.log10(power)
+        gated = power[block_lufs > -70.0]
+        if len(gated):
+            relative_gate = -0.691 + 10.0 * np.log10(gated.mean()) - 10.0
+            gated = power[block_lufs > max(-70.0, relative_gate)]
+            loudness = float(-0.691 + 10.0 * np.log10(gated.mean()))
+
+    peak = 0.0
+    resampler = PolyphaseResampler(samplerate, samplerate * 4, channels, taps=12)
+    for start in range(0, frames, 1 << 16):
+        upsampled = resampler.process(samples[start:start + (1 << 16)])
+        if len(upsampled):
+            peak = max(peak, float(np.abs(upsampled).max()))
+    peak = max(peak, float(np.abs(samples).max()) if frames else 0.0) # Never below the sample peak
+    true_peak = float(20.0 * np.log10(peak)) if peak > 0.0 else None
+    return {"loudness": loudness, "true_peak": true_peak}
+
+
+def find_silence(samples, samplerate, threshold_db=-60.0, window_ms=5, pre_roll_ms=5, tail_ms=100):
+    """
+    Finds where a clip's sound starts and ends: the first and last `window_ms`
+    windows whose peak is above `threshold_db` (dBFS), widened by a short
+    pre-roll (keeps the attack) and tail (keeps the decay).
+    Returns {"trim_start": seconds, "trim_end": seconds}; silent clips are not trimmed.
+    """
+    frames = len(samples)
+    window = max(1, int(samplerate * window_ms / 1000))
+    count = -(-frames // window)
+    padded = np.zeros((count * window, samples.shape[1]), dtype=np.float32)
+    np.abs(samples, out=padded[:frames])
+    peaks = padded.reshape(count, -1).max(axis=1)
+    loud = np.flatnonzero(peaks > 10.0 ** (threshold_db / 20.0))
+    if not len(loud):
+        return {"trim_start": 0.0, "trim_end": frames / samplerate}
+    start = max(0, int(loud[0]) * window - int(samplerate * pre_roll_ms / 1000))
+    end = min(frames, (int(loud[-1]) + 1) * window + int(samplerate * tail_ms / 1000))
+    return {"trim_start": start / samplerate, "trim_end": end / samplerate}
+
+
+def trim_clip(samples, end_frame):
+    """
+    Drops a clip's tail after `end_frame`. Clips in RAM are copied so the
+    tail is freed; memory-mapped clips stay zero-copy views (their tail
+    pages are simply never read).
+    """
+    if end_frame >= len(samples):
+        return samples
+    base = samples
+    while isinstance(base, np.ndarray) and not isinstance(base, np.memmap):
+        base = base.base
+    if isinstance(base, np.memmap):
+        return samples[:end_frame]
+    return np.array(samples[:end_frame])
+
+
+# --- Streaming Playback (long clips) ---
+
+def open_stream_clip(full_path, samplerate, channels, buffer_seconds=2.0, block_frames=4096):
+    """
+    Starts a reader thread that decodes `full_path` incrementally into a new
+    StreamRing (at `samplerate`, `channels`) and returns the ring right away.
+    The ring is ready to hand to MixEngine.play(); playback starts as soon as
+    the first block is decoded, and memory stays at `buffer_seconds`.
+    """
+    ring = StreamRing(int(samplerate * buffer_seconds), channels)
+    thread = threading.Thread(target=_stream_reader, args=(ring, full_path, samplerate, channels, block_frames),
+                              name=f"stream:{os.path.basename(full_path)}", daemon=True)
+    thread.start()
+    return ring
+
+
+def _stream_reader(ring, full_path, samplerate, channels, block_frames, idle_timeout=5.0):
+    """[Reader thread] Feeds the ring until EOF, or until the voice is closed or abandoned."""
+    try:
+        last_read, last_progress = ring.read_pos, time.perf_counter()
+        for block in _decode_blocks(full_path, samplerate, channels, block_frames):
+            while len(block):
+                if ring.closed:
+                    return
+                written = ring.write(block)
+                block = block[written:]
+                if not len(block):
+                    break
+                # Ring is full: wait for the audio thread to catch up
+                if ring.read_pos != last_read:
+                    last_read, last_progress = ring.read_pos, time.perf_counter()
+                elif time.perf_counter() - last_progress > idle_timeout:
+                    return # Nobody is reading (e.g. the play command was dropped)
+                time.sleep(0.005)
+    except Exception as e:
+        print(f"[!] Streaming failed for {os.path.basename(full_path)}: {e}")
+    finally:
+        ring.eof = True
+
+
+def _decode_blocks(full_path, samplerate, channels, block_frames):
+    """Yields float32 (frames, channels) blocks at `samplerate`, decoding incrementally."""
+    try:
+        sf_file = sf.SoundFile(full_path)
+    except Exception:
+        sf_file = None
+
+    if sf_file is None:
+        # Formats libsndfile can't read (e.g. m4a): let ffmpeg convert and pipe raw float32
+        yield from _ffmpeg_blocks(full_path, samplerate, channels, block_frames)
+        return
+
+    with sf_file:
+        resampler = None
+        if sf_file.samplerate != samplerate:
+            resampler = PolyphaseResampler(sf_file.samplerate, samplerate, channels)
+        for block in sf_file.blocks(blocksize=block_frames, dtype='float32', always_2d=True):
+            block = _map_channels(block, channels)
+            yield resampler.process(block) if resampler else block
+        if resampler:
+            yield resampler.process(np.zeros((resampler.taps, channels), dtype=np.float32))
+
+
+def _ffmpeg_blocks(full_path, samplerate, channels, block_frames):
+    converter = AudioSegment.converter if PYDUB_AVAILABLE else "ffmpeg"
+    cmd = [converter, "-v", "error", "-i", full_path, "-f", "f32le", "-ac", str(channels), "-ar", str(samplerate), "-"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL,
+                            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+    try:
+        frame_bytes = 4 * channels
+        while True:
+            data = proc.stdout.read(block_frames * frame_bytes)
+            if not data:
+                break
+            usable = len(data) - len(data) % frame_bytes
+            yield np.frombuffer(data[:usable], dtype=np.float32).reshape(-1, channels)
+    finally:
+        proc.kill()
+        proc.stdout.close()
+        proc.wait()
+
+
+def _map_channels(block, channels):
+    """Mono -> duplicated, more channels -> the first `channels`."""
+    if block.shape[1] == channels:
+        return block
+    if block.shape[1] == 1:
+        return np.repeat(block, channels, axis=1)
+    return block[:, :channels]
+
+
+# --- Packed Sample Store ---
+
+class SampleStore:
+    """
+    Packed, memory-mapped store of decoded float32 clips.
+
+    All clips live back to back in one data file (samples.f32) with an
+    offset/length index (index.json). sound_cache entries are zero-copy
+    views into a single read-only memory map, so resident memory stays
+    low and the OS pages clips in on demand.
+
+    Entries are keyed by source path, mtime, size and the target sample
+    rate / channel count, so a changed file or a different stream format
+    never returns stale audio. Space left by evicted entries is reclaimed
+    by compaction on the next launch, before anything is mapped.
+
+    The data file grows in doubling steps (zero-filled past the last clip)
+    and the map always covers all of it, so appending N clips remaps it
+    about log2(N) times instead of N times; views into an older map keep
+    only that one alive.
+    """
+
+    INDEX_NAME = "index.json"
+    DATA_NAME = "samples.f32"
+    INDEX_VERSION = 2
+    ALIGN = 16 # Clip start alignment, in float32 samples (64 bytes)
+    COMPACT_RATIO = 0.25 # Compact when this fraction of the data file is dead
+    MIN_CAPACITY = 1 << 22 # First size of the data file, in float32 samples (16 MB)
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, self.INDEX_NAME)
+        self.data_path = os.path.join(cache_dir, self.DATA_NAME)
+        self.entries = {} # { "path|sr|ch": {"path", "mtime_ns", "size", "offset", "frames", ...}, ... }
+        self.data_len = 0 # End of the last clip in the data file, in float32 samples
+        self.capacity = 0 # Length of the data file (data_len plus zero-filled room to grow), in samples
+        self.lock = threading.Lock()
+        self.enabled = True
+        self._map = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.load_index()
+            self._sweep_temp_files()
+            self.evict_stale()
+            self.compact()
+        except Exception as e:
+            print(f"[!] Sample store disabled (cannot use '{cache_dir}'): {e}")
+            self.enabled = False
+
+    @staticmethod
+    def _entry_key(full_path, samplerate, channels):
+        return f"{os.path.normcase(os.path.abspath(full_path))}|{samplerate}|{channels}"
+
+    @staticmethod
+    def _source_stat(full_path):
+        st = os.stat(full_path)
+        return (st.st_mtime_ns, st.st_size)
+
+    # --- Index ---
+
+    def load_index(self):
+        if os.path.exists(self.data_path):
+            self.capacity = os.path.getsize(self.data_path) // 4
+        self.data_len = 0
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get("version") != self.INDEX_VERSION:
+                raise ValueError(f"unsupported index version {index.get('version')}")
+            self.entries = index["entries"]
+            # Drop entries that point past the end of the data file (e.g. after a crash)
+            for key, entry in list(self.entries.items()):
+                if entry["offset"] + entry["frames"] * entry["channels"] > self.capacity:
+                    del self.entries[key]
+        except Exception as e:
+            print(f"[!] Sample store index is unusable, starting empty: {e}")
+            self.entries = {}
+        self.data_len = max((e["offset"] + e["frames"] * e["channels"] for e in self.entries.values()), default=0)
+
+    def save_index(self):
+        if not self.enabled:
+            return
+        with self.lock:
+            data = json.dumps({"version": self.INDEX_VERSION, "entries": self.entries})
+        try:
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            print(f"[!] Failed to save sample store index: {e}")
+
+    # --- Lookup / Insert ---
+
+    def _view(self, offset, frames, channels):
+        """Returns a zero-copy (frames, channels) view into the shared memory map."""
+        end = offset + frames * channels
+        if end == offset:
+            return np.zeros((0, channels), dtype=np.float32)
+        if self._map is None or self._map.shape[0] < end:
+            # The file grew past the map (see _reserve); old views keep the old map alive
+            self._map = np.memmap(self.data_path, dtype=np.float32, mode='r')
+        # Plain ndarray view (slicing a np.memmap subclass costs extra per callback)
+        return np.asarray(self._map[offset:end]).reshape(frames, channels)
+
+    def lookup(self, full_path, samplerate, channels):
+        """Returns a read-only view of this file's samples, or None on a miss."""
+        if not self.enabled:
+            return None
+        key = self._entry_key(full_path, samplerate, channels)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            try:
+                if self._source_stat(full_path) != (entry["mtime_ns"], entry["size"]):
+                    return None
+                return self._view(entry["offset"], entry["frames"], entry["channels"])
+            except Exception:
+                return None
+
+    def temp_file_for(self, full_path, samplerate, channels):
+        """Returns the path a worker should write a fresh decode of this file to."""
+        mtime_ns, size = self._source_stat(full_path)
+        key = self._entry_key(full_path, samplerate, channels)
+        digest = hashlib.sha1(f"{key}|{mtime_ns}|{size}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".tmp")
+
+    def add_from_file(self, full_path, samplerate, channels, temp_file):
+        """Appends a worker's raw float32 output to the data file and returns its view."""
+        mtime_ns, size = self._source_stat(full_path)
+        key = self._entry_key(full_path, samplerate, channels)
+        try:
+            with self.lock:
+                offset = -(-self.data_len // self.ALIGN) * self.ALIGN
+                self._reserve(offset + os.path.getsize(temp_file) // 4)
+                with open(temp_file, 'rb') as src, open(self.data_path, 'r+b') as dst:
+                    dst.seek(offset * 4) # Alignment padding and the room past data_len are zeros already
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                    written = dst.tell() // 4 - offset
+                self.data_len = offset + written
+                self.entries[key] = {
+                    "path": full_path,
+                    "mtime_ns": mtime_ns,
+                    "size": size,
+                    "samplerate": samplerate,
+                    "channels": channels,
+                    "offset": offset,
+                    "frames": written // channels,
+                }
+                return self._view(offset, written // channels, channels)
+        finally:
+            self._remove_file(temp_file)
+
+    def _reserve(self, end):
+        """Grows the data file to hold `end` samples, at least doubling it. Call with the lock held."""
+        if end <= self.capacity and os.path.exists(self.data_path):
+            return
+        capacity = max(end, 2 * self.capacity, self.MIN_CAPACITY)
+        with open(self.data_path, 'ab') as f:
+            f.truncate(capacity * 4) # Zero-filled (sparse where the file system allows)
+        self.capacity = capacity
+
+    # --- Maintenance ---
+
+    def evict_stale(self):
+        """Drops entries whose source file changed or disappeared."""
+        if not self.enabled:
+            return 0
+        removed = 0
+        with self.lock:
+            for key, entry in list(self.entries.items()):
+                try:
+                    fresh = self._source_stat(entry["path"]) == (entry["mtime_ns"], entry["size"])
+                except OSError:
+                    fresh = False
+                if not fresh:
+                    del self.entries[key]
+                    removed += 1
+        if removed:
+            print(f"[*] Sample store: evicted {removed} stale entries.")
+            self.save_index()
+        return removed
+
+    def compact(self):
+        """Rewrites the data file without dead space. Only possible before it is mapped."""
+        if self._map is not None:
+            return
+        live = sum(e["frames"] * e["channels"] for e in self.entries.values())
+        dead = self.data_len - live
+        if dead <= 0 or dead < self.data_len * self.COMPACT_RATIO:
+            return
+
+        print(f"[*] Sample store: compacting ({dead * 4 / 1e6:.1f} MB unused)...")
+        tmp_path = self.data_path + ".compact"
+        new_len = 0
+        with open(self.data_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for entry in sorted(self.entries.values(), key=lambda e: e["offset"]):
+                offset = -(-new_len // self.ALIGN) * self.ALIGN
+                dst.write(b"\0" * ((offset - new_len) * 4))
+                remaining = entry["frames"] * entry["channels"] * 4
+                src.seek(entry["offset"] * 4)
+                while remaining > 0:
+                    chunk = src.read(min(remaining, 1 << 20))
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    remaining -= len(chunk)
+                entry["offset"] = offset
+                new_len = offset + entry["frames"] * entry["channels"]
+        os.replace(tmp_path, self.data_path)
+        self.data_len = self.capacity = new_len
+        self.save_index()
+
+    def _sweep_temp_files(self):
+        """Removes leftovers from interrupted decodes (and the old per-clip .npy cache)."""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith((".npy", ".tmp", ".compact")) or ".tmp." in name:
+                self._remove_file(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _remove_file(file_path):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+
+# --- Decoded Clip Cache (LRU) ---
+
+class ClipCache:
+    """
+    LRU cache of decoded clips: { full_path: (samples, samplerate) }.
+
+    Behaves like the plain dict it replaces and is safe to use from the Tk,
+    hotkey and decode threads. When `budget_bytes` is set, the least
+    recently used clips are dropped once the cached sample arrays exceed
+    the budget. A voice that is still playing an evicted clip holds its own
+    reference, so eviction never cuts audio off.
+    """
+
+    def __init__(self, budget_bytes=None):
+        self.budget_bytes = budget_bytes # None = unlimited
+        self.total_bytes = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, full_path):
+        with self._lock:
+            return full_path in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def __getitem__(self, full_path):
+        with self._lock:
+            item = self._items[full_path]
+            self._items.move_to_end(full_path)
+            return item
+
+    def get(self, full_path, default=None):
+        try:
+            return self[full_path]
+        except KeyError:
+            return default
+
+    def __setitem__(self, full_path, item):
+        with self._lock:
+            old = self._items.pop(full_path, None)
+            if old is not None:
+                self.total_bytes -= old[0].nbytes
+            self._items[full_path] = item
+            self.total_bytes += item[0].nbytes
+            self._evict_locked()
+
+    def pop(self, full_path, default=None):
+        with self._lock:
+            item = self._items.pop(full_path, None)
+            if item is None:
+                return default
+            self.total_bytes -= item[0].nbytes
+            return item
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.total_bytes = 0
+
+    def set_budget(self, budget_bytes):
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict_locked()
+
+    def _evict_locked(self):
+        if self.budget_bytes is None:
+            return
+        # Never evict the most recent entry, even if it alone is over budget
+        while self.total_bytes > self.budget_bytes and len(self._items) > 1:
+            full_path, (samples, _) = self._items.popitem(last=False)
+            self.total_bytes -= samples.nbytes
+            self.evictions += 1
+            print(f"[*] Clip cache: evicted {os.path.basename(full_path)} "
+                  f"({self.total_bytes / 1e6:.0f}/{self.budget_bytes / 1e6:.0f} MB used)")
+
+
+# --- Decode Engine ---
+
+class DecodeEngine:
+    """
+    Fans decode jobs out across a process pool.
+
+    Finished clips are put on `self.results` as soon as each one completes,
+    so the UI thread can drain the queue (e.g. with Tk's after()) and show
+    clips while the rest of the library is still decoding.
+
+    If a SampleStore is given, stored clips are returned as views into its
+    memory map instead of being decoded, and new decodes are appended to it.
+
+    Result tuples:
+        ("ok", tag, full_path, samples, elapsed)  (elapsed is None for cache hits)
+        ("stream", tag, full_path, duration, elapsed)  (long clip; play with open_stream_clip)
+        ("info", tag, full_path, probe_file() dict, None)  (from submit_probe)
+        ("loudness", tag, full_path, analyze_loudness() + find_silence() dict, elapsed)  (from submit_analysis)
+        ("error", tag, full_path, exception, None)
+        ("done", tag, None, file_count, None)
+    """
+
+    def __init__(self, max_workers=0, sample_store=None, stream_min_seconds=0):
+        # 0 / None = one worker per CPU core
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.sample_store = sample_store
+        self.stream_min_seconds = stream_min_seconds # Longer clips are streamed, not decoded (0 = never)
+        self.results = queue.Queue()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None and self.max_workers > 1:
+                try:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    print(f"[*] Decode engine started ({self.max_workers} worker processes).")
+                except Exception as e:
+                    print(f"[!] Failed to start decode process pool, decoding serially: {e}")
+                    self.max_workers = 1
+            return self._executor
+
+    def submit(self, paths, samplerate, channels, tag=None):
+        """
+        Queues decode jobs for all paths and returns immediately.
+        `tag` is passed through to every result so stale batches can be ignored.
+        """
+        paths = list(paths)
+        thread = threading.Thread(target=self._run_batch, args=(paths, samplerate, channels, tag), daemon=True)
+        thread.start()
+
+    def _run_batch(self, paths, samplerate, channels, tag):
+        """[Background thread] Runs one batch and streams the results back."""
+        store = self.sample_store if (self.sample_store and self.sample_store.enabled) else None
+
+        # 1. Warm start: hand out views of everything already in the store
+        jobs = []
+        if store:
+            store.evict_stale()
+        for path in paths:
+            samples = store.lookup(path, samplerate, channels) if store else None
+            if samples is not None:
+                self.results.put(("ok", tag, path, samples, None))
+                continue
+            try:
+                store_file = store.temp_file_for(path, samplerate, channels) if store else None
+            except OSError as e:
+                self.results.put(("error", tag, path, e, None))
+                continue
+            jobs.append((path, store_file))
+
+        # 2. Decode the misses
+        executor = self._get_executor() if jobs else None
+        if jobs and executor is None:
+            # Serial fallback (1 worker or no process pool available)
+            for path, store_file in jobs:
+                try:
+                    result = decode_file(path, samplerate, channels, store_file, self.stream_min_seconds)
+                    self._put_result(tag, result, samplerate, channels, store_file)
+                except Exception as e:
+                    self.results.put(("error", tag, path, e, None))
+        elif jobs:
+            try:
+                futures = {executor.submit(decode_file, path, samplerate, channels, store_file,
+                                           self.stream_min_seconds): (path, store_file)
+                           for path, store_file in jobs}
+            except Exception as e:
+                # Pool is broken (e.g. a worker crashed); report every file as failed
+                futures = {}
+                for path, _ in jobs:
+                    self.results.put(("error", tag, path, e, None))
+
+            for future in as_completed(futures):
+                path, store_file = futures[future]
+                try:
+                    self._put_result(tag, future.result(), samplerate, channels, store_file)
+                except Exception as e:
+                    self.results.put(("error", tag, path, e, None))
+
+        if store and jobs:
+            store.save_index()
+        self.results.put(("done", tag, None, len(paths), None))
+
+    def submit_resample(self, clips, src_rate, dst_rate, channels, tag=None):
+        """
+        Queues resampling of already decoded clips [(full_path, samples), ...]
+        to `dst_rate`. Results arrive on `self.results` like decode results.
+        With a SampleStore, each clip is resampled once per target rate.
+        """
+        clips = list(clips)
+        thread = threading.Thread(target=self._run_resample, args=(clips, src_rate, dst_rate, channels, tag), daemon=True)
+        thread.start()
+
+    def _run_resample(self, clips, src_rate, dst_rate, channels, tag):
+        """[Background thread] Resamples one batch (NumPy releases the GIL for the heavy parts)."""
+        store = self.sample_store if (self.sample_store and self.sample_store.enabled) else None
+        added = False
+        for path, samples in clips:
+            try:
+                cached = store.lookup(path, dst_rate, channels) if store else None
+                if cached is not None:
+                    self.results.put(("ok", tag, path, cached, None))
+                    continue
+                start = time.perf_counter()
+                resampled = resample_clip(samples, src_rate, dst_rate)
+                if store:
+                    store_file = store.temp_file_for(path, dst_rate, channels)
+                    resampled.tofile(store_file)
+                    resampled = store.add_from_file(path, dst_rate, channels, store_file)
+                    added = True
+                self.results.put(("ok", tag, path, resampled, time.perf_counter() - start))
+            except Exception as e:
+                self.results.put(("error", tag, path, e, None))
+        if added:
+            store.save_index()
+        self.results.put(("done", tag, None, len(clips), None))
+
+    def submit_probe(self, paths, tag=None):
+        """
+        Queues header probes (duration / sample rate / channels) for the
+        library index. Nothing is decoded; ffprobe calls run a few at a time
+        on threads, since they are separate processes anyway.
+        """
+        paths = list(paths)
+        thread = threading.Thread(target=self._run_probe, args=(paths, tag), daemon=True)
+        thread.start()
+
+    def _run_probe(self, paths, tag):
+        """[Background thread] Probes one batch."""
+        with ThreadPoolExecutor(max_workers=min(4, self.max_workers)) as pool:
+            for path, info in zip(paths, pool.map(probe_file, paths)):
+                if info is None:
+                    self.results.put(("error", tag, path, ValueError("unreadable header"), None))
+                else:
+                    self.results.put(("info", tag, path, info, None))
+        self.results.put(("done", tag, None, len(paths), None))
+
+    def submit_analysis(self, clips, samplerate, tag=None, silence_threshold_db=-60.0):
+        """
+        Queues loudness / true peak / silence analysis of decoded clips
+        [(full_path, samples), ...]. Runs on one background thread; the heavy
+        parts are NumPy FFTs, which release the GIL.
+        """
+        clips = list(clips)
+        thread = threading.Thread(target=self._run_analysis, args=(clips, samplerate, tag, silence_threshold_db),
+                                  daemon=True)
+        thread.start()
+
+    def _run_analysis(self, clips, samplerate, tag, silence_threshold_db):
+        """[Background thread] Analyses one batch."""
+        for path, samples in clips:
+            try:
+                start = time.perf_counter()
+                result = analyze_loudness(samples, samplerate)
+                result.update(find_silence(samples, samplerate, silence_threshold_db))
+                self.results.put(("loudness", tag, path, result, time.perf_counter() - start))
+            except Exception as e:
+                self.results.put(("error", tag, path, e, None))
+        self.results.put(("done", tag, None, len(clips), None))
+
+    def _put_result(self, tag, result, samplerate, channels, store_file):
+        full_path, samples, elapsed = result
+        if isinstance(samples, float):
+            # Long clip: the worker only probed its duration
+            self.results.put(("stream", tag, full_path, samples, elapsed))
+            return
+        if samples is None:
+            # Worker wrote the clip to a temp file; pack it into the store
+            samples = self.sample_store.add_from_file(full_path, samplerate, channels, store_file)
+        self.results.put(("ok", tag, full_path, samples, elapsed))
+
+    def shutdown(self):
+        """Stops the worker processes without waiting for pending jobs."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: cost of the dynamics (dsp.py) inside MixEngine.process().
+
+Runs the same engine twice per case, once with a bare mic gain and the
+hard clip, once with the noise gate, compressor and true-peak limiter all
+on, and reports the difference per block as a share of the real-time
+deadline (frames / rate). The mic signal alternates speech-like bursts
+with near-silence, so the gate opens and closes and the compressor keeps
+changing its gain (the ramped path); the voices are loud enough that the
+limiter is always working.
+
+Usage: python benchmarks/bench_dsp.py [--blocks 4000] [--samplerate 48000] [--max-share 0.1]
+Exits with status 1 if the dynamics add --max-share of the deadline or
+more at any block size, or if a block allocated a sample buffer.
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from audio_engine import MixEngine
+
+BLOCK_SIZES = (64, 128, 256, 512)
+OUT_CHANNELS = 2
+VOICES = 4
+
+
+def make_engine(samplerate, frames, dynamics):
+    engine = MixEngine(max_voices=VOICES, samplerate=samplerate)
+    engine.mic_chain.gate.enabled = dynamics
+    engine.mic_chain.compressor.enabled = dynamics
+    engine.limiter.enabled = dynamics
+    engine.prepare(frames, OUT_CHANNELS)
+    engine.reset(mic_vol=0.8, music_vol=1.0)
+    return engine
+
+
+def make_mic(samplerate, frames, blocks):
+    """Alternating 0.3 s bursts (noise at -12 dBFS) and -70 dBFS hiss, shaped (n, 2)."""
+    rng = np.random.default_rng(2)
+    n = frames * blocks
+    burst = (np.arange(n) // int(0.3 * samplerate)) % 2 == 0
+    level = np.where(burst, 0.25, 0.0003).astype(np.float32)
+    return (rng.standard_normal((n, 2)).astype(np.float32) * level[:, None])
+
+
+def run_engine(engine, mic, frames, blocks, clip):
+    """Returns (µs per block, max tracemalloc peak bytes of one block)."""
+    outdata = np.zeros((frames, OUT_CHANNELS), dtype=np.float32)
+    mic_blocks = [mic[i * frames:(i + 1) * frames] for i in range(blocks)] # Stand-ins for the driver's indata
+
+    def between_blocks(i):
+        if i % 16 == 0:
+            engine.play(clip) # Keeps the voices busy (steals once all are playing)
+
+    for i in range(min(blocks, 200)): # Warm-up
+        between_blocks(i)
+        engine.process(mic_blocks[i], outdata, frames)
+    elapsed = 0.0
+    for i in range(blocks):
+        between_blocks(i)
+        t0 = time.perf_counter()
+        engine.process(mic_blocks[i], outdata, frames)
+        elapsed += time.perf_counter() - t0
+    per_block = elapsed / blocks
+
+    tracemalloc.start()
+    max_peak = 0
+    for i in range(min(blocks, 500)):
+        between_blocks(i)
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        engine.process(mic_blocks[i], outdata, frames)
+        max_peak = max(max_peak, tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return per_block * 1e6, max_peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=4000)
+    parser.add_argument("--samplerate", type=int, default=48000)
+    parser.add_argument("--max-share", type=float, default=0.1,
+                        help="Fail if the dynamics add this share of the deadline or more")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    clip = (rng.standard_normal((args.samplerate * 5, OUT_CHANNELS)) * 0.4).astype(np.float32)
+    failed = False
+    print(f"{'frames':>6} {'off us':>8} {'on us':>8} {'added':>8} {'deadline':>8} {'share':>6} "
+          f"{'alloc B':>8} {'limit dB':>8}  result")
+    for frames in BLOCK_SIZES:
+        mic = make_mic(args.samplerate, frames, args.blocks)
+        off_us, _ = run_engine(make_engine(args.samplerate, frames, False), mic, frames, args.blocks, clip)
+        engine = make_engine(args.samplerate, frames, True)
+        on_us, alloc = run_engine(engine, mic, frames, args.blocks, clip)
+
+        deadline_us = frames / args.samplerate * 1e6
+        share = max(on_us - off_us, 0.0) / deadline_us
+        problems = []
+        if share >= args.max_share:
+            problems.append("SLOW")
+        if alloc >= frames * OUT_CHANNELS * 4:
+            problems.append("ALLOCATES")
+        failed |= bool(problems)
+        print(f"{frames:>6} {off_us:>8.1f} {on_us:>8.1f} {on_us - off_us:>8.1f} {deadline_us:>8.0f} "
+              f"{share:>6.1%} {alloc:>8} {engine.limiter.reduction_db:>8.1f}  "
+              f"{'OK' if not problems else ' '.join(problems)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
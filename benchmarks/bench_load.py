@@ -0,0 +1,270 @@
+"""
+Benchmark: library load throughput over a synthetic 'Soundboard Rsc'.
+
+Generates N clips (WAV / FLAC / MP3 / OGG, mono and stereo, 22.05-48 kHz,
+0.3-20 s) and times the same load pipeline auto_load_files_from_rsc uses:
+scan_folder, then DecodeEngine with the memory-mapped SampleStore. Each
+mode runs in a fresh subprocess, so its peak RSS (the process plus its
+decode workers) is its own:
+
+    cold-serial     empty sample store, 1 decode worker
+    cold-parallel   empty sample store, one worker per CPU core
+    warm            sample store filled by cold-parallel (the normal second launch)
+    no-store        "pcm_disk_cache": false, clips come back through the worker pipes
+
+A serial "stages" pass then decodes every file with decode_file(stage_times=...)
+for a per-stage / per-format breakdown: decode, resample (to 44.1 kHz),
+channels, convert (int16 -> float32), plus stream_resample (44.1 -> 48 kHz
+polyphase, as when the output device runs at 48 kHz).
+
+Usage: python benchmarks/bench_load.py [--clips 200] [--library DIR] [--modes cold-serial,warm]
+                                       [--json results.json]
+MP3 / OGG decoding goes through pydub and needs ffmpeg; without it those
+files are reported as errors (use --formats wav,flac to skip them).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import soundfile as sf
+
+from audio_loader import DecodeEngine, SampleStore, VALID_EXTENSIONS, decode_file, resample_clip
+from library import scan_folder
+
+# resource is POSIX only; peak RSS is reported as null elsewhere
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+LIBRARY_RATE = 44100 # AudioMixerApp.library_samplerate
+STREAM_RATE = 48000
+CHANNELS = 2
+MODES = ("cold-serial", "cold-parallel", "warm", "no-store")
+FORMATS = {
+    "wav": {"format": "WAV", "subtype": "PCM_16"},
+    "flac": {"format": "FLAC", "subtype": "PCM_16"},
+    "mp3": {"format": "MP3", "subtype": "MPEG_LAYER_III"},
+    "ogg": {"format": "OGG", "subtype": "VORBIS"},
+}
+RATES = (22050, 32000, 44100, 48000)
+
+
+# --- Synthetic Library ---
+
+def generate_library(folder, clips, formats, seed=0):
+    """Writes `clips` files to `folder` (kept between runs if it already matches)."""
+    manifest_path = os.path.join(folder, "manifest.json")
+    wanted = {"clips": clips, "formats": list(formats), "seed": seed}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            if json.load(f) == wanted:
+                return
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+
+    rng = random.Random(seed)
+    noise = np.random.default_rng(seed)
+    for i in range(clips):
+        ext = formats[i % len(formats)]
+        rate = rng.choice(RATES)
+        channels = rng.choice((1, 2))
+        seconds = float(np.exp(rng.uniform(np.log(0.3), np.log(20.0)))) # Mostly short, a few long
+        t = np.arange(int(rate * seconds)) / rate
+        tone = 0.2 * np.sin(2 * np.pi * rng.uniform(100, 2000) * t)
+        data = np.column_stack([tone + 0.05 * noise.standard_normal(len(t)) for _ in range(channels)])
+        category = f"cat{i % 5}" # Subfolders, like a categorised library
+        os.makedirs(os.path.join(folder, category), exist_ok=True)
+        sf.write(os.path.join(folder, category, f"clip_{i:05d}.{ext}"), data.astype(np.float32), rate,
+                 **FORMATS[ext])
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(wanted, f)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of its (finished) child processes, in MB."""
+    if not RESOURCE_AVAILABLE:
+        return None, None
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024 # ru_maxrss is bytes on macOS, KB on Linux
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit)
+
+
+# --- One Mode (runs in its own subprocess) ---
+
+def run_mode(mode, library, cache_dir):
+    workers = 1 if mode == "cold-serial" else 0
+    store = None if mode == "no-store" else SampleStore(cache_dir)
+    engine = DecodeEngine(max_workers=workers, sample_store=store)
+
+    start = time.perf_counter()
+    snapshot = scan_folder(library, VALID_EXTENSIONS)
+    scan_seconds = time.perf_counter() - start
+    paths = sorted(snapshot)
+    engine.submit(paths, LIBRARY_RATE, CHANNELS, tag=mode)
+
+    first_clip = None
+    loaded = cached = 0
+    pcm_bytes = 0
+    errors = {}
+    while True:
+        kind, _, path, payload, elapsed = engine.results.get()
+        if kind == "ok":
+            if first_clip is None:
+                first_clip = time.perf_counter() - start
+            loaded += 1
+            cached += elapsed is None
+            pcm_bytes += payload.nbytes
+        elif kind == "error":
+            ext = os.path.splitext(path)[1].lower()
+            errors[ext] = errors.get(ext, 0) + 1
+        elif kind == "done":
+            break
+    total = time.perf_counter() - start
+    engine.shutdown()
+
+    source_bytes = sum(size for _, size in snapshot.values())
+    rss_self, rss_children = peak_rss_mb()
+    return {
+        "mode": mode,
+        "workers": engine.max_workers,
+        "files": len(paths),
+        "loaded": loaded,
+        "from_store": cached,
+        "errors": errors,
+        "scan_seconds": scan_seconds,
+        "first_clip_seconds": first_clip,
+        "total_seconds": total,
+        "files_per_second": loaded / total if total else None,
+        "source_mb_per_second": source_bytes / 1e6 / total if total else None,
+        "pcm_mb_per_second": pcm_bytes / 1e6 / total if total else None,
+        "peak_rss_mb": rss_self,
+        "peak_rss_workers_mb": rss_children,
+    }
+
+
+def run_stages(library):
+    """Serial per-stage breakdown, summed per file format."""
+    by_format = {}
+    for path in sorted(scan_folder(library, VALID_EXTENSIONS)):
+        ext = os.path.splitext(path)[1].lower().lstrip(".")
+        entry = by_format.setdefault(ext, {"files": 0, "errors": 0, "audio_seconds": 0.0, "stages": {}})
+        stages = entry["stages"]
+        try:
+            _, samples, _ = decode_file(path, LIBRARY_RATE, CHANNELS, stage_times=stages)
+        except Exception:
+            entry["errors"] += 1
+            continue
+        t0 = time.perf_counter()
+        resample_clip(samples, LIBRARY_RATE, STREAM_RATE)
+        stages["stream_resample"] = stages.get("stream_resample", 0.0) + time.perf_counter() - t0
+        entry["files"] += 1
+        entry["audio_seconds"] += len(samples) / LIBRARY_RATE
+    for entry in by_format.values():
+        # Real-time factor per stage: seconds of audio processed per second of work
+        entry["realtime_factor"] = {name: entry["audio_seconds"] / seconds if seconds else None
+                                    for name, seconds in entry["stages"].items()}
+    return by_format
+
+
+def run_child(args):
+    """Runs one mode in this process and prints its JSON result (see main)."""
+    if args.run_mode == "stages":
+        result = run_stages(args.library)
+    else:
+        result = run_mode(args.run_mode, args.library, args.cache)
+    print(json.dumps(result))
+
+
+# --- Driver ---
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clips", type=int, default=200)
+    parser.add_argument("--formats", default="wav,flac,mp3,ogg")
+    parser.add_argument("--library", help="Folder for the synthetic library (default: a temp folder, reused)")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--no-stages", action="store_true", help="Skip the per-stage breakdown")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--run-mode", help=argparse.SUPPRESS) # Internal: one mode per subprocess
+    parser.add_argument("--cache", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_child(args)
+        return
+
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+    library = args.library or os.path.join(tempfile.gettempdir(), "soundboard_bench_library")
+    start = time.perf_counter()
+    generate_library(library, args.clips, formats)
+    print(f"Synthetic library: {args.clips} clips ({', '.join(formats)}) in {library} "
+          f"(ready in {time.perf_counter() - start:.1f} s)")
+
+    cache_dir = tempfile.mkdtemp(prefix="soundboard_bench_cache_")
+    results = {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+               "cpu_count": os.cpu_count(), "clips": args.clips, "formats": formats, "modes": [], "stages": None}
+    try:
+        modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+        for mode in modes:
+            if mode not in MODES:
+                parser.error(f"unknown mode: {mode}")
+            if mode.startswith("cold"):
+                shutil.rmtree(cache_dir, ignore_errors=True) # Every cold run starts from an empty store
+            results["modes"].append(spawn(mode, library, cache_dir))
+        if not args.no_stages:
+            results["stages"] = spawn("stages", library, cache_dir)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+def spawn(mode, library, cache_dir):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-mode", mode,
+                             "--library", library, "--cache", cache_dir],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1]) # Earlier lines are the engine's own log
+
+
+def print_report(results):
+    print(f"\n{'mode':<14} {'workers':>7} {'loaded':>7} {'store':>6} {'errors':>6} {'first s':>8} {'total s':>8} "
+          f"{'files/s':>8} {'src MB/s':>8} {'pcm MB/s':>8} {'RSS MB':>7} {'workers':>8}")
+    for r in results["modes"]:
+        rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "-"
+        rss_workers = f"{r['peak_rss_workers_mb']:.0f}" if r["peak_rss_workers_mb"] is not None else "-"
+        first = f"{r['first_clip_seconds']:.3f}" if r["first_clip_seconds"] is not None else "-"
+        print(f"{r['mode']:<14} {r['workers']:>7} {r['loaded']:>7} {r['from_store']:>6} {sum(r['errors'].values()):>6} "
+              f"{first:>8} {r['total_seconds']:>8.2f} {r['files_per_second']:>8.1f} "
+              f"{r['source_mb_per_second']:>8.1f} {r['pcm_mb_per_second']:>8.1f} {rss:>7} {rss_workers:>8}")
+
+    if results["stages"]:
+        stage_names = ("decode", "resample", "channels", "convert", "stream_resample")
+        print("\nPer stage, serial (x real time; higher is faster):")
+        print(f"{'format':<6} {'files':>5} {'errors':>6} " + " ".join(f"{name:>15}" for name in stage_names))
+        for ext, entry in sorted(results["stages"].items()):
+            factors = [entry["realtime_factor"].get(name) for name in stage_names]
+            print(f"{ext:<6} {entry['files']:>5} {entry['errors']:>6} "
+                  + " ".join(f"{f:>15.0f}" if f else f"{'-':>15}" for f in factors))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Benchmark: the mix callback driven offline by a fake stream.
+
+FakeStream calls a callback with the same signature and buffers as a
+sounddevice.Stream (preallocated float32 indata/outdata, frames, time,
+status), so no audio device or driver is needed; it runs on a headless
+Linux box. The callback is MixEngine.callback, the same function
+AudioMixerApp.audio_callback calls.
+Every case mixes a synthetic mic input plus N playing voices, with new
+triggers queued between blocks (as the hotkey thread would, with a
+latency trace) so command draining and voice stealing are part of the
+measurement.
+
+Reported per case:
+    p50 / p99 / p99.9 / max time per block (µs)
+    load       p99 time as a share of the real-time deadline (frames / rate)
+    headroom   1 - max time / deadline (negative = the block was late)
+    alloc B    largest memory peak of one block (tracemalloc); short-lived
+               Python objects only, held to the fixed per-block budget
+               audio_engine.BLOCK_ALLOC_BUDGET whatever the block size
+
+Usage: python benchmarks/bench_mixer.py [--blocks 3000] [--samplerate 48000]
+                                        [--quick] [--max-load 0.5] [--json results.json]
+Exits with status 1 if a case's p99 load exceeds --max-load, or if a block
+went over the allocation budget.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import types
+import argparse
+import platform
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from audio_engine import MixEngine, StreamRing, CallbackStats, LatencyTracer, BLOCK_ALLOC_BUDGET
+
+BLOCK_SIZES = (64, 128, 256, 512, 1024)
+VOICE_COUNTS = (0, 4, 16, 32)
+CHANNEL_LAYOUTS = ((0, 2), (1, 2), (2, 2), (2, 1)) # (mic channels, 0 = no mic; output channels)
+RETRIGGER_EVERY = 8 # Blocks between queued triggers
+
+
+class FakeStream:
+    """Calls `callback(indata, outdata, frames, time, status)` like a PortAudio stream, without a device."""
+
+    def __init__(self, callback, samplerate, blocksize, in_channels, out_channels):
+        self.callback = callback
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        rng = np.random.default_rng(1)
+        # A few seconds of synthetic mic signal, handed out block by block like a driver buffer
+        self._mic = (rng.standard_normal((blocksize * 64, max(in_channels, 1))) * 0.1).astype(np.float32)
+        self.indata = np.zeros((blocksize, max(in_channels, 1)), dtype=np.float32)
+        self.outdata = np.zeros((blocksize, out_channels), dtype=np.float32)
+        # PortAudio's timestamps; the DAC time is one block after the callback
+        self.time_info = types.SimpleNamespace(inputBufferAdcTime=0.0, currentTime=1.0,
+                                               outputBufferDacTime=1.0 + blocksize / samplerate)
+        self.block_index = 0
+
+    def run_block(self):
+        """Delivers one block and returns the callback's duration in seconds."""
+        start = (self.block_index % 64) * self.blocksize
+        np.copyto(self.indata, self._mic[start:start + self.blocksize])
+        self.block_index += 1
+        t0 = time.perf_counter()
+        self.callback(self.indata, self.outdata, self.blocksize, self.time_info, None)
+        return time.perf_counter() - t0
+
+
+def make_callback(engine, mic_enabled):
+    """What AudioMixerApp.audio_callback does: hands the mic input (if one is selected) to MixEngine.callback."""
+    def audio_callback(indata, outdata, frames, time_info, status):
+        engine.callback(indata if mic_enabled else None, outdata, frames, time_info, status)
+    return audio_callback
+
+
+class CaseDriver:
+    """One benchmark case: an engine kept busy with `voices` voices, `stream_voices` of them streamed."""
+
+    def __init__(self, samplerate, frames, in_channels, out_channels, voices, stream_voices):
+        self.frames = frames
+        self.voices = voices
+        self.engine = MixEngine(max_voices=max(voices, 1), samplerate=samplerate)
+        self.engine.prepare(frames, out_channels)
+        self.engine.reset(mic_vol=0.8, music_vol=0.5)
+        self.engine.tracer = LatencyTracer()
+        self.engine.stats = CallbackStats()
+        self.stream = FakeStream(make_callback(self.engine, in_channels > 0), samplerate, frames,
+                                 in_channels, out_channels)
+        rng = np.random.default_rng(0)
+        self.clip = (rng.standard_normal((samplerate * 5, out_channels)) * 0.05).astype(np.float32)
+        self.rings = [StreamRing(samplerate, out_channels) for _ in range(min(stream_voices, voices))]
+        for ring in self.rings:
+            self._feed(ring)
+            self.engine.play(ring, key="stream")
+        for _ in range(voices - len(self.rings)):
+            self.engine.play(self.clip, key="clip")
+        self.stream.run_block() # Starts the voices
+
+    def _feed(self, ring):
+        # Stands in for the reader thread; runs between blocks, outside the timing
+        while ring.writable >= self.frames * 4:
+            ring.write(self.clip[:self.frames * 4])
+
+    def between_blocks(self):
+        """What other threads do while the audio thread sleeps."""
+        for ring in self.rings:
+            self._feed(ring)
+        if self.voices and self.stream.block_index % RETRIGGER_EVERY == 0:
+            trace = self.engine.tracer.begin("Hotkey", "clip")
+            self.engine.play(self.clip, key="clip", trace=trace) # Steals a voice once all are busy
+
+    def run(self, blocks):
+        times = np.empty(blocks)
+        for i in range(blocks):
+            self.between_blocks()
+            times[i] = self.stream.run_block()
+        return times
+
+    def max_alloc(self, blocks):
+        """Largest tracemalloc peak of one block (traced on both sides of a warm-up block)."""
+        tracemalloc.start()
+        self.between_blocks()
+        self.stream.run_block()
+        max_peak = 0
+        for _ in range(blocks):
+            self.between_blocks()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            self.stream.run_block()
+            max_peak = max(max_peak, tracemalloc.get_traced_memory()[1] - before)
+        tracemalloc.stop()
+        return max_peak
+
+
+def run_case(samplerate, frames, in_channels, out_channels, voices, stream_voices, blocks):
+    driver = CaseDriver(samplerate, frames, in_channels, out_channels, voices, stream_voices)
+    driver.run(min(blocks, 200)) # Warm-up (caches, branch predictors, lazily built NumPy state)
+    times = driver.run(blocks)
+    alloc = driver.max_alloc(min(blocks, 500))
+
+    deadline = frames / samplerate
+    p50, p99, p999 = np.percentile(times, [50, 99, 99.9])
+    return {
+        "frames": frames,
+        "mic_channels": in_channels,
+        "out_channels": out_channels,
+        "voices": voices,
+        "stream_voices": min(stream_voices, voices),
+        "blocks": blocks,
+        "deadline_us": deadline * 1e6,
+        "p50_us": p50 * 1e6,
+        "p99_us": p99 * 1e6,
+        "p999_us": p999 * 1e6,
+        "max_us": float(times.max()) * 1e6,
+        "load_p99": p99 / deadline,
+        "headroom_worst": 1.0 - float(times.max()) / deadline,
+        "late_blocks": int((times > deadline).sum()),
+        "alloc_peak_bytes": alloc,
+        "stolen_voices": driver.engine.stolen_voices,
+        "stream_underruns": driver.engine.stream_underruns,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=3000)
+    parser.add_argument("--samplerate", type=int, default=48000)
+    parser.add_argument("--stream-voices", type=int, default=2, help="Voices fed from a StreamRing (long clips)")
+    parser.add_argument("--quick", action="store_true", help="128/512 frames, 16 voices, stereo mic only")
+    parser.add_argument("--max-load", type=float, default=0.5, help="Fail if p99 time exceeds this share of the deadline")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.quick:
+        block_sizes, voice_counts, layouts = (128, 512), (16,), ((2, 2),)
+    else:
+        block_sizes, voice_counts, layouts = BLOCK_SIZES, VOICE_COUNTS, CHANNEL_LAYOUTS
+
+    print(f"Mixer benchmark: {args.samplerate} Hz, {args.blocks} blocks per case, "
+          f"NumPy {np.__version__}, Python {platform.python_version()}, GC {'on' if gc.isenabled() else 'off'}, "
+          f"allocation budget {BLOCK_ALLOC_BUDGET} B per block")
+    print(f"{'frames':>6} {'mic':>3} {'out':>3} {'voices':>6} {'p50 us':>8} {'p99 us':>8} {'p99.9':>8} "
+          f"{'max us':>8} {'deadline':>8} {'load':>6} {'headroom':>8} {'alloc B':>8}  result")
+    results = []
+    failed = False
+    for frames in block_sizes:
+        for in_channels, out_channels in layouts:
+            for voices in voice_counts:
+                r = run_case(args.samplerate, frames, in_channels, out_channels, voices,
+                             args.stream_voices, args.blocks)
+                problems = []
+                if r["load_p99"] > args.max_load:
+                    problems.append("SLOW")
+                if r["alloc_peak_bytes"] >= BLOCK_ALLOC_BUDGET:
+                    problems.append("OVER BUDGET")
+                r["ok"] = not problems
+                failed |= bool(problems)
+                results.append(r)
+                print(f"{frames:>6} {in_channels or '-':>3} {out_channels:>3} {voices:>6} {r['p50_us']:>8.1f} "
+                      f"{r['p99_us']:>8.1f} {r['p999_us']:>8.1f} {r['max_us']:>8.1f} {r['deadline_us']:>8.0f} "
+                      f"{r['load_p99']:>6.1%} {r['headroom_worst']:>8.1%} {r['alloc_peak_bytes']:>8}  "
+                      f"{'OK' if not problems else ' '.join(problems)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"samplerate": args.samplerate, "numpy": np.__version__,
+                       "python": platform.python_version(), "machine": platform.machine(),
+                       "alloc_budget_bytes": BLOCK_ALLOC_BUDGET,
+                       "cases": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Micro-benchmark: search box lookup time on a large synthetic library.
+
+Builds a TrigramIndex over generated clip names and category tags (no
+files are needed) and times typical queries: one or two typed letters,
+whole words, multi-word phrases and typos.
+
+Usage: python benchmarks/bench_search.py [--clips 20000] [--limit 200] [--repeat 200]
+Exits with status 1 if any query's 99th percentile is 1 ms or more.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from search import TrigramIndex
+
+WORDS = ["air", "horn", "explosion", "laugh", "sad", "trombone", "bruh", "wow", "applause", "drum",
+         "roll", "fail", "win", "cat", "dog", "meme", "scream", "boom", "ding", "beep", "crowd",
+         "cheer", "boo", "wilhelm", "vine", "thud", "glass", "break", "alarm", "siren", "whoosh"]
+CATEGORIES = ["", "memes", "music", "sfx", "voice", "games/retro", "games/fps", "sfx/impacts"]
+QUERIES = ["a", "ai", "air", "air horn", "trombne", "sad trom", "explo", "retro boom",
+           "wilhelm scream", "glass break", "zzz"]
+
+
+def build_index(clips):
+    rng = random.Random(0)
+    index = TrigramIndex()
+    for i in range(clips):
+        name = "_".join(rng.sample(WORDS, rng.randint(1, 3))) + f"_{i}"
+        category = rng.choice(CATEGORIES)
+        index.add(os.path.join("Soundboard Rsc", category, name + ".mp3"), ",".join(category.split("/")))
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clips", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=200, help="Rows per search (the app shows 200)")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_index(args.clips)
+    print(f"Indexed {len(index)} clips in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    failed = False
+    print(f"{'query':<16} {'results':>7} {'p50 us':>8} {'p99 us':>8}  result")
+    for query in QUERIES:
+        index.search(query, limit=args.limit) # Builds the posting arrays this query uses
+        times = np.empty(args.repeat)
+        for i in range(args.repeat):
+            t0 = time.perf_counter()
+            results = index.search(query, limit=args.limit)
+            times[i] = time.perf_counter() - t0
+        p50, p99 = np.percentile(times, [50, 99]) * 1e6
+        ok = p99 < 1000
+        failed |= not ok
+        print(f"{query!r:<16} {len(results):>7} {p50:>8.0f} {p99:>8.0f}  {'OK' if ok else 'FAIL (>= 1 ms)'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Audio device enumeration and hot-plug watching for the soundboard.
+
+The device scan (a pycaw COM scan plus PortAudio's device list) runs on a
+background thread, so the window appears without waiting for it. The same
+thread polls a cheap fingerprint of the attached devices and reports when
+it changes; the app then closes its streams and asks for a full refresh,
+because PortAudio only sees new devices after it is re-initialized.
+"""
+import os
+import re
+import queue
+import threading
+
+import sounddevice as sd
+
+# pycaw is optional; without it disabled devices are listed too.
+try:
+    from pycaw.pycaw import AudioUtilities
+    from comtypes import CoInitialize, CoUninitialize
+    PYCAW_AVAILABLE = True
+except ImportError:
+    PYCAW_AVAILABLE = False
+    print("Note: 'pycaw' not found. Run 'pip install pycaw' to hide disabled audio devices.")
+except Exception as e:
+    PYCAW_AVAILABLE = False
+    print(f"Note: Error loading 'pycaw': {e}")
+
+MIC_OFF = "(Mic Off)"
+DEFAULT_SPEAKER = "(Default Speaker)"
+
+
+def get_active_windows_devices(verbose=True):
+    """
+    Uses pycaw to get a set of 'Active' (enabled) audio device names.
+    Returns None if pycaw is unavailable or fails.
+    """
+    if not PYCAW_AVAILABLE:
+        return None
+
+    if verbose:
+        print("pycaw: Scanning for active audio devices...")
+    active_devices_set = set()
+    try:
+        CoInitialize()
+        devices = AudioUtilities.GetDevices()
+        for device in devices:
+            if device.state() == 1: # 1 == DEVICE_STATE_ACTIVE
+                active_devices_set.add(device.FriendlyName)
+        if verbose:
+            print(f"pycaw: Found {len(active_devices_set)} active devices.")
+        CoUninitialize()
+        return active_devices_set
+    except Exception as e:
+        print(f"pycaw: Device scan failed (disabling filter). (Error: {e})")
+        try: CoUninitialize()
+        except Exception: pass
+        return None
+
+
+def device_base_name(display_name):
+    """'(12) CABLE Input (VB-Audio)' -> 'CABLE Input (VB-Audio)' (indices change on hot-plug)."""
+    return re.sub(r"^\(\d+\) ", "", display_name or "")
+
+
+def scan_devices():
+    """
+    Lists PortAudio devices, filtering out disabled ones if pycaw is available.
+    Returns: {"inputs": [display names], "outputs": [display names], "device_map": {display name: index}}
+    """
+    device_map = {}
+    input_devices = [MIC_OFF]
+    output_devices = [DEFAULT_SPEAKER]
+
+    active_devices_set = get_active_windows_devices()
+
+    devices = sd.query_devices()
+    hostapis = sd.query_hostapis()
+
+    for i, device in enumerate(devices):
+        # Filter out disabled WASAPI devices if possible
+        if active_devices_set is not None:
+            try:
+                api_name = hostapis[device['hostapi']]['name']
+                sd_name = device['name']
+                if api_name == 'Windows WASAPI':
+                    if sd_name not in active_devices_set:
+                        print(f"Filtered (disabled/unplugged): {sd_name}")
+                        continue
+            except Exception as e:
+                print(f"Error during device filter (ignoring): {e}")
+
+        device_name = f"({i}) {device['name']}"
+        device_map[device_name] = i
+
+        if device['max_input_channels'] > 0:
+            input_devices.append(device_name)
+        if device['max_output_channels'] > 0:
+            output_devices.append(device_name)
+
+    return {"inputs": input_devices, "outputs": output_devices, "device_map": device_map}
+
+
+def device_signature():
+    """Cheap fingerprint of the attached devices, for change polling (None = can't tell)."""
+    active = get_active_windows_devices(verbose=False)
+    if active is not None:
+        return frozenset(active)
+    if os.path.isdir("/dev/snd"): # Linux (ALSA)
+        return frozenset(os.listdir("/dev/snd"))
+    return None
+
+
+class DeviceWatcher:
+    """
+    Background device scanner.
+
+    Results are put on `self.results` for the UI thread to drain (e.g. with
+    Tk's after()):
+        ("devices", snapshot)  (see scan_devices; after start and every refresh)
+        ("changed", None)      (devices were added/removed; close streams, then request_refresh)
+        ("error", exception)
+    """
+
+    def __init__(self, poll_interval=2.0):
+        self.poll_interval = poll_interval
+        self.results = queue.Queue()
+        self._refresh = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="device-watcher", daemon=True)
+            self._thread.start()
+
+    def request_refresh(self):
+        """Re-initializes PortAudio and rescans. Only call while no stream is open."""
+        self._refresh.set()
+
+    def stop(self):
+        self._stop.set()
+        self._refresh.set() # Wake the thread
+
+    def _scan(self):
+        try:
+            self.results.put(("devices", scan_devices()))
+        except Exception as e:
+            self.results.put(("error", e))
+
+    def _run(self):
+        signature = device_signature()
+        self._scan()
+        while True:
+            refresh = self._refresh.wait(self.poll_interval)
+            if self._stop.is_set():
+                return
+            if refresh:
+                self._refresh.clear()
+                try:
+                    # PortAudio's device list is fixed until it is re-initialized
+                    sd._terminate()
+                    sd._initialize()
+                except Exception as e:
+                    print(f"[!] PortAudio re-initialization failed: {e}")
+                signature = device_signature()
+                self._scan()
+                continue
+
+            current = device_signature()
+            if current is not None and current != signature:
+                signature = current
+                self.results.put(("changed", None))
@@ -0,0 +1,432 @@
+"""
+Block-based dynamics for the mix: a noise gate and compressor on the mic
+bus, and a look-ahead true-peak limiter on the master output.
+
+Everything here runs inside MixEngine.process() on the audio thread. The
+gate and compressor measure each block once (RMS) and work out one gain
+per block with plain float math; that gain is ramped linearly across the
+block, so there is no per-sample Python loop and no zipper noise. The
+limiter is vectorized per block over buffers preallocated in prepare().
+
+Parameters are plain attributes. Other threads may change them at any
+time, and the audio thread reads them once per block. Settings that size
+buffers (the limiter's look-ahead, enabling the limiter) take effect on
+the next prepare(), i.e. when the stream restarts.
+"""
+import math
+
+import numpy as np
+
+_SILENCE_DB = -120.0
+
+
+_TAPS = 16 # Interpolator length (BS.1770 and analyze_loudness use 12; longer reads high frequencies better)
+
+
+def _interpolator(fraction, taps=_TAPS, beta=5.0, cutoff=0.92):
+    """
+    Low-pass (Kaiser-windowed sinc) taps for the point `fraction` of the way from
+    row taps/2 - 1 to row taps/2 of `taps` rows, cut off just under Nyquist
+    like the 4x PolyphaseResampler that analyze_loudness measures true peak with.
+    """
+    x = np.arange(taps) - (taps // 2 - 1) - fraction
+    window = np.i0(beta * np.sqrt(np.clip(1.0 - (x / (taps // 2)) ** 2, 0.0, None))) / np.i0(beta)
+    h = cutoff * np.sinc(cutoff * x) * window
+    return h / h.sum()
+
+
+# True-peak estimate (4x oversampling): the points 1/4, 1/2 and 3/4 of the way between two
+# samples, from the 16 samples around them. With pair sums S_k = x[k] + x[15-k] and differences
+# D_k = x[k] - x[15-k]: half = sum(HALF_k S_k); the 1/4 and 3/4 points are E + O and E - O,
+# where E = sum(EVEN_k S_k) and O = sum(ODD_k D_k), so the larger of the two is |E| + |O|.
+_PAIRS = _TAPS // 2
+_HALF = _interpolator(0.5)[:_PAIRS]
+_QUARTER = _interpolator(0.25)
+_EVEN = (_QUARTER[:_PAIRS] + _QUARTER[:_PAIRS - 1:-1]) / 2.0
+_ODD = (_QUARTER[:_PAIRS] - _QUARTER[:_PAIRS - 1:-1]) / 2.0
+# The point on the sample itself, low-passed the same way: with content above the cutoff, a
+# meter reads something other than the sample there. Symmetric, from the 7 samples either side
+# (the 16th tap, at the edge of the window, is ~0 and dropped).
+_CENTRE = _interpolator(1.0)[1:]
+_CENTRE = _CENTRE / _CENTRE.sum()
+
+
+def _smoothing(frames, time_ms, samplerate):
+    """Share of the way a one-pole follower moves toward its target over `frames`."""
+    if time_ms <= 0:
+        return 1.0
+    return 1.0 - math.exp(-frames / (time_ms * 0.001 * samplerate))
+
+
+class NoiseGate:
+    """Closes the mic (down to `range_db`) while its level stays below `threshold_db`."""
+
+    def __init__(self, threshold_db=-50.0, range_db=-40.0, hysteresis_db=6.0,
+                 attack_ms=1.0, hold_ms=150.0, release_ms=80.0):
+        self.enabled = False
+        self.threshold_db = threshold_db   # Opens at or above this level (dBFS RMS)
+        self.range_db = range_db           # Attenuation while closed
+        self.hysteresis_db = hysteresis_db # Closes only this far below the threshold
+        self.attack_ms = attack_ms
+        self.hold_ms = hold_ms             # Stays open this long after the level drops
+        self.release_ms = release_ms
+        self.reset()
+
+    def reset(self):
+        self.gain = 1.0
+        self.is_open = True
+        self._hold_frames = 0.0
+
+    def block_gain(self, level_db, frames, samplerate):
+        if level_db >= self.threshold_db:
+            self.is_open = True
+            self._hold_frames = self.hold_ms * 0.001 * samplerate
+        elif level_db < self.threshold_db - self.hysteresis_db:
+            if self._hold_frames > 0:
+                self._hold_frames -= frames
+            else:
+                self.is_open = False
+        target = 1.0 if self.is_open else 10.0 ** (self.range_db / 20.0)
+        time_ms = self.attack_ms if target > self.gain else self.release_ms
+        self.gain += (target - self.gain) * _smoothing(frames, time_ms, samplerate)
+        return self.gain
+
+
+class Compressor:
+    """Feed-forward RMS compressor with a soft knee and makeup gain."""
+
+    def __init__(self, threshold_db=-24.0, ratio=3.0, knee_db=6.0, attack_ms=5.0,
+                 release_ms=120.0, makeup_db=3.0):
+        self.enabled = False
+        self.threshold_db = threshold_db
+        self.ratio = ratio
+        self.knee_db = knee_db
+        self.attack_ms = attack_ms
+        self.release_ms = release_ms
+        self.makeup_db = makeup_db
+        self.reset()
+
+    def reset(self):
+        self.envelope_db = _SILENCE_DB
+        self.reduction_db = 0.0 # Current gain reduction (for metering; >= 0)
+
+    def block_gain(self, level_db, frames, samplerate):
+        time_ms = self.attack_ms if level_db > self.envelope_db else self.release_ms
+        self.envelope_db += (level_db - self.envelope_db) * _smoothing(frames, time_ms, samplerate)
+
+        over = self.envelope_db - self.threshold_db
+        knee = self.knee_db
+        slope = 1.0 / max(self.ratio, 1.0) - 1.0
+        if 2.0 * over <= -knee:
+            change_db = 0.0
+        elif 2.0 * over < knee:
+            change_db = slope * (over + knee / 2.0) ** 2 / (2.0 * knee)
+        else:
+            change_db = slope * over
+        self.reduction_db = -change_db
+        return 10.0 ** ((change_db + self.makeup_db) / 20.0)
+
+
+class MicChain:
+    """
+    Mic bus processing: gate -> compressor -> volume, as one gain per block.
+
+    process() measures the block, asks each enabled stage for its gain and
+    multiplies the block by a linear ramp from the previous block's total
+    gain to the new one (a plain scalar multiply when it did not change).
+    """
+
+    def __init__(self):
+        self.gate = NoiseGate()
+        self.compressor = Compressor()
+        self.samplerate = 44100
+        self.level_db = _SILENCE_DB # Last block's input level (for metering)
+        self._last_gain = None
+        self._index = np.zeros((0, 1), dtype=np.float32)
+        self._ramp = np.zeros((0, 1), dtype=np.float32)
+        self._ramp_block = np.zeros((0, 2), dtype=np.float32)
+        self._scalar = np.zeros((), dtype=np.float32)
+        self._offset = np.zeros((), dtype=np.float32)
+        self._views = (0, None, None, None) # (frames, index, ramp, ramp_block) of the last block size
+
+    def prepare(self, max_frames, channels, samplerate):
+        self.samplerate = samplerate
+        self._index = np.arange(1, max_frames + 1, dtype=np.float32).reshape(-1, 1)
+        self._ramp = np.zeros((max_frames, 1), dtype=np.float32)
+        self._ramp_block = np.zeros((max_frames, channels), dtype=np.float32)
+        self._views = (0, None, None, None)
+        self.reset()
+
+    def reset(self):
+        self.gate.reset()
+        self.compressor.reset()
+        self.level_db = _SILENCE_DB
+        self._last_gain = None
+
+    def process(self, block, frames, input_gain, volume):
+        """
+        Applies the chain to `block` in place. `input_gain` scales the block to
+        the mic's level (e.g. 0.5 after summing two channels); `volume` is the
+        Mic Vol fader, applied after the dynamics.
+        """
+        level = math.sqrt(float(np.vdot(block, block)) / block.size) * input_gain if block.size else 0.0
+        level_db = 20.0 * math.log10(level) if level > 1e-6 else _SILENCE_DB
+        self.level_db = level_db
+
+        gain = input_gain * volume
+        if self.gate.enabled:
+            gain *= self.gate.block_gain(level_db, frames, self.samplerate)
+        if self.compressor.enabled:
+            gain *= self.compressor.block_gain(level_db, frames, self.samplerate)
+
+        last = self._last_gain
+        self._last_gain = gain
+        if self._views[0] != frames:
+            # Slice views cost an allocation each, so they are kept while the block size holds
+            self._views = (frames, self._index[:frames], self._ramp[:frames], self._ramp_block[:frames])
+        _, index, ramp, ramp_block = self._views
+        if last is None or last == gain or ramp_block.shape != block.shape:
+            self._scalar.fill(gain)
+            np.multiply(block, self._scalar, out=block)
+            return
+        # ramp[i] = last + (gain - last) * (i + 1) / frames, so the block ends exactly on `gain`
+        self._scalar.fill((gain - last) / frames)
+        self._offset.fill(last)
+        np.multiply(index, self._scalar, out=ramp)
+        np.add(ramp, self._offset, out=ramp)
+        np.copyto(ramp_block, ramp) # Spread over the channels (broadcasting arithmetic would allocate)
+        np.multiply(block, ramp_block, out=block)
+
+
+class _BlockPlan:
+    """Views into TruePeakLimiter's buffers for one block size and one side of the ping-pong."""
+
+
+class TruePeakLimiter:
+    """
+    Look-ahead limiter that holds the output's true peak at `ceiling_db`
+    (dBTP), replacing a hard clip.
+
+    The true peak of the input is estimated per sample as the largest of the
+    sample, the sample low-passed, and the points 1/4, 1/2 and 3/4 of the way
+    to the next one (4x oversampling with 16-tap interpolators cut off at 0.92
+    of Nyquist, like the meter in analyze_loudness). The gain each sample needs is
+    held for `lookahead_ms` ahead of it (sliding minimum), smoothed with a
+    moving average so it is already down when the peak arrives, and then
+    allowed to recover at `release_db_per_s`. The output is delayed by
+    `latency_frames` (look-ahead + 7 samples of interpolator context).
+
+    The sample peak never exceeds the ceiling. The true peak can: the 4x
+    points miss the peaks between them, a meter with a longer interpolator
+    reconstructs content near Nyquist differently, and a gain that changes
+    within the interpolator's span creates new peaks. Peaks are therefore
+    limited `margin_db` under the ceiling. Without it, white noise limited
+    hard reads up to ~0.5 dB over on a 4x meter with 32-tap interpolators
+    and ~1.2 dB over on a 16x one; with the default 1 dB, white and pink
+    noise stay under on both, and only noise concentrated near Nyquist still
+    reads ~0.2 dB over on the 16x meter. Material without a true peak above
+    its sample peak (e.g. low sines) is limited 1 dB lower than it needs.
+
+    Every step is a whole-block ufunc on contiguous buffers from prepare():
+    no reductions, no broadcasting arithmetic (both make NumPy allocate
+    iterator buffers). Even the slice views a block uses are built once per
+    block size (see _plan), so a block creates no arrays at all. The
+    history, required-gain and held-gain buffers are ping-ponged between two
+    copies, so carrying their tails into the next block never copies a
+    buffer onto itself.
+    """
+
+    def __init__(self, ceiling_db=-1.0, lookahead_ms=1.5, release_db_per_s=80.0):
+        self.enabled = True
+        self.ceiling_db = ceiling_db
+        self.margin_db = 1.0 # Headroom for inter-sample peaks the detector cannot see (see above)
+        self.lookahead_ms = lookahead_ms
+        self.release_db_per_s = release_db_per_s
+        self.active = False # Whether the prepared buffers are in use (enabled at prepare time)
+        self.samplerate = 44100
+        self.latency_frames = 0
+        self.reduction_db = 0.0 # Deepest gain reduction in the last block (for metering)
+        self.replans = 0 # Block size changes (each builds new views, i.e. allocates)
+
+    @property
+    def latency_seconds(self):
+        return self.latency_frames / self.samplerate if self.active else 0.0
+
+    def prepare(self, max_frames, channels, samplerate):
+        self.samplerate = samplerate
+        self.active = self.enabled
+        lookahead = max(1, int(round(self.lookahead_ms * 0.001 * samplerate)))
+        attack = lookahead // 2 + 1 # Moving-average length; must stay <= lookahead + 1
+        carry = lookahead + _TAPS - 1 # History rows kept between blocks (see process)
+        self._lookahead, self._attack, self._carry = lookahead, attack, carry
+        self.latency_frames = lookahead + _PAIRS - 1
+
+        f32 = np.float32
+        block = (max_frames, channels)
+        self._history = [np.zeros((carry + max_frames, channels), dtype=f32) for _ in range(2)]
+        self._required = [np.ones(lookahead + max_frames, dtype=f32) for _ in range(2)]
+        self._held = [np.ones(attack - 1 + max_frames, dtype=f32) for _ in range(2)]
+        self._window_min = [np.zeros(lookahead + max_frames, dtype=f32) for _ in range(2)]
+        self._cumsum = np.zeros(attack + max_frames, dtype=f32) # [0] stays 0
+        self._pair_sum, self._pair_diff, self._tmp = (np.zeros(block, dtype=f32) for _ in range(3))
+        self._half, self._even, self._odd, self._centre = (np.zeros(block, dtype=f32) for _ in range(4))
+        self._peak = np.zeros(max_frames, dtype=f32)
+        self._log = np.zeros(max_frames, dtype=f32)
+        self._gain = np.zeros((max_frames, 1), dtype=f32)
+        self._gain_block = np.zeros(block, dtype=f32)
+        release_per_frame = self.release_db_per_s / 20.0 * math.log(10.0) / samplerate
+        self._release_ramp = np.arange(max_frames, dtype=f32) * f32(release_per_frame)
+        self._release = f32(release_per_frame)
+        self._last_log = np.full((), release_per_frame, dtype=f32) # log(last gain) + one frame of release
+        self._taps = [tuple(np.full((), tap, dtype=f32) for tap in taps) for taps in zip(_HALF, _EVEN, _ODD)]
+        self._centre_taps = [np.full((), tap, dtype=f32) for tap in _CENTRE[_PAIRS - 1:]] # Centre, then +-1, +-2, ...
+        self._ceiling = np.zeros((), dtype=f32)
+        self._inv_attack = np.full((), 1.0 / attack, dtype=f32)
+        self._max_frames = max_frames
+        self._side = 0
+        self._plans = None
+        self._plan_frames = 0
+
+    def _plan(self, frames):
+        """Builds the views both sides of the ping-pong use for blocks of `frames`."""
+        self.replans += 1
+        carry, lookahead, attack = self._carry, self._lookahead, self._attack
+        base = carry - (_PAIRS - 1) # First detector row: the newest with _PAIRS rows before it and _PAIRS - 1 after
+        plans = []
+        for side in (0, 1):
+            other = 1 - side
+            history, required, held = self._history[side], self._required[side], self._held[side]
+            plan = _BlockPlan()
+            plan.input = history[carry:carry + frames]
+            plan.center = history[base:base + frames]
+            # Pair k: rows p-_PAIRS+k and p+_PAIRS-1-k around the detector row p (see _HALF/_EVEN/_ODD)
+            plan.pairs = [(history[base - _PAIRS + k:base - _PAIRS + k + frames],
+                           history[base + _PAIRS - 1 - k:base + _PAIRS - 1 - k + frames]) + self._taps[k]
+                          for k in range(_PAIRS)]
+            plan.centre_pairs = [(history[base - j:base - j + frames], history[base + j:base + j + frames],
+                                  self._centre_taps[j]) for j in range(1, _PAIRS)]
+            plan.required = required[lookahead:lookahead + frames]
+
+            # Sliding minimum over lookahead + 1 rows by doubling spans: each pass
+            # takes the minimum of two overlapping spans, then the last pair covers the window
+            passes = []
+            source, count, span, turn = required, lookahead + frames, 1, 0
+            while span * 2 <= lookahead + 1:
+                target = self._window_min[turn]
+                passes.append((source[:count - span], source[span:count], target[:count - span]))
+                source, count, span, turn = target, count - span, span * 2, 1 - turn
+            plan.min_passes = passes
+            shift = lookahead + 1 - span
+            plan.min_last = (source[:frames], source[shift:shift + frames], held[attack - 1:attack - 1 + frames])
+
+            plan.held = held[:attack - 1 + frames]
+            plan.output_rows = history[_PAIRS:_PAIRS + frames] # base - lookahead rows in
+            plan.carries = [(self._history[other][:carry], history[frames:frames + carry]),
+                            (self._required[other][:lookahead], required[frames:frames + lookahead]),
+                            (self._held[other][:attack - 1], held[frames:frames + attack - 1])]
+            plans.append(plan)
+
+        self._plans = plans
+        self._plan_frames = frames
+        self._cumsum_out = self._cumsum[1:attack + frames]
+        self._cumsum_hi = self._cumsum[attack:attack + frames]
+        self._cumsum_lo = self._cumsum[:frames]
+        self._block_bufs = (self._pair_sum[:frames], self._pair_diff[:frames], self._tmp[:frames],
+                            self._half[:frames], self._even[:frames], self._odd[:frames], self._centre[:frames])
+        self._columns = [self._half[:frames, c] for c in range(self._half.shape[1])]
+        self._frames_peak = self._peak[:frames]
+        self._frames_log = self._log[:frames]
+        self._frames_gain = self._gain[:frames, 0]
+        self._frames_ramp = self._release_ramp[:frames]
+        self._frames_gain_block = self._gain_block[:frames]
+        self._gain_column = self._gain[:frames]
+
+    def process(self, out, frames):
+        """Limits `out` (frames, channels) in place; the result is delayed by latency_frames."""
+        if frames <= 0:
+            return
+        if frames != self._plan_frames:
+            if frames > self._max_frames:
+                self.prepare(frames, out.shape[1], self.samplerate)
+            self._plan(frames)
+        plan = self._plans[self._side]
+        np.copyto(plan.input, out)
+
+        # 1. True peak of the newest rows with full interpolator context (_PAIRS - 1 rows behind the input)
+        pair_sum, pair_diff, tmp, half, even, odd, centre = self._block_bufs
+        first = True
+        for early, late, half_tap, even_tap, odd_tap in plan.pairs:
+            np.add(early, late, out=pair_sum)
+            np.subtract(early, late, out=pair_diff)
+            if first:
+                np.multiply(pair_sum, half_tap, out=half)
+                np.multiply(pair_sum, even_tap, out=even)
+                np.multiply(pair_diff, odd_tap, out=odd)
+                first = False
+                continue
+            np.multiply(pair_sum, half_tap, out=tmp)
+            np.add(half, tmp, out=half)
+            np.multiply(pair_sum, even_tap, out=tmp)
+            np.add(even, tmp, out=even)
+            np.multiply(pair_diff, odd_tap, out=tmp)
+            np.add(odd, tmp, out=odd)
+        np.abs(even, out=even)
+        np.abs(odd, out=odd)
+        np.add(even, odd, out=even) # max(|1/4 point|, |3/4 point|)
+        np.abs(half, out=half)
+        np.maximum(half, even, out=half)
+        np.multiply(plan.center, self._centre_taps[0], out=centre)
+        for early, late, centre_tap in plan.centre_pairs:
+            np.add(early, late, out=pair_sum)
+            np.multiply(pair_sum, centre_tap, out=tmp)
+            np.add(centre, tmp, out=centre)
+        np.abs(centre, out=centre)
+        np.maximum(half, centre, out=half)
+        np.abs(plan.center, out=tmp) # Never below the sample peak
+        np.maximum(half, tmp, out=half)
+        # Loudest channel, column by column (a reduction over the axis would allocate)
+        peak = self._frames_peak
+        columns = self._columns
+        np.copyto(peak, columns[0])
+        for column in columns[1:]:
+            np.maximum(peak, column, out=peak)
+
+        # 2. Gain each of those rows needs (<= 1)
+        ceiling = self._ceiling
+        ceiling.fill(10.0 ** ((self.ceiling_db - self.margin_db) / 20.0))
+        np.maximum(peak, ceiling, out=peak)
+        np.divide(ceiling, peak, out=plan.required)
+
+        # 3. Look-ahead: each output row takes the smallest gain needed over the next `lookahead` rows
+        for a, b, target in plan.min_passes:
+            np.minimum(a, b, out=target)
+        a, b, target = plan.min_last
+        np.minimum(a, b, out=target)
+
+        # 4. Attack: moving average over `attack` rows (stays under every held minimum it covers)
+        gain = self._frames_gain
+        np.add.accumulate(plan.held, out=self._cumsum_out)
+        np.subtract(self._cumsum_hi, self._cumsum_lo, out=gain)
+        np.multiply(gain, self._inv_attack, out=gain)
+
+        # 5. Release: g[i] = min(g[i], g[i-1] * k), i.e. a running minimum in the log domain
+        log = self._frames_log
+        ramp = self._frames_ramp
+        np.log(gain, out=log)
+        np.subtract(log, ramp, out=log)
+        np.minimum.accumulate(log, out=gain)
+        np.minimum(gain, self._last_log, out=gain)
+        np.add(gain, ramp, out=gain)
+        self._last_log.fill(gain[frames - 1] + self._release)
+        np.minimum.accumulate(gain, out=log)
+        self.reduction_db = -8.685889638 * float(log[frames - 1]) # Deepest reduction (20 / ln 10)
+        np.exp(gain, out=gain)
+
+        # 6. Output rows times their gain (spread over the channels first; see above)
+        np.copyto(self._frames_gain_block, self._gain_column)
+        np.multiply(plan.output_rows, self._frames_gain_block, out=out)
+
+        # 7. Carry the tails into the other side's buffers for the next block
+        for dst, src in plan.carries:
+            np.copyto(dst, src)
+        self._side = 1 - self._side
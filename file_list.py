@@ -0,0 +1,207 @@
+"""
+Virtualized file list for the soundboard.
+
+Only the rows that fit in the window exist as widgets. Scrolling re-labels
+that small pool of rows from a plain list of paths, so building the list,
+scrolling and selecting cost the same with 10 files or 10,000.
+"""
+import os
+
+import customtkinter as ctk
+
+
+class VirtualFileList(ctk.CTkFrame):
+    """
+    Scrollable list of audio files: [file name] [Set (hotkey)] per row.
+
+    The model is `self.paths` (display order) plus `self._index` (path -> row).
+    Callbacks receive the file path:
+        on_select(path), on_double_click(path), on_hotkey_click(path)
+    `hotkey_text(path)` returns the text for a row's hotkey button.
+    """
+
+    ROW_HEIGHT = 32 # Button height (28) + vertical padding
+
+    def __init__(self, master, label_text="", on_select=None, on_double_click=None,
+                 on_hotkey_click=None, hotkey_text=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_select = on_select
+        self.on_double_click = on_double_click
+        self.on_hotkey_click = on_hotkey_click
+        self.hotkey_text = hotkey_text or (lambda path: "Set (None)")
+        self.label_text = label_text
+
+        # --- Model ---
+        self.paths = []
+        self._index = {}
+        self.selected_path = None
+        self._row_state = {} # { path: (button text, state) } overrides (e.g. "Recording...")
+
+        # --- View (pool of row widgets, reused while scrolling) ---
+        self.first_row = 0
+        self._rows = [] # [(frame, name_btn, hotkey_btn), ...]
+        self._row_paths = [] # Path currently shown by each pooled row (or None)
+        self._render_pending = False
+        self._highlight = ctk.ThemeManager.theme["CTkButton"]["fg_color"]
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+        self.header = ctk.CTkLabel(self, text=label_text)
+        self.header.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(4, 0))
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.grid(row=1, column=0, sticky="nsew", padx=(5, 0), pady=5)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns", pady=5)
+
+        self.body.bind("<Configure>", lambda event: self._schedule_render())
+        self._bind_wheel(self.body)
+
+    # --- Model API ---
+
+    def __contains__(self, path):
+        return path in self._index
+
+    def __len__(self):
+        return len(self.paths)
+
+    def add(self, path):
+        if path in self._index:
+            return
+        self._index[path] = len(self.paths)
+        self.paths.append(path)
+        self._schedule_render()
+
+    def remove(self, path):
+        row = self._index.pop(path, None)
+        if row is None:
+            return
+        del self.paths[row]
+        for i in range(row, len(self.paths)):
+            self._index[self.paths[i]] = i
+        self._row_state.pop(path, None)
+        if self.selected_path == path:
+            self.selected_path = None
+        self._schedule_render()
+
+    def set_paths(self, paths):
+        """Replaces the whole list (e.g. a filtered or re-sorted view). Selection is kept if still listed."""
+        self.paths = list(paths)
+        self._index = {path: i for i, path in enumerate(self.paths)}
+        self._row_state = {p: s for p, s in self._row_state.items() if p in self._index}
+        if self.selected_path not in self._index:
+            self.selected_path = None
+        self._schedule_render()
+
+    def clear(self):
+        self.paths.clear()
+        self._index.clear()
+        self._row_state.clear()
+        self.selected_path = None
+        self.first_row = 0
+        self._schedule_render()
+
+    def select(self, path):
+        """Highlights one row. Only the old and new rows are touched, if they are on screen."""
+        old = self.selected_path
+        self.selected_path = path
+        for i, shown in enumerate(self._row_paths):
+            if shown is not None and (shown == old or shown == path):
+                self._rows[i][1].configure(fg_color=self._highlight if shown == path else "transparent")
+
+    def set_row_state(self, path, text=None, state="normal"):
+        """Overrides a row's hotkey button (e.g. "Recording..."); text=None restores it."""
+        if text is None:
+            self._row_state.pop(path, None)
+        else:
+            self._row_state[path] = (text, state)
+        self.refresh_row(path)
+
+    def refresh_row(self, path):
+        """Re-renders one row (e.g. after its hotkey changed) if it is on screen."""
+        for i, shown in enumerate(self._row_paths):
+            if shown == path:
+                self._render_row(i, self._index.get(path))
+
+    # --- Rendering ---
+
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+
+    def _visible_count(self):
+        return max(1, self.body.winfo_height() // self.ROW_HEIGHT)
+
+    def _render(self):
+        self._render_pending = False
+        visible = self._visible_count()
+        self.first_row = max(0, min(self.first_row, len(self.paths) - visible))
+
+        while len(self._rows) < visible:
+            self._rows.append(self._create_row(len(self._rows)))
+            self._row_paths.append(None)
+        for i in range(len(self._rows)):
+            row = self.first_row + i
+            self._render_row(i, row if i < visible and row < len(self.paths) else None)
+
+        self.header.configure(text=f"{self.label_text} ({len(self.paths)})" if self.paths else self.label_text)
+        if self.paths:
+            self.scrollbar.set(self.first_row / len(self.paths),
+                               min(1.0, (self.first_row + visible) / len(self.paths)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _create_row(self, slot):
+        frame = ctk.CTkFrame(self.body, fg_color="transparent", height=self.ROW_HEIGHT)
+        frame.grid_columnconfigure(0, weight=1)
+        name_btn = ctk.CTkButton(frame, text="", fg_color="transparent", anchor="w",
+                                 command=lambda: self._on_row_event(slot, self.on_select))
+        name_btn.bind("<Double-Button-1>", lambda event: self._on_row_event(slot, self.on_double_click))
+        name_btn.grid(row=0, column=0, sticky="ew", padx=(5, 5))
+        hotkey_btn = ctk.CTkButton(frame, text="", width=120,
+                                   command=lambda: self._on_row_event(slot, self.on_hotkey_click))
+        hotkey_btn.grid(row=0, column=1, sticky="e", padx=(0, 5))
+        for widget in (frame, name_btn, hotkey_btn):
+            self._bind_wheel(widget)
+        return (frame, name_btn, hotkey_btn)
+
+    def _render_row(self, slot, row):
+        frame, name_btn, hotkey_btn = self._rows[slot]
+        if row is None:
+            self._row_paths[slot] = None
+            frame.place_forget()
+            return
+        path = self.paths[row]
+        self._row_paths[slot] = path
+        text, state = self._row_state.get(path) or (self.hotkey_text(path), "normal")
+        name_btn.configure(text=os.path.basename(path),
+                           fg_color=self._highlight if path == self.selected_path else "transparent")
+        hotkey_btn.configure(text=text, state=state)
+        frame.place(x=0, y=slot * self.ROW_HEIGHT, relwidth=1.0, height=self.ROW_HEIGHT)
+
+    def _on_row_event(self, slot, callback):
+        path = self._row_paths[slot]
+        if path is not None and callback:
+            callback(path)
+
+    # --- Scrolling ---
+
+    def scroll_to(self, first_row):
+        self.first_row = int(first_row)
+        self._schedule_render()
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.scroll_to(float(args[0]) * len(self.paths))
+        elif action == "scroll":
+            amount, unit = int(args[0]), args[1]
+            step = self._visible_count() if unit == "pages" else 1
+            self.scroll_to(self.first_row + amount * step)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel, add="+")
+        widget.bind("<Button-4>", lambda event: self.scroll_to(self.first_row - 3), add="+") # X11
+        widget.bind("<Button-5>", lambda event: self.scroll_to(self.first_row + 3), add="+")
+
+    def _on_wheel(self, event):
+        self.scroll_to(self.first_row - (3 if event.delta > 0 else -3))
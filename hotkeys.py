@@ -0,0 +1,142 @@
+"""
+Global hotkey dispatch for the soundboard.
+
+A single keyboard hook receives every key event. Bindings live in one
+dict keyed by (scan code, frozenset of held modifiers), and modifier
+state is tracked from the same event stream, so each keystroke costs one
+dict lookup no matter how many clips have hotkeys.
+"""
+import time
+import threading
+
+# 'keyboard' is optional; Soundboard.py already warns the user if it is missing.
+try:
+    import keyboard
+    KEYBOARD_AVAILABLE = True
+except Exception:
+    KEYBOARD_AVAILABLE = False
+
+# Every modifier name the keyboard library reports -> the name used in bindings.
+# Left/right variants are folded together, like keyboard.is_pressed('ctrl').
+MODIFIER_ALIASES = {
+    'ctrl': 'ctrl', 'left ctrl': 'ctrl', 'right ctrl': 'ctrl', 'control': 'ctrl',
+    'shift': 'shift', 'left shift': 'shift', 'right shift': 'shift',
+    'alt': 'alt', 'left alt': 'alt', 'right alt': 'alt',
+    'alt gr': 'alt gr',
+    'win': 'win', 'windows': 'win', 'left windows': 'win', 'right windows': 'win',
+    'left win': 'win', 'right win': 'win',
+    'apps': 'apps',
+}
+
+
+def normalize_mods(mods):
+    """Returns the frozenset of binding modifier names for a list like ['left ctrl', 'alt']."""
+    return frozenset(MODIFIER_ALIASES.get(mod, mod) for mod in mods)
+
+
+class HotkeyDispatcher:
+    """
+    One global keyboard hook that dispatches to bound actions.
+
+    Actions run on the keyboard library's hook thread, like the per-key
+    callbacks they replace. Holding a key down fires its action once;
+    auto-repeat events are ignored until the key is released. While an
+    action runs, event_time() returns when its key event happened.
+    """
+
+    def __init__(self):
+        self.bindings = {} # { (scan_code, frozenset(mods)): action }
+        self._binding_ids = {} # { (scan_code, frozenset(mods)): binding_id }
+        self._keys_by_id = {} # { binding_id: [keys in self.bindings] }
+        self._held = set() # Modifier keys currently held (as reported, e.g. 'right ctrl')
+        self._mods = frozenset() # The same, as binding names
+        self._down = set() # Scan codes of non-modifier keys currently held
+        self._hook = None
+        self._dispatching = threading.local() # .event_time while an action runs on this thread
+
+    def start(self):
+        if self._hook is None:
+            self._hook = keyboard.hook(self._on_event)
+
+    def stop(self):
+        if self._hook is not None:
+            try:
+                keyboard.unhook(self._hook)
+            except Exception as e:
+                print(f"[!] Failed to remove keyboard hook (ignoring): {e}")
+            self._hook = None
+
+    @staticmethod
+    def binding_keys(mods, main_key):
+        """
+        Returns the dict keys for a hotkey (one per scan code of `main_key`).
+        Raises ValueError if the keyboard library doesn't know the key.
+        """
+        mods = normalize_mods(mods)
+        return [(scan_code, mods) for scan_code in keyboard.key_to_scan_codes(main_key)]
+
+    def bind(self, binding_id, mods, main_key, action):
+        """
+        Adds (or replaces) one binding without touching any other, so the
+        rest of the hotkeys keep working while it changes. Raises ValueError
+        for an unknown key, leaving the old binding in place.
+        """
+        keys = self.binding_keys(mods, main_key)
+        self.unbind(binding_id)
+        for key in keys:
+            self.bindings[key] = action # Single dict stores; safe while the hook runs
+            self._binding_ids[key] = binding_id
+        self._keys_by_id[binding_id] = keys
+
+    def clear(self):
+        self.bindings.clear()
+        self._binding_ids.clear()
+        self._keys_by_id.clear()
+
+    def unbind(self, binding_id):
+        for key in self._keys_by_id.pop(binding_id, ()):
+            if self._binding_ids.get(key) == binding_id:
+                del self._binding_ids[key]
+                self.bindings.pop(key, None)
+
+    def event_time(self):
+        """
+        time.perf_counter() of the key event whose action is running on the
+        calling thread, or None outside a hotkey action (e.g. on the Tk thread).
+        """
+        return getattr(self._dispatching, "event_time", None)
+
+    # --- Hook Thread ---
+
+    def _on_event(self, event):
+        name = (event.name or "").lower()
+        mod = MODIFIER_ALIASES.get(name)
+        if event.event_type == keyboard.KEY_DOWN:
+            if mod is not None:
+                if name not in self._held:
+                    self._held.add(name)
+                    self._mods = normalize_mods(self._held)
+                return
+            scan_code = event.scan_code
+            if scan_code in self._down:
+                return # Auto-repeat
+            self._down.add(scan_code)
+            action = self.bindings.get((scan_code, self._mods))
+            if action is not None:
+                # event.time is wall-clock time from the hook; carry its age over to perf_counter
+                now = time.perf_counter()
+                age = time.time() - event.time if getattr(event, "time", None) else 0.0
+                self._dispatching.event_time = now - min(max(age, 0.0), 1.0)
+                try:
+                    action()
+                except Exception as e:
+                    print(f"[!] Hotkey action failed: {e}")
+                finally:
+                    self._dispatching.event_time = None
+        else:
+            if mod is not None:
+                if name in self._held:
+                    self._held.discard(name)
+                    self._mods = normalize_mods(self._held)
+                return
+            self._down.discard(event.scan_code)
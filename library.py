@@ -0,0 +1,375 @@
+"""
+Sound library scanning, indexing and folder watching for the soundboard.
+
+'Soundboard Rsc' is scanned recursively; each subfolder is a category.
+LibraryIndex keeps one SQLite row per file (duration, format, loudness,
+true peak, silence trim points, tags, hotkey), so the list can be filtered and sorted at startup without
+opening any audio file.
+
+FolderWatcher keeps a snapshot of the audio files (path -> mtime/size)
+and reports added, removed and modified files, so the app can patch its
+cache and file list instead of reloading everything. A change
+notification (inotify on Linux, ReadDirectoryChangesW on Windows) only
+wakes the watcher up; the diff always comes from a fresh directory scan,
+and polling covers systems without either API.
+"""
+import os
+import sys
+import time
+import queue
+import select
+import sqlite3
+import threading
+import ctypes
+import ctypes.util
+
+# pywin32 is optional (already used for the console close handler).
+try:
+    import win32file
+    import win32con
+    WIN32FILE_AVAILABLE = True
+except ImportError:
+    WIN32FILE_AVAILABLE = False
+
+
+def scan_folder(folder, extensions):
+    """Returns { full_path: (mtime_ns, size) } for the audio files in `folder` and its subfolders."""
+    files = {}
+    pending = [folder]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.lower().endswith(extensions) and entry.is_file():
+                        st = entry.stat()
+                        files[entry.path] = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            print(f"[!] Cannot scan folder (skipped): {e}")
+    return files
+
+
+def list_subfolders(folder):
+    """Returns `folder` and every folder below it."""
+    folders = [folder]
+    for root, dirs, _ in os.walk(folder):
+        folders.extend(os.path.join(root, d) for d in dirs)
+    return folders
+
+
+# --- Persistent Metadata Index ---
+
+class LibraryIndex:
+    """
+    SQLite index of the sound library: one row per audio file.
+
+    Rows are keyed by path and invalidated (metadata cleared) when the
+    file's mtime or size changes. Duration / sample rate / channels are
+    filled in by probing, loudness / true peak / trim points by analysis; category is the subfolder
+    relative to the library root, and new files are tagged with its parts.
+    The connection belongs to the thread that created it (the Tk thread).
+    """
+
+    SCHEMA_VERSION = 3
+    SORT_ORDERS = {
+        "Name": "name COLLATE NOCASE, category COLLATE NOCASE",
+        "Category": "category COLLATE NOCASE, name COLLATE NOCASE",
+        "Duration": "duration IS NULL, duration, name COLLATE NOCASE",
+    }
+
+    def __init__(self, db_path, root):
+        self.root = root
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            self.db.execute("DROP TABLE IF EXISTS clips")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS clips (
+                path TEXT PRIMARY KEY,
+                category TEXT NOT NULL,
+                name TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                duration REAL,
+                samplerate INTEGER,
+                channels INTEGER,
+                loudness REAL,
+                true_peak REAL,
+                trim_start REAL,
+                trim_end REAL,
+                analyzed INTEGER NOT NULL DEFAULT 0,
+                tags TEXT NOT NULL DEFAULT '',
+                hotkey TEXT NOT NULL DEFAULT ''
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS clips_category ON clips (category)")
+        self.db.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self.db.commit()
+
+    def category_of(self, full_path):
+        rel = os.path.relpath(os.path.dirname(full_path), self.root)
+        return "" if rel == "." else rel.replace(os.sep, "/")
+
+    def sync(self, snapshot):
+        """
+        Makes the index match a scan_folder() snapshot: new and changed files
+        get fresh rows, missing files are deleted. Returns the changed paths.
+        """
+        existing = {path: (mtime_ns, size) for path, mtime_ns, size
+                    in self.db.execute("SELECT path, mtime_ns, size FROM clips")}
+        changed = [path for path, stat in snapshot.items() if existing.get(path) != stat]
+        removed = [path for path in existing if path not in snapshot]
+        self.upsert(changed, snapshot)
+        self.remove(removed)
+        return changed
+
+    def upsert(self, paths, snapshot=None):
+        """Adds or resets rows (hotkeys are kept). Stats come from `snapshot` or os.stat."""
+        rows = []
+        for path in paths:
+            if snapshot is not None and path in snapshot:
+                mtime_ns, size = snapshot[path]
+            else:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                mtime_ns, size = st.st_mtime_ns, st.st_size
+            category = self.category_of(path)
+            tags = ",".join(part.lower() for part in category.split("/") if part)
+            rows.append((path, category, os.path.basename(path), mtime_ns, size, tags))
+        self.db.executemany("""
+            INSERT INTO clips (path, category, name, mtime_ns, size, tags) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                mtime_ns = excluded.mtime_ns, size = excluded.size,
+                duration = NULL, samplerate = NULL, channels = NULL,
+                loudness = NULL, true_peak = NULL, trim_start = NULL, trim_end = NULL,
+                analyzed = 0""", rows)
+        self.db.commit()
+
+    def remove(self, paths):
+        self.db.executemany("DELETE FROM clips WHERE path = ?", [(p,) for p in paths])
+        self.db.commit()
+
+    def set_info(self, full_path, duration, samplerate, channels):
+        """Stores probe results. Call commit() after a batch."""
+        self.db.execute("UPDATE clips SET duration = ?, samplerate = ?, channels = ? WHERE path = ?",
+                        (duration, samplerate, channels, full_path))
+
+    ANALYSIS_FIELDS = ("loudness", "true_peak", "trim_start", "trim_end")
+
+    def set_analysis(self, full_path, analysis):
+        """Stores a clip's analysis dict (see ANALYSIS_FIELDS). Call commit() after a batch."""
+        self.db.execute("UPDATE clips SET loudness = ?, true_peak = ?, trim_start = ?, trim_end = ?, analyzed = 1 "
+                        "WHERE path = ?", tuple(analysis.get(field) for field in self.ANALYSIS_FIELDS) + (full_path,))
+
+    def analysis_info(self):
+        """Returns { path: analysis dict } for every analysed file."""
+        rows = self.db.execute(f"SELECT path, {', '.join(self.ANALYSIS_FIELDS)} FROM clips WHERE analyzed = 1")
+        return {row[0]: dict(zip(self.ANALYSIS_FIELDS, row[1:])) for row in rows}
+
+    def set_hotkeys(self, file_hotkeys):
+        """Mirrors { path: hotkey } into the index (paths not in the mapping are cleared)."""
+        self.db.execute("UPDATE clips SET hotkey = ''")
+        self.db.executemany("UPDATE clips SET hotkey = ? WHERE path = ?",
+                            [(hotkey or "", path) for path, hotkey in file_hotkeys.items()])
+        self.db.commit()
+
+    def set_hotkey(self, full_path, hotkey):
+        self.db.execute("UPDATE clips SET hotkey = ? WHERE path = ?", (hotkey or "", full_path))
+        self.db.commit()
+
+    def commit(self):
+        self.db.commit()
+
+    def paths_missing_info(self):
+        return [row[0] for row in self.db.execute("SELECT path FROM clips WHERE duration IS NULL")]
+
+    def tags(self):
+        """Returns { path: tags } for every row."""
+        return dict(self.db.execute("SELECT path, tags FROM clips"))
+
+    def categories(self):
+        return [row[0] for row in self.db.execute(
+            "SELECT DISTINCT category FROM clips ORDER BY category COLLATE NOCASE")]
+
+    def query(self, category=None, sort="Name"):
+        """Returns paths, optionally limited to one category (and its subfolders), in `sort` order."""
+        order = self.SORT_ORDERS.get(sort, self.SORT_ORDERS["Name"])
+        if category is None:
+            rows = self.db.execute(f"SELECT path FROM clips ORDER BY {order}")
+        else:
+            rows = self.db.execute(f"SELECT path FROM clips WHERE category = ? OR category LIKE ? ESCAPE '\\' "
+                                   f"ORDER BY {order}",
+                                   (category, category.replace("\\", "\\\\").replace("%", "\\%")
+                                    .replace("_", "\\_") + "/%"))
+        return [row[0] for row in rows]
+
+    def close(self):
+        try:
+            self.db.commit()
+            self.db.close()
+        except Exception as e:
+            print(f"[!] Failed to close library index: {e}")
+
+
+class FolderWatcher:
+    """
+    Background watcher for one folder and its subfolders.
+
+    Results are put on `self.results` for the UI thread to drain:
+        ("changes", added, removed, modified)  (lists of full paths)
+
+    A file whose size or mtime is still changing between two scans
+    `settle_time` apart (e.g. being copied in) is reported once it stops.
+    """
+
+    def __init__(self, folder, extensions, poll_interval=2.0, settle_time=0.5):
+        self.folder = folder
+        self.extensions = tuple(extensions)
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.results = queue.Queue()
+        self.backend = "polling"
+        self._snapshot = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, snapshot=None):
+        """
+        Starts watching. `snapshot` is what the app already loaded (defaults to
+        the folder as it is now), so changes made during startup are not lost.
+        """
+        if self._thread is not None:
+            return
+        self._snapshot = snapshot if snapshot is not None else scan_folder(self.folder, self.extensions)
+        self._start_notifier()
+        self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+        self._thread.start()
+        print(f"[*] Watching '{self.folder}' for changes ({self.backend}).")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    # --- Change Notification Backends ---
+
+    def _start_notifier(self):
+        notifier = None
+        if sys.platform.startswith("linux"):
+            notifier = self._inotify_notifier()
+        elif sys.platform == "win32" and WIN32FILE_AVAILABLE:
+            notifier = self._win32_notifier()
+        if notifier is not None:
+            threading.Thread(target=notifier, name="folder-notify", daemon=True).start()
+
+    def _inotify_notifier(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(0o2000000) # IN_CLOEXEC
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            mask = 0x002 | 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+            if libc.inotify_add_watch(fd, os.fsencode(self.folder), mask) < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+        except Exception as e:
+            print(f"[!] inotify unavailable, polling instead: {e}")
+            return None
+
+        def watch_subfolders():
+            # inotify is not recursive; re-adding an existing watch is a no-op
+            for folder in list_subfolders(self.folder):
+                libc.inotify_add_watch(fd, os.fsencode(folder), mask)
+
+        def notifier():
+            try:
+                watch_subfolders()
+                while not self._stop.is_set():
+                    ready, _, _ = select.select([fd], [], [], 1.0)
+                    if ready:
+                        os.read(fd, 65536) # The events themselves are not needed
+                        watch_subfolders() # Pick up new subfolders
+                        self._wake.set()
+            finally:
+                os.close(fd)
+
+        self.backend = "inotify"
+        return notifier
+
+    def _win32_notifier(self):
+        try:
+            handle = win32file.CreateFile(
+                self.folder, 0x0001, # FILE_LIST_DIRECTORY
+                win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE | win32con.FILE_SHARE_DELETE,
+                None, win32con.OPEN_EXISTING, win32con.FILE_FLAG_BACKUP_SEMANTICS, None)
+        except Exception as e:
+            print(f"[!] ReadDirectoryChangesW unavailable, polling instead: {e}")
+            return None
+        flags = (win32con.FILE_NOTIFY_CHANGE_FILE_NAME | win32con.FILE_NOTIFY_CHANGE_DIR_NAME
+                 | win32con.FILE_NOTIFY_CHANGE_SIZE
+                 | win32con.FILE_NOTIFY_CHANGE_LAST_WRITE)
+
+        def notifier():
+            try:
+                while not self._stop.is_set():
+                    # Blocks until something changes (daemon thread; not interrupted on exit)
+                    win32file.ReadDirectoryChangesW(handle, 8192, True, flags, None, None) # Whole subtree
+                    self._wake.set()
+            except Exception as e:
+                print(f"[!] Folder notification stopped, polling instead: {e}")
+                self.backend = "polling"
+            finally:
+                handle.Close()
+
+        self.backend = "ReadDirectoryChangesW"
+        return notifier
+
+    # --- Scan Loop ---
+
+    def _run(self):
+        while not self._stop.is_set():
+            # With a notifier the timeout is only a safety net
+            timeout = self.poll_interval if self.backend == "polling" else self.poll_interval * 15
+            self._wake.wait(timeout)
+            if self._stop.is_set():
+                return
+            self._wake.clear()
+            try:
+                self._rescan()
+            except Exception as e:
+                print(f"[!] Folder scan failed: {e}")
+
+    def _rescan(self):
+        first = scan_folder(self.folder, self.extensions)
+        if first == self._snapshot:
+            return
+        time.sleep(self.settle_time)
+        second = scan_folder(self.folder, self.extensions)
+
+        old = self._snapshot
+        new = {}
+        unsettled = False
+        for path, stat in second.items():
+            if first.get(path) == stat:
+                new[path] = stat
+            else:
+                unsettled = True # Still being written; keep the old state for now
+                if path in old:
+                    new[path] = old[path]
+        for path in old:
+            if path not in second and path in first:
+                new[path] = old[path] # Removed between the scans; report next round
+                unsettled = True
+        if unsettled:
+            self._wake.set()
+
+        added = [p for p in new if p not in old]
+        removed = [p for p in old if p not in new]
+        modified = [p for p in new if p in old and new[p] != old[p]]
+        self._snapshot = new
+        if added or removed or modified:
+            self.results.put(("changes", added, removed, modified))
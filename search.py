@@ -0,0 +1,158 @@
+"""
+Fuzzy search over the sound library.
+
+Every clip's name and tags are split into words and indexed by trigram
+(plus left-padded prefixes, so one or two typed letters match the start of
+a word). A query scores each clip by the number of its trigrams the clip
+shares, with one NumPy bincount over the matching posting lists; only
+the strongest candidates are ranked in Python, so a lookup in a
+20,000-clip library stays well under a millisecond.
+"""
+import os
+import re
+import math
+
+import numpy as np
+
+_WORD = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def search_words(text):
+    """'Air_Horn (loud).mp3' -> ['air', 'horn', 'loud', 'mp3']"""
+    return _WORD.findall(text.lower())
+
+
+def _word_trigrams(word):
+    padded = "  " + word + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _query_trigrams(word):
+    """Inner trigrams of a query word; a word too short for one is matched as a prefix."""
+    if len(word) >= 3:
+        return {word[i:i + 3] for i in range(len(word) - 2)}
+    return {("  " + word)[-3:]}
+
+
+class TrigramIndex:
+    """
+    In-memory search index: key (a file path) -> searchable text.
+
+    Keys get stable integer ids; removing a key only marks its id dead, and
+    the index is compacted once most ids are dead. Posting lists are turned
+    into NumPy arrays on first use after they change.
+    """
+
+    MIN_MATCH = 0.6 # Fraction of the query's trigrams a result must share (typo tolerance)
+
+    def __init__(self):
+        self.keys = [] # id -> key (None once removed)
+        self.names = [] # id -> file name as words, e.g. 'air horn' (for substring / prefix ranking)
+        self.tags = [] # id -> tags (kept for compaction)
+        self._ids = {} # key -> id
+        self._postings = {} # trigram -> [ids]
+        self._arrays = {} # trigram -> np.int32 array (cache of _postings)
+        self._name_bytes = None # UTF-8 names as an np.bytes_ array (cache, for the vectorized phrase search)
+        self._alive = np.zeros(0, dtype=bool)
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def add(self, key, tags=""):
+        """Indexes a file path by its file name (without extension) and tags. Re-adding replaces it."""
+        if key in self._ids:
+            self.remove(key)
+        name_words = search_words(os.path.splitext(os.path.basename(key))[0])
+        item_id = len(self.keys)
+        self.keys.append(key)
+        self.names.append(" ".join(name_words))
+        self._name_bytes = None
+        self.tags.append(tags or "")
+        self._ids[key] = item_id
+        trigrams = set()
+        for word in name_words + search_words(tags or ""):
+            trigrams |= _word_trigrams(word)
+        for trigram in trigrams:
+            self._postings.setdefault(trigram, []).append(item_id)
+            self._arrays.pop(trigram, None)
+        if item_id >= len(self._alive):
+            grown = np.zeros(max(64, 2 * len(self._alive)), dtype=bool)
+            grown[:len(self._alive)] = self._alive
+            self._alive = grown
+        self._alive[item_id] = True
+
+    def remove(self, key):
+        item_id = self._ids.pop(key, None)
+        if item_id is None:
+            return
+        self.keys[item_id] = None
+        self._alive[item_id] = False
+        self._dead += 1
+        if self._dead > 1024 and self._dead > len(self._ids):
+            self._compact()
+
+    def clear(self):
+        self.__init__()
+
+    def _compact(self):
+        live = [(key, self.tags[item_id]) for key, item_id in self._ids.items()]
+        self.clear()
+        for key, tags in live:
+            self.add(key, tags)
+
+    def _posting_array(self, trigram):
+        array = self._arrays.get(trigram)
+        if array is None:
+            ids = self._postings.get(trigram)
+            if ids is None:
+                return None
+            array = self._arrays[trigram] = np.asarray(ids, dtype=np.int32)
+        return array
+
+    def search(self, query, limit=50):
+        """Returns up to `limit` keys, best match first ([] for an empty query)."""
+        words = search_words(query)
+        if not words or not self._ids:
+            return []
+        trigrams = set()
+        for word in words:
+            trigrams |= _query_trigrams(word)
+        arrays = [a for a in map(self._posting_array, trigrams) if a is not None]
+        if not arrays:
+            return []
+
+        scores = np.bincount(np.concatenate(arrays), minlength=len(self.keys))
+        scores[~self._alive[:len(scores)]] = 0
+        needed = max(1, math.ceil(len(trigrams) * self.MIN_MATCH))
+        candidates = np.flatnonzero(scores >= needed)
+        phrase = " ".join(words)
+        pool = limit * 2
+        if len(candidates) > pool:
+            # Keep the strongest few; the exact ranking below is per candidate. A whole-phrase
+            # match outranks any other name, so those are found (vectorized) before the cut.
+            # With only 3+ letter words, such a name shares every trigram of the query.
+            cut_scores = scores[candidates]
+            if min(map(len, words)) >= 3:
+                maybe = np.flatnonzero(cut_scores == len(trigrams))
+            else:
+                maybe = np.arange(len(candidates))
+            if self._name_bytes is None:
+                self._name_bytes = np.array([name.encode("utf-8") for name in self.names], dtype=bytes)
+            found = np.char.find(self._name_bytes[candidates[maybe]], phrase.encode("utf-8"))
+            cut_scores[maybe] += len(trigrams) * ((found >= 0).astype(cut_scores.dtype) + (found == 0))
+            top = np.argpartition(cut_scores, -pool)[-pool:]
+            candidates = candidates[top]
+
+        names = self.names
+        ranked = []
+        for item_id, score in zip(candidates.tolist(), scores[candidates].tolist()):
+            name = names[item_id]
+            if phrase in name:
+                score += len(trigrams) * (2 if name.startswith(phrase) else 1) # Whole-phrase matches first
+            ranked.append((-score, len(name), name, item_id))
+        ranked.sort()
+        return [self.keys[item_id] for *_, item_id in ranked[:limit]]
@@ -0,0 +1,166 @@
+"""Behaviour of the command bus and voice pool (audio_engine.CommandRing, CommandBus, MixEngine)."""
+import threading
+
+import numpy as np
+
+from audio_engine import (CMD_PLAY, CMD_STOP, STEAL_OLDEST, STEAL_QUIETEST, CommandBus, CommandRing,
+                          MixEngine, StreamRing)
+
+FRAMES = 64
+
+
+def make_engine(max_voices=4, steal_policy=STEAL_OLDEST):
+    engine = MixEngine(max_voices=max_voices, steal_policy=steal_policy)
+    engine.limiter.enabled = False # Plain sums (hard clip only), no lookahead delay
+    engine.reset(mic_vol=1.0, music_vol=1.0)
+    engine.prepare(FRAMES, 2)
+    return engine
+
+
+def run_block(engine, frames=FRAMES):
+    out = np.zeros((frames, 2), dtype=np.float32)
+    engine.process(None, out, frames)
+    return out
+
+
+def constant(level, frames=FRAMES * 8):
+    return np.full((frames, 2), level, dtype=np.float32)
+
+
+def drain(ring):
+    """Pops every queued command as (op, key), like MixEngine._drain_commands."""
+    popped = []
+    while ring.head != ring.tail:
+        slot = ring.slots[ring.head % ring.capacity]
+        popped.append((slot[0], slot[4]))
+        ring.head += 1
+    return popped
+
+
+def test_ring_wraps_around_its_slots():
+    ring = CommandRing(capacity=4)
+    popped = []
+    for i in range(11):
+        assert ring.push(CMD_PLAY, key=i)
+        if i % 3 == 2:
+            popped += drain(ring)
+    popped += drain(ring)
+    assert [key for _, key in popped] == list(range(11))
+    assert ring.tail == 11 and ring.dropped == 0
+
+
+def test_full_ring_rejects_and_counts_drops():
+    ring = CommandRing(capacity=3)
+    assert all(ring.push(CMD_PLAY, key=i) for i in range(3))
+    assert not ring.push(CMD_PLAY, key=3)
+    assert not ring.push(CMD_STOP)
+    assert ring.dropped == 2
+    assert [key for _, key in drain(ring)] == [0, 1, 2] # Queued commands are untouched
+    assert ring.push(CMD_PLAY, key=4)
+
+
+def test_bus_gives_each_producer_thread_its_own_ring():
+    bus = CommandBus(capacity=2)
+    bus.push(CMD_PLAY, key="tk")
+    worker = threading.Thread(target=lambda: [bus.push(CMD_PLAY, key="hotkey") for _ in range(3)])
+    worker.start()
+    worker.join()
+    assert len(bus.rings) == 2
+    assert bus.dropped == 1 # Only the worker's ring overflowed
+    assert [drain(ring) for ring in bus.rings] == [[(CMD_PLAY, "tk")],
+                                                   [(CMD_PLAY, "hotkey"), (CMD_PLAY, "hotkey")]]
+
+
+def test_overlapping_plays_layer():
+    engine = make_engine()
+    engine.play(constant(0.1), key="a")
+    engine.play(constant(0.2), key="b")
+    out = run_block(engine)
+    assert engine.active_voices == 2
+    assert np.allclose(out, 0.3)
+
+
+def test_oldest_voice_is_stolen_when_the_pool_is_full():
+    engine = make_engine(max_voices=2)
+    engine.play(constant(0.1), key="first")
+    run_block(engine)
+    engine.play(constant(0.2), key="second")
+    run_block(engine)
+    engine.play(constant(0.4), key="third")
+    out = run_block(engine)
+    assert engine.stolen_voices == 1
+    assert sorted(engine.voice_key) == ["second", "third"]
+    assert np.allclose(out, 0.6)
+
+
+def test_quietest_voice_is_stolen_when_the_pool_is_full():
+    engine = make_engine(max_voices=2, steal_policy=STEAL_QUIETEST)
+    engine.play(constant(0.3), key="loud")
+    engine.play(constant(0.5), gain=0.1, key="quiet") # Louder samples, but the gain counts too
+    run_block(engine)
+    engine.play(constant(0.2), key="new")
+    run_block(engine)
+    assert engine.stolen_voices == 1
+    assert sorted(engine.voice_key) == ["loud", "new"]
+
+
+def test_stop_releases_only_the_matching_voices():
+    engine = make_engine()
+    engine.play(constant(0.1), key="a")
+    engine.play(constant(0.1), key="a")
+    engine.play(constant(0.2), key="b")
+    run_block(engine)
+    engine.stop("a")
+    out = run_block(engine)
+    assert engine.voice_key.count("a") == 0 and engine.active_voices == 1
+    assert np.allclose(out, 0.2) # A stopped voice is silent from the very next block
+
+    engine.stop_all()
+    out = run_block(engine)
+    assert engine.active_voices == 0
+    assert not out.any()
+
+
+def test_stop_closes_a_streaming_voice():
+    engine = make_engine()
+    ring = StreamRing(FRAMES * 4, 2)
+    ring.write(constant(0.1, FRAMES * 2))
+    engine.play(ring, key="long")
+    out = run_block(engine)
+    assert np.allclose(out, 0.1) and not ring.closed
+    engine.stop("long")
+    run_block(engine)
+    assert ring.closed and engine.active_voices == 0
+
+
+def test_finished_voice_frees_its_slot():
+    engine = make_engine(max_voices=1)
+    engine.play(constant(0.1, FRAMES + 10), key="short")
+    run_block(engine)
+    out = run_block(engine)
+    assert np.allclose(out[:10], 0.1) and not out[10:].any()
+    assert engine.active_voices == 0
+    engine.play(constant(0.2), key="next")
+    run_block(engine)
+    assert engine.stolen_voices == 0
+
+
+def test_music_volume_and_voice_gain_scale_the_mix():
+    engine = make_engine()
+    engine.play(constant(0.4), gain=0.5, key="a")
+    engine.set_volume("music", 0.5)
+    out = run_block(engine)
+    assert np.allclose(out, 0.1)
+
+
+def test_replace_data_keeps_the_play_position():
+    engine = make_engine()
+    head = constant(0.1, FRAMES * 2)
+    full = np.arange(FRAMES * 4, dtype=np.float32).repeat(2).reshape(-1, 2) / 1000
+    engine.play(head, key="clip", pos=3)
+    run_block(engine)
+    engine.replace_data(head, full)
+    engine.replace_data(constant(0.1), full) # An equal but different array matches no voice
+    out = run_block(engine)
+    assert engine.active_voices == 1
+    assert np.allclose(out, full[FRAMES + 3:2 * FRAMES + 3])
@@ -0,0 +1,53 @@
+"""Behaviour of the master limiter (dsp.TruePeakLimiter)."""
+import itertools
+
+import numpy as np
+
+from audio_loader import PolyphaseResampler
+from dsp import TruePeakLimiter
+
+SAMPLERATE = 48000
+BLOCK_SIZES = (256, 1, 64, 17, 512, 100, 33, 480) # Mixed, like a host that changes its buffer size
+
+
+def run_limiter(limiter, signal, max_frames=512):
+    """Feeds `signal` through the limiter in blocks of BLOCK_SIZES (cycled); returns the output."""
+    limiter.prepare(max_frames, signal.shape[1], SAMPLERATE)
+    out = signal.copy()
+    start = 0
+    for frames in itertools.cycle(BLOCK_SIZES):
+        if start >= len(out):
+            break
+        block = out[start:start + frames]
+        limiter.process(block, len(block))
+        start += len(block)
+    return out
+
+
+def true_peak_db(samples):
+    """4x-oversampled peak, measured like analyze_loudness (edges skipped)."""
+    resampler = PolyphaseResampler(SAMPLERATE, SAMPLERATE * 4, samples.shape[1], taps=12)
+    upsampled = resampler.process(samples)
+    return 20.0 * np.log10(np.abs(upsampled[resampler.taps * 4:-resampler.taps * 4]).max())
+
+
+def test_loud_noise_stays_under_the_ceiling():
+    rng = np.random.default_rng(0)
+    noise = rng.standard_normal((SAMPLERATE * 2, 2)).astype(np.float32) # Peaks around +12 dBFS
+    limiter = TruePeakLimiter(ceiling_db=-1.0)
+    out = run_limiter(limiter, noise)[limiter.latency_frames:]
+    assert 20.0 * np.log10(np.abs(out).max()) <= limiter.ceiling_db
+    assert true_peak_db(out) <= limiter.ceiling_db
+    assert limiter.replans > len(BLOCK_SIZES) # Every block size change was exercised
+
+
+def test_quiet_signal_is_only_delayed_by_latency_frames():
+    rng = np.random.default_rng(1)
+    quiet = (0.05 * rng.standard_normal((SAMPLERATE // 2, 2))).astype(np.float32) # Far under the ceiling
+    limiter = TruePeakLimiter(ceiling_db=-1.0)
+    out = run_limiter(limiter, quiet)
+    delay = limiter.latency_frames
+    assert delay == int(round(limiter.lookahead_ms * 0.001 * SAMPLERATE)) + 7
+    assert not out[:delay].any()
+    assert np.allclose(out[delay:], quiet[:-delay], rtol=1e-5, atol=1e-7)
+    assert not np.allclose(out[delay + 1:], quiet[:-delay - 1], rtol=1e-5, atol=1e-7)
@@ -0,0 +1,138 @@
+"""Behaviour of global hotkey dispatch (hotkeys.HotkeyDispatcher)."""
+import time
+import types
+
+import pytest
+
+import hotkeys
+from hotkeys import HotkeyDispatcher, normalize_mods
+
+
+def test_left_and_right_modifiers_fold_together():
+    assert normalize_mods(["left ctrl", "right shift"]) == frozenset({"ctrl", "shift"})
+    assert normalize_mods(["right ctrl", "control", "ctrl"]) == frozenset({"ctrl"})
+    assert normalize_mods(["left windows", "alt gr"]) == frozenset({"win", "alt gr"})
+    assert normalize_mods([]) == frozenset()
+
+
+SCAN_CODES = {"a": (30,), "b": (48,)}
+
+
+@pytest.fixture
+def keyboard(monkeypatch):
+    """
+    Stands in for the keyboard library's scan-code table and event constants,
+    which need a real keyboard backend (root and dumpkeys on Linux).
+    """
+    def key_to_scan_codes(key):
+        if key not in SCAN_CODES:
+            raise ValueError(f"Key {key!r} is not mapped to any known key.")
+        return SCAN_CODES[key]
+
+    fake = types.SimpleNamespace(KEY_DOWN="down", KEY_UP="up", key_to_scan_codes=key_to_scan_codes)
+    monkeypatch.setattr(hotkeys, "keyboard", fake, raising=False)
+    return fake
+
+
+@pytest.fixture
+def dispatcher(keyboard):
+    dispatcher = HotkeyDispatcher()
+    dispatcher.fired = []
+    return dispatcher
+
+
+def scan_code(dispatcher, key):
+    return dispatcher.binding_keys([], key)[0][0]
+
+
+def event(keyboard, event_type, name, code):
+    return types.SimpleNamespace(event_type=event_type, scan_code=code, name=name, time=time.time())
+
+
+def press(keyboard, dispatcher, name, code=0):
+    dispatcher._on_event(event(keyboard, keyboard.KEY_DOWN, name, code))
+
+
+def release(keyboard, dispatcher, name, code=0):
+    dispatcher._on_event(event(keyboard, keyboard.KEY_UP, name, code))
+
+
+def bind(dispatcher, binding_id, mods, key):
+    dispatcher.bind(binding_id, mods, key, lambda: dispatcher.fired.append(binding_id))
+
+
+def test_binding_fires_only_with_exactly_its_modifiers(keyboard, dispatcher):
+    bind(dispatcher, "plain", [], "a")
+    bind(dispatcher, "ctrl", ["ctrl"], "a")
+    bind(dispatcher, "ctrl+shift", ["ctrl", "shift"], "a")
+    a = scan_code(dispatcher, "a")
+
+    press(keyboard, dispatcher, "a", a)
+    release(keyboard, dispatcher, "a", a)
+    press(keyboard, dispatcher, "right ctrl")
+    press(keyboard, dispatcher, "a", a)
+    release(keyboard, dispatcher, "a", a)
+    press(keyboard, dispatcher, "left shift")
+    press(keyboard, dispatcher, "a", a)
+    release(keyboard, dispatcher, "a", a)
+    release(keyboard, dispatcher, "right ctrl")
+    press(keyboard, dispatcher, "a", a) # Shift only: nothing bound
+    release(keyboard, dispatcher, "a", a)
+    assert dispatcher.fired == ["plain", "ctrl", "ctrl+shift"]
+
+
+def test_left_and_right_modifiers_both_match(keyboard, dispatcher):
+    bind(dispatcher, "ctrl", ["left ctrl"], "a")
+    a = scan_code(dispatcher, "a")
+    for ctrl in ("left ctrl", "right ctrl"):
+        press(keyboard, dispatcher, ctrl)
+        press(keyboard, dispatcher, "a", a)
+        release(keyboard, dispatcher, "a", a)
+        release(keyboard, dispatcher, ctrl)
+    assert dispatcher.fired == ["ctrl", "ctrl"]
+
+
+def test_modifier_stays_held_until_both_sides_are_released(keyboard, dispatcher):
+    bind(dispatcher, "ctrl", ["ctrl"], "a")
+    a = scan_code(dispatcher, "a")
+    press(keyboard, dispatcher, "left ctrl")
+    press(keyboard, dispatcher, "right ctrl")
+    release(keyboard, dispatcher, "left ctrl")
+    press(keyboard, dispatcher, "a", a)
+    release(keyboard, dispatcher, "a", a)
+    release(keyboard, dispatcher, "right ctrl")
+    press(keyboard, dispatcher, "a", a)
+    assert dispatcher.fired == ["ctrl"]
+
+
+def test_auto_repeat_fires_once(keyboard, dispatcher):
+    bind(dispatcher, "a", [], "a")
+    a = scan_code(dispatcher, "a")
+    for _ in range(3):
+        press(keyboard, dispatcher, "a", a)
+    release(keyboard, dispatcher, "a", a)
+    press(keyboard, dispatcher, "a", a)
+    assert dispatcher.fired == ["a", "a"]
+
+
+def test_rebinding_the_same_hotkey_keeps_the_reverse_index_consistent(keyboard, dispatcher):
+    bind(dispatcher, "first", ["ctrl"], "a")
+    bind(dispatcher, "second", ["right ctrl"], "a") # Same hotkey: takes it over
+    dispatcher.unbind("first") # Must not remove the second binding's keys
+    a = scan_code(dispatcher, "a")
+    press(keyboard, dispatcher, "ctrl")
+    press(keyboard, dispatcher, "a", a)
+    assert dispatcher.fired == ["second"]
+
+    dispatcher.unbind("second")
+    assert dispatcher.bindings == {}
+    assert dispatcher._binding_ids == {}
+
+
+def test_bind_replaces_the_old_hotkey_and_rejects_unknown_keys(keyboard, dispatcher):
+    bind(dispatcher, "clip", ["ctrl"], "a")
+    bind(dispatcher, "clip", ["alt"], "b")
+    assert {mods for _, mods in dispatcher.bindings} == {frozenset({"alt"})}
+    with pytest.raises(ValueError):
+        bind(dispatcher, "clip", [], "no such key")
+    assert {mods for _, mods in dispatcher.bindings} == {frozenset({"alt"})} # Old binding kept
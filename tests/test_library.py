@@ -0,0 +1,107 @@
+"""Behaviour of the persistent library index (library.LibraryIndex)."""
+import os
+import sqlite3
+
+import pytest
+
+from library import LibraryIndex
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "Soundboard Rsc")
+
+
+@pytest.fixture
+def index(tmp_path, root):
+    index = LibraryIndex(str(tmp_path / "library.db"), root)
+    yield index
+    index.close()
+
+
+def path(root, *parts):
+    return os.path.join(root, *parts)
+
+
+def test_categories_and_tags_come_from_subfolders(index, root):
+    snapshot = {path(root, "Top.wav"): (1, 10),
+                path(root, "Memes", "Bruh.mp3"): (1, 10),
+                path(root, "Memes", "Old", "Oof.ogg"): (1, 10)}
+    index.sync(snapshot)
+    assert index.categories() == ["", "Memes", "Memes/Old"]
+    assert index.tags()[path(root, "Memes", "Old", "Oof.ogg")] == "memes,old"
+    assert index.tags()[path(root, "Top.wav")] == ""
+
+
+def test_category_query_includes_subfolders_only(index, root):
+    snapshot = {path(root, "A_B", "x.wav"): (1, 1),
+                path(root, "A_B", "Sub", "y.wav"): (1, 1),
+                path(root, "AxB", "z.wav"): (1, 1), # '_' must not act as a LIKE wildcard
+                path(root, "A_Bc", "w.wav"): (1, 1)}
+    index.sync(snapshot)
+    assert index.query("A_B") == [path(root, "A_B", "x.wav"), path(root, "A_B", "Sub", "y.wav")]
+    assert len(index.query()) == 4
+
+
+def test_sort_orders(index, root):
+    snapshot = {path(root, "b", "alpha.wav"): (1, 1),
+                path(root, "a", "Charlie.wav"): (1, 1),
+                path(root, "a", "bravo.wav"): (1, 1)}
+    index.sync(snapshot)
+    index.set_info(path(root, "b", "alpha.wav"), 3.0, 48000, 2)
+    index.set_info(path(root, "a", "bravo.wav"), 1.0, 48000, 2)
+    index.commit()
+    by_name = lambda sort: [os.path.basename(p) for p in index.query(sort=sort)]
+    assert by_name("Name") == ["alpha.wav", "bravo.wav", "Charlie.wav"]
+    assert by_name("Category") == ["bravo.wav", "Charlie.wav", "alpha.wav"]
+    assert by_name("Duration") == ["bravo.wav", "alpha.wav", "Charlie.wav"] # Unprobed last
+    assert by_name("No such order") == by_name("Name")
+
+
+def test_sync_resets_changed_files_and_keeps_hotkeys(index, root):
+    clip, gone = path(root, "clip.wav"), path(root, "gone.wav")
+    index.sync({clip: (1, 10), gone: (1, 10)})
+    index.set_info(clip, 2.0, 44100, 1)
+    index.set_analysis(clip, {"loudness": -20.0, "true_peak": -3.0, "trim_start": 0.1, "trim_end": 1.9})
+    index.commit()
+    index.set_hotkey(clip, "ctrl+a")
+    assert index.paths_missing_info() == [gone]
+    assert index.analysis_info() == {clip: {"loudness": -20.0, "true_peak": -3.0,
+                                            "trim_start": 0.1, "trim_end": 1.9}}
+
+    assert index.sync({clip: (1, 10)}) == [] # Unchanged: nothing to re-probe
+    assert index.query() == [clip]
+
+    assert index.sync({clip: (2, 10)}) == [clip]
+    assert index.paths_missing_info() == [clip]
+    assert index.analysis_info() == {}
+    assert index.db.execute("SELECT hotkey FROM clips").fetchone()[0] == "ctrl+a"
+
+
+def test_rows_survive_reopening(tmp_path, root):
+    db_path = str(tmp_path / "library.db")
+    index = LibraryIndex(db_path, root)
+    index.sync({path(root, "clip.wav"): (1, 10)})
+    index.close()
+    index = LibraryIndex(db_path, root)
+    assert index.query() == [path(root, "clip.wav")]
+    index.close()
+
+
+def test_old_schema_is_rebuilt(tmp_path, root):
+    db_path = str(tmp_path / "library.db")
+    db = sqlite3.connect(db_path)
+    db.execute("CREATE TABLE clips (path TEXT PRIMARY KEY, duration REAL)")
+    db.execute("INSERT INTO clips VALUES ('old.wav', 1.0)")
+    db.execute(f"PRAGMA user_version = {LibraryIndex.SCHEMA_VERSION - 1}")
+    db.commit()
+    db.close()
+
+    index = LibraryIndex(db_path, root)
+    assert index.db.execute("PRAGMA user_version").fetchone()[0] == LibraryIndex.SCHEMA_VERSION
+    assert index.query() == []
+    columns = {row[1] for row in index.db.execute("PRAGMA table_info(clips)")}
+    assert {"category", "loudness", "true_peak", "trim_start", "trim_end", "analyzed", "tags", "hotkey"} <= columns
+    index.sync({path(root, "clip.wav"): (1, 10)})
+    assert index.query() == [path(root, "clip.wav")]
+    index.close()
@@ -0,0 +1,48 @@
+"""Behaviour of the packed decoded-clip store (audio_loader.SampleStore)."""
+import os
+
+import numpy as np
+
+from audio_loader import SampleStore
+
+
+def add_clip(store, tmp_path, name, samples):
+    source = tmp_path / name
+    source.write_bytes(name.encode("utf-8")) # Only its mtime and size matter
+    temp_file = store.temp_file_for(str(source), 48000, samples.shape[1])
+    samples.astype(np.float32).tofile(temp_file)
+    return str(source), store.add_from_file(str(source), 48000, samples.shape[1], temp_file)
+
+
+def test_appended_clips_share_one_growing_map(tmp_path, monkeypatch):
+    monkeypatch.setattr(SampleStore, "MIN_CAPACITY", 1 << 12)
+    store = SampleStore(str(tmp_path / "pcm"))
+    rng = np.random.default_rng(0)
+    clips, maps = {}, set()
+    for i in range(64):
+        samples = rng.standard_normal((rng.integers(1, 700), 2)).astype(np.float32)
+        path, view = add_clip(store, tmp_path, f"clip{i}.wav", samples)
+        clips[path] = samples
+        maps.add(id(store._map))
+        assert np.array_equal(view, samples)
+        assert view.ctypes.data % (SampleStore.ALIGN * 4) == 0
+    assert len(maps) <= 8 # Doubling: ~log2(total / MIN_CAPACITY) + 1 maps, not one per clip
+    for path, samples in clips.items():
+        assert np.array_equal(store.lookup(path, 48000, 2), samples)
+
+
+def test_reopened_store_reuses_the_reserved_room(tmp_path):
+    cache_dir = str(tmp_path / "pcm")
+    store = SampleStore(cache_dir)
+    first, samples = add_clip(store, tmp_path, "a.wav", np.ones((100, 2)))[0], np.ones((100, 2))
+    store.save_index()
+    size = os.path.getsize(store.data_path)
+    assert size > store.data_len * 4 # Room to grow past the last clip
+
+    store = SampleStore(cache_dir)
+    assert store.data_len == 200
+    assert np.array_equal(store.lookup(first, 48000, 2), samples)
+    second, view = add_clip(store, tmp_path, "b.wav", np.full((50, 1), 2.0))
+    assert os.path.getsize(store.data_path) == size
+    assert np.array_equal(view, np.full((50, 1), 2.0, dtype=np.float32))
+    assert np.array_equal(store.lookup(first, 48000, 2), samples)
@@ -0,0 +1,89 @@
+"""Behaviour of the fuzzy library search (search.TrigramIndex)."""
+import os
+
+from search import TrigramIndex, search_words
+
+
+def make_index(*names, tags=None):
+    index = TrigramIndex()
+    for name in names:
+        index.add(os.path.join("sounds", name), (tags or {}).get(name, ""))
+    return index
+
+
+def names(keys):
+    return [os.path.basename(key) for key in keys]
+
+
+def test_search_words_splits_on_punctuation_and_underscores():
+    assert search_words("Air_Horn (loud).mp3") == ["air", "horn", "loud", "mp3"]
+
+
+def test_whole_phrase_at_start_of_name_ranks_first():
+    index = make_index("Big Air Horn.mp3", "Air Horn.mp3", "Horn Air.mp3", "Airplane.wav")
+    assert names(index.search("air horn"))[:3] == ["Air Horn.mp3", "Big Air Horn.mp3", "Horn Air.mp3"]
+
+
+def test_shorter_name_wins_a_tie():
+    index = make_index("Applause Long Version.wav", "Applause.wav")
+    assert names(index.search("applause")) == ["Applause.wav", "Applause Long Version.wav"]
+
+
+def test_one_or_two_letters_match_word_starts():
+    index = make_index("Drum Roll.wav", "Sad Trombone.wav", "Airhorn.wav")
+    assert names(index.search("d")) == ["Drum Roll.wav"]
+    assert names(index.search("tr")) == ["Sad Trombone.wav"]
+
+
+def test_typo_is_tolerated_but_unrelated_names_are_not():
+    index = make_index("Trombone.wav", "Drum Roll.wav")
+    assert names(index.search("trombome")) == ["Trombone.wav"]
+    assert index.search("xylophone") == []
+
+
+def test_extension_is_not_searched_but_tags_are():
+    index = make_index("Crowd.wav", "Boo.wav", tags={"Boo.wav": "crowd, negative"})
+    assert names(index.search("wav")) == []
+    assert sorted(names(index.search("crowd"))) == ["Boo.wav", "Crowd.wav"]
+    assert names(index.search("negative")) == ["Boo.wav"]
+
+
+def test_empty_query_and_limit():
+    index = make_index(*(f"Beep {i}.wav" for i in range(10)))
+    assert index.search("") == []
+    assert index.search("  !? ") == []
+    assert len(index.search("beep", limit=3)) == 3
+
+
+def test_readding_replaces_the_tags():
+    index = make_index("Boo.wav", tags={"Boo.wav": "crowd"})
+    index.add(os.path.join("sounds", "Boo.wav"), "negative")
+    assert len(index) == 1
+    assert index.search("crowd") == []
+    assert names(index.search("negative")) == ["Boo.wav"]
+
+
+def test_removed_keys_are_not_found_and_compaction_keeps_the_rest():
+    index = make_index(*(f"Clip {i:04}.wav" for i in range(2100)), "Keeper.wav")
+    removed = [os.path.join("sounds", f"Clip {i:04}.wav") for i in range(2100)]
+    for key in removed[:100]:
+        index.remove(key)
+    assert removed[0] not in index
+    assert removed[0] not in index.search("clip 0000", limit=2100)
+
+    for key in removed[100:]:
+        index.remove(key) # Crosses the compaction threshold
+    assert len(index.keys) < 2101 # Compacted: dead ids are gone
+    assert len(index) == 1
+    assert names(index.search("keeper")) == ["Keeper.wav"]
+    assert index.search("clip") == []
+    index.remove(os.path.join("sounds", "Missing.wav")) # Unknown keys are ignored
+
+
+def test_phrase_match_survives_the_candidate_cut():
+    index = make_index("Air Horn.wav", "Horn Of Air.wav",
+                       *(f"Clip {i}.wav" for i in range(20)), tags={f"Clip {i}.wav": "air, horn" for i in range(20)})
+    assert names(index.search("air horn", limit=1)) == ["Air Horn.wav"]
+    index = make_index("Big Air.wav", *(f"Clip {i}.wav" for i in range(20)),
+                       tags={f"Clip {i}.wav": "airy" for i in range(20)})
+    assert names(index.search("ai", limit=1)) == ["Big Air.wav"]